@@ -0,0 +1,63 @@
+"""
+Compares loading habits with strptime against the cached fast date parser.
+
+Run from the repository root:
+    python benchmarks/bench_load.py
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from habit import Habit  # noqa: E402
+from habit_tracker import HabitTracker, parse_date  # noqa: E402
+
+
+def make_data(habit_count=1000, days=1000):
+    """
+    Creates habits.json data with habit_count * days completions.
+    """
+    start = datetime(2020, 1, 1)
+    dates = [(start + timedelta(days=day)).strftime("%Y-%m-%d") for day in range(days)]
+    return {
+        "habits": [
+            {"name": f"Habit {i}", "periodicity": "daily", "start_date": dates[0], "completion_dates": dates}
+            for i in range(habit_count)
+        ]
+    }
+
+
+def load_with_strptime(data):
+    """
+    Loads the data the way HabitTracker.from_json did before the fast parser.
+    """
+    tracker = HabitTracker()
+    for habit_data in data["habits"]:
+        habit = Habit(habit_data["name"], habit_data["periodicity"],
+                      datetime.strptime(habit_data["start_date"], "%Y-%m-%d"))
+        habit.completion_dates = [datetime.strptime(date_str, "%Y-%m-%d") for date_str in habit_data["completion_dates"]]
+        tracker.add_habit(habit)
+    return tracker
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+
+def main():
+    data = make_data()
+    completions = sum(len(habit["completion_dates"]) for habit in data["habits"])
+    strptime_time = timed(load_with_strptime, data)
+    parse_date.cache_clear()
+    fast_time = timed(HabitTracker.from_json, data)
+    print(f"{completions} completions")
+    print(f"strptime:    {strptime_time:6.2f} s")
+    print(f"fast parser: {fast_time:6.2f} s   speedup: {strptime_time / fast_time:4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
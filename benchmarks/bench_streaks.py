@@ -0,0 +1,50 @@
+"""
+Compares the pure Python and the NumPy streak computation.
+
+Run from the repository root:
+    python benchmarks/bench_streaks.py
+"""
+import os
+import random
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streaks import compute_streaks, np  # noqa: E402
+
+
+def make_ordinals(count, gap_probability=0.05, seed=1):
+    """
+    Creates day ordinals with occasional gaps, shuffled like an unsorted history.
+    """
+    rng = random.Random(seed)
+    ordinal = datetime(1900, 1, 1).toordinal()
+    ordinals = []
+    while len(ordinals) < count:
+        ordinal += 2 if rng.random() < gap_probability else 1
+        ordinals.append(ordinal)
+    rng.shuffle(ordinals)
+    return ordinals
+
+
+def main():
+    for count in (10 ** 5, 10 ** 6):
+        ordinals = make_ordinals(count)
+        for periodicity in ("daily", "weekly", "monthly"):
+            python_time = min(timeit.repeat(lambda: compute_streaks(ordinals, periodicity, vectorized=False),
+                                            number=1, repeat=3))
+            line = f"{count:>8} {periodicity:<8} python: {python_time * 1000:9.1f} ms"
+            if np is not None:
+                array = np.asarray(ordinals, dtype=np.int32)
+                numpy_time = min(timeit.repeat(lambda: compute_streaks(array, periodicity, vectorized=True),
+                                               number=1, repeat=3))
+                line += f"   numpy: {numpy_time * 1000:9.1f} ms   speedup: {python_time / numpy_time:5.1f}x"
+            print(line)
+    if np is None:
+        print("NumPy is not installed, only the pure Python path was measured.")
+
+
+if __name__ == "__main__":
+    main()
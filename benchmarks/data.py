@@ -0,0 +1,54 @@
+"""
+Synthetic habit data for the benchmarks.
+
+The generated records have the format of HabitTracker.to_json, so they can be
+loaded with HabitTracker.from_json or written to a habits file.
+"""
+import random
+from datetime import datetime, timedelta
+
+PERIOD_DAYS = {"daily": 1, "weekly": 7, "monthly": 30}
+
+
+def make_records(habit_count=1000, history_days=365, mix=None, gap_density=0.1, seed=1, end=datetime(2024, 12, 31)):
+    """
+    Creates habit records with random gaps in their completion histories.
+
+    Args:
+        habit_count (int, optional): Number of habits.
+        history_days (int, optional): Days between the start of every habit and end.
+        mix (dict, optional): Share of habits per periodicity, defaults to
+            60% daily, 30% weekly and 10% monthly.
+        gap_density (float, optional): Probability that a period is not completed.
+        seed (int, optional): Seed of the random generator, the same seed gives the same data.
+        end (datetime, optional): Date of the latest possible completion.
+
+    Returns:
+        dict: {"habits": [...]} with one record per habit.
+    """
+    mix = mix or {"daily": 0.6, "weekly": 0.3, "monthly": 0.1}
+    rng = random.Random(seed)
+    periodicities = rng.choices(list(mix), weights=list(mix.values()), k=habit_count)
+    start = end - timedelta(days=history_days - 1)
+    habits = []
+    for i, periodicity in enumerate(periodicities):
+        step = PERIOD_DAYS[periodicity]
+        dates = []
+        for offset in range(0, history_days - step + 1, step):
+            if rng.random() >= gap_density:
+                # Any day inside the period, so weekly and monthly completions don't line up
+                dates.append((start + timedelta(days=offset + rng.randrange(step))).strftime("%Y-%m-%d"))
+        habits.append({
+            "name": f"Habit {i}",
+            "periodicity": periodicity,
+            "start_date": start.strftime("%Y-%m-%d"),
+            "completion_dates": dates,
+        })
+    return {"habits": habits}
+
+
+def completion_count(records):
+    """
+    Returns the number of completions in habit records.
+    """
+    return sum(len(habit["completion_dates"]) for habit in records["habits"])
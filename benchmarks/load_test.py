@@ -0,0 +1,161 @@
+"""
+Load test of the HTTP API in server.py: requests per second and latency percentiles.
+
+Without --port a server is started on a free port with a fresh habits file in a
+temporary directory and stopped at the end. Every client keeps one connection
+open and sends its requests one after the other.
+
+Run from the repository root:
+    python benchmarks/load_test.py --connections 50 --requests 20000 --write-ratio 0.1
+    python benchmarks/load_test.py --port 8000 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+START = datetime(2020, 1, 1)
+
+
+async def send(reader, writer, method, target, body=None):
+    """
+    Sends one request on an open connection and returns the status code.
+    """
+    content = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(content)}\r\n\r\n".encode() + content)
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        if key.lower() == "content-length":
+            length = int(value)
+    if length:
+        await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, habits, next_day, jobs, write_ratio, rng, latencies, statuses):
+    """
+    Sends requests until no jobs are left: marks a habit on its next day, or reads a habit's streak.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while jobs[0] > 0:
+            jobs[0] -= 1
+            number = rng.randrange(habits)
+            if rng.random() < write_ratio:
+                day = next_day[number]
+                next_day[number] += 1
+                request = ("POST", f"/habits/Habit%20{number}/completions",
+                           {"date": (START + timedelta(days=day)).strftime("%Y-%m-%d")})
+            else:
+                request = ("GET", f"/habits/Habit%20{number}/streak", None)
+            started = time.perf_counter()
+            status = await send(reader, writer, *request)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(host, port, habits, connections, requests, write_ratio, seed):
+    """
+    Creates the habits and runs the clients.
+
+    Returns:
+        dict: Requests per second, latency percentiles in milliseconds and the count per status code.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    for number in range(habits):
+        await send(reader, writer, "POST", "/habits",
+                   {"name": f"Habit {number}", "periodicity": "daily", "start_date": START.strftime("%Y-%m-%d")})
+    writer.close()
+
+    rng = random.Random(seed)
+    next_day = [0] * habits
+    jobs = [requests]
+    latencies = []
+    statuses = {}
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, habits, next_day, jobs, write_ratio, random.Random(rng.random()), latencies, statuses)
+        for _ in range(connections)
+    ))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    cuts = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "latency_ms": {"p50": cuts[49] * 1000, "p90": cuts[89] * 1000, "p99": cuts[98] * 1000, "max": latencies[-1] * 1000},
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def start_server(directory, flush_interval):
+    """
+    Starts server.py on a free port and returns the process and the port.
+    """
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "server.py"), "--file", os.path.join(directory, "habits.json"),
+         "--port", "0", "--flush-interval", str(flush_interval)],
+        cwd=ROOT, stdout=subprocess.PIPE, text=True,
+    )
+    for line in process.stdout:
+        if line.startswith("Serving on "):
+            return process, int(line.rsplit(":", 1)[1])
+    process.wait()
+    raise RuntimeError("The server did not start.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test of the habit tracker HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="test a running server instead of starting one")
+    parser.add_argument("--habits", type=int, default=100, help="habits created before the test (default: 100)")
+    parser.add_argument("--connections", type=int, default=50, help="concurrent clients (default: 50)")
+    parser.add_argument("--requests", type=int, default=20000, help="requests over all clients (default: 20000)")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="share of completions among the requests (default: 0.1)")
+    parser.add_argument("--flush-interval", type=float, default=1.0, help="flush interval of the started server (default: 1)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        process = None
+        port = args.port
+        if port is None:
+            process, port = start_server(directory, args.flush_interval)
+        try:
+            results = asyncio.run(run(args.host, port, args.habits, args.connections, args.requests,
+                                      args.write_ratio, args.seed))
+        finally:
+            if process is not None:
+                process.send_signal(signal.SIGINT)  # Lets the server commit its last batch
+                process.wait()
+
+    latency = results["latency_ms"]
+    print(f"{results['requests']} requests in {results['seconds']:.2f} s: {results['requests_per_second']:.0f} requests/s")
+    print(f"latency p50 {latency['p50']:.2f} ms, p90 {latency['p90']:.2f} ms, p99 {latency['p99']:.2f} ms, max {latency['max']:.2f} ms")
+    print("status codes: " + ", ".join(f"{status}: {count}" for status, count in results["statuses"].items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"parameters": vars(args), "results": results}, f, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Benchmarks for the hot paths of Habit and HabitTracker: load, save, mark, streak, list and edit.
+
+Every case runs on the same synthetic data (see data.py) and is repeated several
+times. The results are written to a JSON file, and can be compared against the
+results of an earlier run to catch regressions.
+
+Run from the repository root:
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --baseline results.json
+
+The second run exits with status 1 if a case got slower than the baseline by more
+than the tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data import PERIOD_DAYS, completion_count, make_records  # noqa: E402
+from habit import Habit  # noqa: E402
+from habit_tracker import HabitTracker, parse_date  # noqa: E402
+from periods import PERIODICITIES  # noqa: E402
+from storage import load_tracker, write_tracker  # noqa: E402
+from streaks import np  # noqa: E402
+
+END = datetime(2024, 12, 31)  # Latest completion of the generated data
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+
+def bench_load_json(context):
+    parse_date.cache_clear()  # Every run parses the dates from scratch
+    return timed(HabitTracker.from_json, context["records"], context["compact"])
+
+
+def bench_load_file(context):
+    parse_date.cache_clear()
+    return timed(load_tracker, context["filename"], None, None, context["compact"])
+
+
+def bench_save_file(context):
+    tracker = HabitTracker.from_json(context["records"], context["compact"])
+    return timed(write_tracker, tracker, context["output"])
+
+
+def bench_mark(context):
+    tracker = HabitTracker.from_json(context["records"], context["compact"])
+    marks = [(habit.name, END + timedelta(days=PERIOD_DAYS[habit.periodicity] + 1)) for habit in tracker.get_all_habits()]
+
+    def mark():  # Includes building each habit's period and streak index on first use, like a fresh session
+        for name, date in marks:
+            tracker.mark_completed(name, date)
+    return timed(mark)
+
+
+def bench_bulk_mark(context):
+    tracker = HabitTracker()
+    for record in context["records"]["habits"]:
+        tracker.add_habit(Habit(record["name"], record["periodicity"], parse_date(record["start_date"]), compact=context["compact"]))
+    completions = {record["name"]: [parse_date(date) for date in record["completion_dates"]]
+                   for record in context["records"]["habits"]}
+    return timed(tracker.bulk_mark, completions)
+
+
+def bench_streak_cold(context):
+    tracker = HabitTracker.from_json(context["records"], context["compact"])
+    habits = tracker.get_all_habits()
+
+    def streaks():
+        for habit in habits:
+            habit.get_longest_streak()
+            habit.get_current_streak(END)
+    return timed(streaks)
+
+
+def bench_streak_warm(context):
+    tracker = HabitTracker.from_json(context["records"], context["compact"])
+    habits = tracker.get_all_habits()
+    for habit in habits:
+        habit.get_longest_streak()
+
+    def streaks():
+        for habit in habits:
+            habit.get_longest_streak()
+            habit.get_current_streak(END)
+    return timed(streaks)
+
+
+def bench_statistics(context):
+    tracker = HabitTracker.from_json(context["records"], context["compact"])
+    return timed(tracker.get_statistics, END)
+
+
+def bench_list(context):
+    tracker = HabitTracker.from_json(context["records"], context["compact"])
+
+    def list_habits():
+        for _ in range(100):
+            tracker.get_all_habits()
+            for periodicity in PERIODICITIES:
+                tracker.get_habits_by_periodicity(periodicity)
+    return timed(list_habits)
+
+
+def bench_edit(context):
+    tracker = HabitTracker.from_json(context["records"], context["compact"])
+    edits = [(habit.name, PERIODICITIES[(PERIODICITIES.index(habit.periodicity) + 1) % len(PERIODICITIES)])
+             for habit in tracker.get_all_habits()]
+
+    def edit():
+        for name, periodicity in edits:
+            tracker.edit_habit(name, new_name=name + " (edited)", new_periodicity=periodicity)
+            tracker.get_longest_streak_for_habit(name + " (edited)")  # Streaks are rebuilt for the new periodicity
+    return timed(edit)
+
+
+CASES = {
+    "load_json": bench_load_json,
+    "load_file": bench_load_file,
+    "save_file": bench_save_file,
+    "mark": bench_mark,
+    "bulk_mark": bench_bulk_mark,
+    "streak_cold": bench_streak_cold,
+    "streak_warm": bench_streak_warm,
+    "statistics": bench_statistics,
+    "list": bench_list,
+    "edit": bench_edit,
+}
+
+
+def parse_mix(value):
+    """
+    Parses a periodicity mix like "daily=0.6,weekly=0.3,monthly=0.1".
+    """
+    try:
+        mix = {periodicity: float(share) for periodicity, share in (part.split("=") for part in value.split(","))}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid mix '{value}', use e.g. daily=0.6,weekly=0.3,monthly=0.1")
+    if not set(mix) <= set(PERIOD_DAYS):
+        raise argparse.ArgumentTypeError(f"periodicities must be among {', '.join(PERIOD_DAYS)}")
+    return mix
+
+
+def run(cases, records, compact, repeat):
+    """
+    Runs the cases on the given habit records.
+
+    Returns:
+        dict: Per case the minimum and median time and all runs, in seconds.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        context = {
+            "records": records,
+            "compact": compact,
+            "filename": os.path.join(directory, "habits.json"),
+            "output": os.path.join(directory, "saved.json"),
+        }
+        write_tracker(HabitTracker.from_json(records), context["filename"])
+        results = {}
+        for name in cases:
+            runs = [CASES[name](context) for _ in range(repeat)]
+            results[name] = {"min": min(runs), "median": statistics.median(runs), "runs": runs}
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints the results next to the baseline.
+
+    Returns:
+        list: Names of the cases that got slower than the baseline by more than tolerance.
+    """
+    regressions = []
+    print(f"{'case':<12} {'min (ms)':>10} {'median (ms)':>12} {'baseline':>10} {'change':>8}")
+    for name, result in results.items():
+        line = f"{name:<12} {result['min'] * 1000:>10.2f} {result['median'] * 1000:>12.2f}"
+        before = (baseline or {}).get("results", {}).get(name)
+        if before:
+            change = result["min"] / before["min"] - 1
+            line += f" {before['min'] * 1000:>10.2f} {change:>+8.0%}"
+            if change > tolerance:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the hot paths of Habit and HabitTracker.")
+    parser.add_argument("--habits", type=int, default=1000, help="number of habits (default: 1000)")
+    parser.add_argument("--days", type=int, default=365, help="days of history per habit (default: 365)")
+    parser.add_argument("--mix", type=parse_mix, default={"daily": 0.6, "weekly": 0.3, "monthly": 0.1},
+                        help="share of habits per periodicity (default: daily=0.6,weekly=0.3,monthly=0.1)")
+    parser.add_argument("--gap-density", type=float, default=0.1, help="probability that a period is missed (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--compact", action="store_true", help="use compact completion storage")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case, the fastest counts (default: 5)")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"comma separated cases (default: all of {', '.join(CASES)})")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="slowdown against the baseline that counts as a regression (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    cases = args.cases.split(",")
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+    parameters = {"habits": args.habits, "days": args.days, "mix": args.mix, "gap_density": args.gap_density,
+                  "seed": args.seed, "compact": args.compact}
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        if baseline.get("parameters") != parameters:
+            print("Warning: the baseline was run with other parameters, the comparison is not meaningful.")
+
+    records = make_records(args.habits, args.days, args.mix, args.gap_density, args.seed)
+    print(f"{args.habits} habits, {completion_count(records)} completions, {args.repeat} runs per case")
+    results = run(cases, records, args.compact, args.repeat)
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "numpy": np.__version__ if np is not None else None,
+                "parameters": parameters,
+                "results": results,
+            }, f, indent=4)
+    if regressions:
+        print(f"Slower than the baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
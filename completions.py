@@ -0,0 +1,110 @@
+from array import array
+from bisect import bisect_left, insort
+from collections.abc import Sequence
+from datetime import datetime
+
+
+class CompactCompletions(Sequence):
+    """
+    Memory efficient storage of completion dates.
+
+    Completions are kept as a sorted array of day ordinals (4 bytes each) instead
+    of a list of datetime objects. The object behaves like a read-only list of
+    datetimes, which are only created when an item is accessed, so it can be
+    returned directly as a view of the completion history.
+
+    Only the day of a completion is stored, the time of day is dropped.
+    """
+    def __init__(self, ordinals=()):
+        """
+        Creates the storage from day ordinals.
+
+        Args:
+            ordinals (iterable of int): Day ordinals in any order.
+        """
+        self.ordinals = array("i", sorted(ordinals))
+
+    @classmethod
+    def from_sorted(cls, ordinals):
+        """
+        Wraps an array('i') of day ordinals that is already sorted, without copying it.
+
+        Args:
+            ordinals (array): Sorted day ordinals.
+        """
+        completions = cls()
+        completions.ordinals = ordinals
+        return completions
+
+    @classmethod
+    def from_dates(cls, dates):
+        """
+        Creates the storage from datetime objects.
+
+        Args:
+            dates (iterable of datetime): Completion dates in any order.
+        """
+        return cls(date.toordinal() for date in dates)
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [datetime.fromordinal(ordinal) for ordinal in self.ordinals[index]]
+        return datetime.fromordinal(self.ordinals[index])
+
+    def __iter__(self):
+        return (datetime.fromordinal(ordinal) for ordinal in self.ordinals)
+
+    def __contains__(self, date):
+        if not isinstance(date, datetime):
+            return False
+        return date == datetime.fromordinal(date.toordinal()) and self.any_between(date.toordinal(), date.toordinal() + 1)
+
+    def __eq__(self, other):
+        if isinstance(other, CompactCompletions):
+            return self.ordinals == other.ordinals
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"CompactCompletions({[date.strftime('%Y-%m-%d') for date in self]})"
+
+    def append(self, date):
+        """
+        Adds a completion date, keeping the ordinals sorted.
+
+        Args:
+            date (datetime): The date of completion.
+        """
+        insort(self.ordinals, date.toordinal())
+
+    def extend(self, dates):
+        """
+        Adds many completion dates, merging them into the sorted ordinals in one pass.
+
+        Args:
+            dates (iterable of datetime): Dates of completion in any order.
+        """
+        added = sorted(date.toordinal() for date in dates)
+        if added and self.ordinals and added[0] < self.ordinals[-1]:
+            # Two sorted runs, which sorted() merges in linear time
+            self.ordinals = array("i", sorted(self.ordinals + array("i", added)))
+        else:
+            self.ordinals.extend(added)
+
+    def any_between(self, first, last):
+        """
+        Checks if any completion falls in the half-open range of day ordinals [first, last).
+
+        Args:
+            first (int): First day ordinal of the range.
+            last (int): Day ordinal right after the range.
+
+        Returns:
+            bool: True if there is a completion inside the range.
+        """
+        i = bisect_left(self.ordinals, first)
+        return i < len(self.ordinals) and self.ordinals[i] < last
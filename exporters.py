@@ -0,0 +1,220 @@
+"""
+Streaming exports of completion histories and statistics.
+
+Every exporter is a generator that yields the output piece by piece, one habit
+and one completion at a time, so a tracker of any size is exported in constant
+memory and the output can be piped straight into other tools. The CSV and NDJSON
+completion exports use the columns read by importers.py.
+"""
+import csv
+import io
+import json
+from analytics import STATISTICS_COLUMNS, get_statistics
+from storage import format_ordinal, iter_json_chunks
+
+EXPORT_FORMATS = ("json", "compact", "ndjson", "csv")
+COMPLETION_COLUMNS = ("name", "date", "periodicity", "start_date")
+
+
+def _iter_ordinals(habit):
+    """
+    Yields the day ordinals of a habit's completions in the order they are stored.
+    """
+    if habit.compact:
+        return iter(habit.completion_dates.ordinals)
+    return (date.toordinal() for date in habit.completion_dates)
+
+
+def iter_json(habit_tracker):
+    """
+    Yields the tracker in the layout of habits.json, one completion at a time.
+
+    The output is the same as json.dump(habit_tracker.to_json(), f, indent=4), but
+    no habit's completion list is ever built in memory.
+
+    Args:
+        habit_tracker (HabitTracker): The tracker to export.
+
+    Yields:
+        str: Consecutive parts of the document.
+    """
+    yield '{\n    "habits": ['
+    empty = True
+    for habit in habit_tracker.get_all_habits():
+        yield (
+            ("\n" if empty else ",\n")
+            + "        {\n"
+            + f'            "name": {json.dumps(habit.name)},\n'
+            + f'            "periodicity": {json.dumps(habit.periodicity)},\n'
+            + f'            "start_date": "{habit.start_date.strftime("%Y-%m-%d")}",\n'
+            + '            "completion_dates": ['
+        )
+        first = True
+        for ordinal in _iter_ordinals(habit):
+            yield f'\n                "{format_ordinal(ordinal)}"' if first else f',\n                "{format_ordinal(ordinal)}"'
+            first = False
+        yield "]\n        }" if first else "\n            ]\n        }"
+        empty = False
+    yield "]\n}" if empty else "\n    ]\n}"
+
+
+def iter_ndjson(habit_tracker):
+    """
+    Yields one JSON line per completion with the name, date, periodicity and start date of the habit.
+
+    A habit without completions is written as a single line with a null date, so no
+    habit is left out.
+
+    Args:
+        habit_tracker (HabitTracker): The tracker to export.
+
+    Yields:
+        str: Lines ending with a newline.
+    """
+    for habit in habit_tracker.get_all_habits():
+        # Everything but the date is the same for all lines of a habit
+        prefix = '{"name": ' + json.dumps(habit.name) + ', "date": '
+        suffix = (', "periodicity": ' + json.dumps(habit.periodicity)
+                  + ', "start_date": "' + habit.start_date.strftime("%Y-%m-%d") + '"}\n')
+        empty = True
+        for ordinal in _iter_ordinals(habit):
+            yield f'{prefix}"{format_ordinal(ordinal)}"{suffix}'
+            empty = False
+        if empty:
+            yield f"{prefix}null{suffix}"
+
+
+def _csv_line(values):
+    """
+    Formats one CSV line, quoting values where needed.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(values)
+    return buffer.getvalue()
+
+
+def _csv_field(value):
+    """
+    Formats a single CSV value, quoting it if needed.
+    """
+    return _csv_line([value])[:-1]
+
+
+def iter_csv(habit_tracker):
+    """
+    Yields a CSV file with one row per completion and the columns in COMPLETION_COLUMNS.
+
+    A habit without completions is written as a single row with an empty date.
+
+    Args:
+        habit_tracker (HabitTracker): The tracker to export.
+
+    Yields:
+        str: Lines ending with a newline, starting with the header.
+    """
+    yield _csv_line(COMPLETION_COLUMNS)
+    for habit in habit_tracker.get_all_habits():
+        # Only the date differs between the rows of a habit, and it never needs quoting
+        prefix = _csv_field(habit.name)
+        suffix = f"{_csv_field(habit.periodicity)},{habit.start_date.strftime('%Y-%m-%d')}\n"
+        empty = True
+        for ordinal in _iter_ordinals(habit):
+            yield f"{prefix},{format_ordinal(ordinal)},{suffix}"
+            empty = False
+        if empty:
+            yield f"{prefix},,{suffix}"
+
+
+def _iter_statistics(habit_tracker, format, as_of, chunk_size):
+    """
+    Yields the statistics in a supported format, see iter_statistics.
+    """
+    habits = habit_tracker.get_all_habits()
+    if format == "csv":
+        yield _csv_line(STATISTICS_COLUMNS)
+    elif format == "json":
+        yield '{\n    "statistics": ['
+    first = True
+    for start in range(0, len(habits), chunk_size):
+        columns = get_statistics(habits[start:start + chunk_size], as_of)
+        for row in zip(*(columns[column] for column in STATISTICS_COLUMNS)):
+            if format == "csv":
+                yield _csv_line(row)
+            else:
+                line = json.dumps(dict(zip(STATISTICS_COLUMNS, row)))
+                if format == "ndjson":
+                    yield line + "\n"
+                else:
+                    yield ("\n        " if first else ",\n        ") + line
+            first = False
+    if format == "json":
+        yield "]\n}" if first else "\n    ]\n}"
+
+
+def iter_statistics(habit_tracker, format="csv", as_of=None, chunk_size=1000):
+    """
+    Yields the statistics of every habit, see analytics.get_statistics.
+
+    The statistics are computed for chunk_size habits at a time, so memory use
+    doesn't grow with the number of habits.
+
+    Args:
+        habit_tracker (HabitTracker): The tracker to export.
+        format (str, optional): "csv", "ndjson" or "json".
+        as_of (datetime, optional): Date used for current streaks and completion rates, defaults to now.
+        chunk_size (int, optional): Number of habits analysed together.
+
+    Yields:
+        str: Consecutive parts of the output.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if format not in ("csv", "ndjson", "json"):
+        raise ValueError(f"Unsupported statistics format: '{format}'. Must be one of: csv, ndjson, json.")
+    return _iter_statistics(habit_tracker, format, as_of, chunk_size)
+
+
+def iter_export(habit_tracker, format="json"):
+    """
+    Yields the completion history of the tracker in the given format.
+
+    Args:
+        habit_tracker (HabitTracker): The tracker to export.
+        format (str, optional): "json", "compact" (see storage.iter_json_chunks), "ndjson" or "csv".
+
+    Yields:
+        str: Consecutive parts of the output.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if format == "json":
+        return iter_json(habit_tracker)
+    if format == "compact":
+        return iter_json_chunks(habit_tracker, "compact")
+    if format == "ndjson":
+        return iter_ndjson(habit_tracker)
+    if format == "csv":
+        return iter_csv(habit_tracker)
+    raise ValueError(f"Unsupported export format: '{format}'. Must be one of: {', '.join(EXPORT_FORMATS)}.")
+
+
+def export(habit_tracker, file, format="json", statistics=False, as_of=None):
+    """
+    Writes the completion history, or the statistics, of the tracker to a file-like object.
+
+    Args:
+        habit_tracker (HabitTracker): The tracker to export.
+        file: Text file object to write to, e.g. sys.stdout.
+        format (str, optional): See iter_export, or iter_statistics if statistics is True.
+        statistics (bool, optional): Export the statistics of every habit instead of the completions.
+        as_of (datetime, optional): Date used for the statistics, defaults to now.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    chunks = iter_statistics(habit_tracker, format, as_of) if statistics else iter_export(habit_tracker, format)
+    write = file.write
+    for chunk in chunks:
+        write(chunk)
@@ -1,4 +1,8 @@
+import threading
 from datetime import datetime, timedelta
+from completions import CompactCompletions
+from periods import period_index, period_start_ordinal
+from streaks import StreakIndex
 
 class Habit:
     """
@@ -7,7 +11,7 @@ class Habit:
     The class handles habit tracking with different periodicities (daily, weekly, or monthly)
     and provides functionality to mark completions and calculate streaks.
     """
-    def __init__(self, name, periodicity, start_date):
+    def __init__(self, name, periodicity, start_date, compact=False):
 
         """ Initializes a Habit object.
 
@@ -15,6 +19,9 @@ class Habit:
             name (str): The name of the habit.
             periodicity (str): The periodicity of the habit (e.g., "daily", "weekly", "monthly").
             start_date (date): The date when the habit tracking started.
+            compact (bool, optional): Store completions as a sorted array of day ordinals
+                instead of a list of datetime objects. Uses far less memory for long histories,
+                but only keeps the day of each completion.
 
         Raises:
             ValueError: If name or periodicity is empty or not a string, or if start_date is not a datetime object.
@@ -29,9 +36,150 @@ class Habit:
             raise ValueError("Start date must be a datetime object.")
 
         self.name = name
-        self.periodicity = periodicity
-        self.start_date = start_date
-        self.completion_dates = []
+        self._periodicity = periodicity
+        self._start_date = start_date
+        self.compact = compact
+        self._completion_dates = CompactCompletions() if compact else []
+        self._loader = None  # Loads the completion dates on first access, see defer_completions
+        self._completed_periods = set()  # Period indices of all completions, used for duplicate detection
+        self._streaks = StreakIndex()  # Runs of consecutive completed periods, kept up to date on every completion
+        # Statistics by period index of their as_of date, filled by analytics.get_statistics and replaced
+        # by an empty dict on every change, so results computed from the old completions never end up in it
+        self.statistics_cache = {}
+        self._lock = None  # Set by make_thread_safe
+
+    @property
+    def periodicity(self):
+        """
+        The periodicity of the habit ("daily", "weekly", or "monthly").
+        """
+        return self._periodicity
+
+    @periodicity.setter
+    def periodicity(self, periodicity):
+        self._periodicity = periodicity
+        self._completed_periods = None  # Period buckets depend on periodicity, rebuilt on next use
+        self._streaks = None
+        self.statistics_cache = {}
+
+    @property
+    def start_date(self):
+        """
+        The date when the habit tracking started.
+        """
+        return self._start_date
+
+    @start_date.setter
+    def start_date(self, start_date):
+        self._start_date = start_date
+        self.statistics_cache = {}  # Completion rates count the periods since the start
+
+    @property
+    def completion_dates(self):
+        """
+        List of datetime objects representing completion dates.
+
+        For compact habits this is a sorted read-only view that creates the datetime
+        objects on access. Assigning a new list rebuilds the period index. Use
+        mark_completed to add single completions instead of appending to this list directly.
+        """
+        if self._loader is not None:
+            loader = self._loader
+            self._loader = None
+            self.completion_dates = loader()
+        return self._completion_dates
+
+    @completion_dates.setter
+    def completion_dates(self, dates):
+        self._loader = None
+        if self.compact:
+            self._completion_dates = dates if isinstance(dates, CompactCompletions) else CompactCompletions.from_dates(dates)
+        else:
+            self._completion_dates = list(dates)
+        self._completed_periods = None
+        self._streaks = None
+        self.statistics_cache = {}
+
+    def defer_completions(self, loader):
+        """
+        Defers loading the completion dates until they are first accessed.
+
+        Args:
+            loader (callable): Called without arguments on first access, returns the
+                completion dates in any form accepted by the completion_dates setter.
+        """
+        self._loader = loader
+        self._completed_periods = None
+        self._streaks = None
+        self.statistics_cache = {}
+
+    def make_thread_safe(self):
+        """
+        Guards the habit with a lock, so it can be marked and read from many threads.
+
+        Marking, editing and the streak methods then run one at a time, and
+        get_completion_dates returns a copy. Assigning to the properties is not guarded.
+        Habits that are not thread-safe don't pay for the lock at all.
+        """
+        if self._lock is None:
+            self._lock = threading.RLock()
+            self.__class__ = _ThreadSafeHabit
+
+    @property
+    def thread_safe(self):
+        """
+        True if the habit was made thread-safe, see make_thread_safe.
+        """
+        return self._lock is not None
+
+    def copy(self):
+        """
+        Returns a copy of the habit with its own completion dates, which is not thread-safe.
+        """
+        habit = Habit(self.name, self._periodicity, self._start_date, compact=self.compact)
+        dates = self.completion_dates
+        habit.completion_dates = CompactCompletions.from_sorted(dates.ordinals[:]) if self.compact else dates
+        return habit
+
+    @property
+    def loaded(self):
+        """
+        False while the completion dates are still waiting to be loaded, see defer_completions.
+        """
+        return self._loader is None
+
+    def _get_completed_periods(self):
+        """
+        Returns the set of period indices the habit was completed in, rebuilding it if needed.
+        """
+        if self._completed_periods is None:
+            self._completed_periods = {period_index(date, self._periodicity) for date in self.completion_dates}
+        return self._completed_periods
+
+    def _is_period_completed(self, period):
+        """
+        Checks if the habit was already completed in the given period.
+
+        Compact habits search the sorted day ordinals instead of keeping a set of
+        periods, which would take more memory than the completions themselves.
+        """
+        if self.compact:
+            return self.completion_dates.any_between(
+                period_start_ordinal(period, self._periodicity),
+                period_start_ordinal(period + 1, self._periodicity)
+            )
+        return period in self._get_completed_periods()
+
+    def _get_streaks(self):
+        """
+        Returns the streak index of the habit, rebuilding it if needed.
+        """
+        if self._streaks is None:
+            if self.compact:
+                self._streaks = StreakIndex.from_ordinals(self.completion_dates.ordinals, self._periodicity)
+            else:
+                self._streaks = StreakIndex(self._get_completed_periods())
+        return self._streaks
 
     def mark_completed(self, date):
         """
@@ -49,25 +197,76 @@ class Habit:
         """
         if not isinstance(date, datetime):
             raise ValueError("Completion date must be a datetime object.")
-        if date < self.start_date:
+        if date < self._start_date:
             raise ValueError("Completion date cannot be earlier than the start date.")
 
-        # Check for duplicate based on periodicity
-        for existing in self.completion_dates:
-            if self.periodicity == "daily":
-                if existing.date() == date.date():
-                    raise ValueError("Habit already marked as completed on this day.")
-            elif self.periodicity == "weekly":
-                year1, week1, _ = existing.isocalendar()
-                year2, week2, _ = date.isocalendar()
-                if year1 == year2 and week1 == week2:
-                    raise ValueError("Habit already marked as completed during this week.")
-            elif self.periodicity == "monthly":
-                if existing.year == date.year and existing.month == date.month:
-                    raise ValueError("Habit already marked as completed during this month.")
-            else:
-                raise ValueError(f"Unsupported periodicity: {self.periodicity}")
+        # Check for duplicate based on periodicity, every period maps to a single index
+        period = period_index(date, self._periodicity)
+        if self._is_period_completed(period):
+            raise ValueError(self._duplicate_message())
+        if not self.compact:
+            self._get_completed_periods().add(period)
+        self._get_streaks().add(period)
         self.completion_dates.append(date)
+        self.statistics_cache = {}
+
+    def _duplicate_message(self):
+        """
+        Returns the error message for a completion in a period that is already completed.
+        """
+        if self._periodicity == "daily":
+            return "Habit already marked as completed on this day."
+        elif self._periodicity == "weekly":
+            return "Habit already marked as completed during this week."
+        else:
+            return "Habit already marked as completed during this month."
+
+    def mark_completed_many(self, dates):
+        """
+        Mark the habit as completed on many dates at once.
+
+        The dates are checked with the same rules as in mark_completed, but a rejected
+        date doesn't stop the others: every rejected date is reported and all valid
+        dates are added. The dates are sorted by period once, so duplicates within the
+        batch are neighbours, and the accepted dates are merged into the completions
+        in a single pass.
+
+        Args:
+            dates (iterable of datetime): The dates of completion, in any order.
+
+        Returns:
+            list: A (position, date, reason) tuple for every rejected date, ordered by
+            the position of the date in dates.
+        """
+        rejected = []
+        candidates = []
+        for position, date in enumerate(dates):
+            if not isinstance(date, datetime):
+                rejected.append((position, date, "Completion date must be a datetime object."))
+            elif date < self._start_date:
+                rejected.append((position, date, "Completion date cannot be earlier than the start date."))
+            else:
+                candidates.append((period_index(date, self._periodicity), position, date))
+        candidates.sort()
+
+        accepted = []
+        previous = None
+        for period, position, date in candidates:
+            if period == previous or self._is_period_completed(period):
+                rejected.append((position, date, self._duplicate_message()))
+            else:
+                accepted.append((position, period, date))
+            previous = period
+
+        if accepted:
+            accepted.sort()  # Completions are added in the order they were given
+            if not self.compact:
+                self._get_completed_periods().update(period for _, period, _ in accepted)
+            self.completion_dates.extend(date for _, _, date in accepted)
+            self._streaks = None  # Rebuilt once on next use instead of once per date
+            self.statistics_cache = {}
+        rejected.sort(key=lambda rejection: rejection[0])
+        return rejected
 
 
     def get_completion_dates(self):
@@ -75,7 +274,8 @@ class Habit:
         Return a list of all dates when the habit was completed.
 
         Returns:
-            list: List of datetime objects representing completion dates.
+            list: List of datetime objects representing completion dates, or a lazy
+            CompactCompletions view for compact habits. A thread-safe habit returns a copy.
         """
         return self.completion_dates
 
@@ -84,6 +284,8 @@ class Habit:
         Calculate the longest consecutive streak of habit completion.
         The streak is calculated based on the habit's periodicity (daily, weekly, or monthly).
 
+        Streaks are maintained as completions are added, so this is a constant time lookup.
+
         Returns:
             int: The number of consecutive periods the habit was completed.
 
@@ -92,47 +294,69 @@ class Habit:
         """
         if not self.completion_dates:
             return 0
+        return self._get_streaks().longest
 
-        sorted_dates = sorted(self.completion_dates)
-        current_streak = 1
-        longest_streak = 1
+    def get_current_streak(self, as_of=None):
+        """
+        Calculate the streak that is still running on the given date.
 
-        if self.periodicity == "daily":
-            for i in range(1, len(sorted_dates)):
-                if (sorted_dates[i] - sorted_dates[i - 1]).days == 1:
-                    current_streak += 1
-                    longest_streak = max(longest_streak, current_streak)
-                else:
-                    current_streak = 1
-        elif self.periodicity == "weekly":
-            for i in range(1, len(sorted_dates)):
-                if (
-                        (sorted_dates[i].isocalendar().year == sorted_dates[i - 1].isocalendar().year and   # Checks if year of a current completion date is equal to the year of the previous
-                                    sorted_dates[i].isocalendar().week == sorted_dates[i - 1].isocalendar().week + 1) # And the number of a calendar week of the last data is equal to the number of the previous with "1" added
-                        or
-                        (sorted_dates[i].isocalendar().year == sorted_dates[i - 1].isocalendar().year + 1 and    # Handles the case when two completion dates are in the end of the year
-                                    sorted_dates[i].isocalendar().week == 1 and sorted_dates[i - 1].isocalendar().week == 52)# and in the beginning of the next year respectively
-                ):
-                                    current_streak += 1
-                                    longest_streak = max(longest_streak, current_streak)
-                else:
-                    current_streak = 1
-        elif self.periodicity == "monthly":
-            for i in range(1, len(sorted_dates)):
-                y1, m1 = sorted_dates[i - 1].year, sorted_dates[i - 1].month
-                y2, m2 = sorted_dates[i].year, sorted_dates[i].month
-                months_diff = (y2 - y1) * 12 + (m2 - m1) # total number of months between dates
-                if months_diff == 1:
-                    current_streak += 1
-                    longest_streak = max(longest_streak, current_streak)
-                else:
-                    current_streak = 1
+        The period containing as_of is still open, so a streak that ended in the
+        previous period is not broken yet.
 
-        else:
-                       raise ValueError(f"Unsupported periodicity: {self.periodicity}") # Code will rise an error
-                       # if periodicity is different from the defined periodicity types
+        Args:
+            as_of (datetime, optional): The date to check, defaults to now.
+
+        Returns:
+            int: The number of consecutive periods up to the current one.
 
-        return longest_streak
+        Raises:
+            ValueError: If as_of is not a datetime object or the periodicity is not supported.
+        """
+        if as_of is None:
+            as_of = datetime.now()
+        if not isinstance(as_of, datetime):
+            raise ValueError("Date must be a datetime object.")
+        if not self.completion_dates:
+            return 0
+        return self._get_streaks().current(period_index(as_of, self._periodicity))
+
+    def get_next_due_date(self):
+        """
+        Return the first day of the earliest period the habit still has to be completed in.
+
+        That is the period after the latest completion, or the start date for a habit
+        without completions. Periods left out before the latest completion are not
+        considered, they can no longer keep a streak alive.
+
+        Returns:
+            datetime: Midnight of the day the habit is due from.
+        """
+        start = self._start_date.toordinal()
+        if not self.completion_dates:
+            return datetime.fromordinal(start)
+        next_period = self._get_streaks().last + 1
+        return datetime.fromordinal(max(start, period_start_ordinal(next_period, self._periodicity)))
+
+    def count_completed_periods(self, as_of=None):
+        """
+        Count the periods the habit was completed in, up to and including the period of as_of.
+
+        Args:
+            as_of (datetime, optional): The last date to count, defaults to now.
+
+        Returns:
+            int: The number of completed periods.
+
+        Raises:
+            ValueError: If as_of is not a datetime object or the periodicity is not supported.
+        """
+        if as_of is None:
+            as_of = datetime.now()
+        if not isinstance(as_of, datetime):
+            raise ValueError("Date must be a datetime object.")
+        if not self.completion_dates:
+            return 0
+        return self._get_streaks().count_until(period_index(as_of, self._periodicity))
 
     def get_streak_duration_string(self, streak):
         """
@@ -191,3 +415,45 @@ class Habit:
         """
 
         return f"Habit(name='{self.name}', periodicity='{self.periodicity}', start_date='{self.start_date.strftime('%Y-%m-%d')}')"
+
+
+class _ThreadSafeHabit(Habit):
+    """
+    A habit after make_thread_safe, whose methods hold the habit's lock.
+    """
+    def mark_completed(self, date):
+        with self._lock:
+            super().mark_completed(date)
+
+    def mark_completed_many(self, dates):
+        with self._lock:
+            return super().mark_completed_many(dates)
+
+    def get_completion_dates(self):
+        with self._lock:
+            dates = self.completion_dates
+            return CompactCompletions.from_sorted(dates.ordinals[:]) if self.compact else list(dates)
+
+    def get_longest_streak(self):
+        with self._lock:
+            return super().get_longest_streak()
+
+    def get_current_streak(self, as_of=None):
+        with self._lock:
+            return super().get_current_streak(as_of)
+
+    def get_next_due_date(self):
+        with self._lock:
+            return super().get_next_due_date()
+
+    def count_completed_periods(self, as_of=None):
+        with self._lock:
+            return super().count_completed_periods(as_of)
+
+    def edit_habit(self, name=None, periodicity=None, start_date=None):
+        with self._lock:
+            super().edit_habit(name, periodicity, start_date)
+
+    def copy(self):
+        with self._lock:
+            return super().copy()
@@ -1,17 +1,116 @@
 import json
+import sys
+import threading
 from datetime import datetime
+from functools import lru_cache
+from itertools import accumulate
+from completions import CompactCompletions
 from habit import Habit
+from analytics import get_statistics
+from due import DueIndex
+from locks import ReadWriteLock
+from snapshot import SnapshotReader, write_snapshot
+
+
+@lru_cache(maxsize=65536)
+def parse_date(date_str):
+    """
+    Parses a "YYYY-MM-DD" date string into a datetime object.
+
+    Uses datetime.fromisoformat, which is much faster than strptime, and falls back
+    to strptime for anything else. The same dates repeat across habits, and datetime
+    objects are immutable, so parsed dates are cached and shared.
+
+    Args:
+        date_str (str): The date string.
+
+    Returns:
+        datetime: The date at midnight.
+
+    Raises:
+        ValueError: If the string is not a valid date.
+    """
+    if len(date_str) == 10 and date_str[4] == "-" and date_str[7] == "-":
+        try:
+            return datetime.fromisoformat(date_str)
+        except ValueError:
+            pass
+    return datetime.strptime(date_str, "%Y-%m-%d")
 
 
 class HabitTracker:
     """
     Manages multiple Habit objects.
+
+    Habits are indexed by name and by periodicity, so looking up, editing and deleting
+    a habit doesn't scan the whole list. Habit names must be unique, and habits should
+    be renamed or given a new periodicity through edit_habit to keep the indexes in sync.
+
+    If the tracker has a storage (see storage.py), every change is reported to it, so
+    habits should also be marked as completed through the tracker's mark_completed.
+
+    A tracker can be made thread-safe (see make_thread_safe) to use it from many threads.
     """
-    def __init__(self):
+    def __init__(self, storage=None, thread_safe=False):
+        """
+        Creates empty indexes to store habits.
+
+        Args:
+            storage (Storage, optional): Storage that is told about every change.
+            thread_safe (bool, optional): Guard the tracker and its habits with locks, see make_thread_safe.
+        """
+        self.storage = storage
+        self._habits = {}  # Insertion number -> habit, keeps the order habits were added in
+        self._numbers_by_name = {}
+        self._numbers_by_periodicity = {}  # Periodicity -> set of insertion numbers
+        self._next_number = 0
+        self._due_index = None  # Built on first use, see get_due_habits
+        self._index_lock = None  # Set by make_thread_safe
+        self._storage_lock = None
+        if thread_safe:
+            self.make_thread_safe()
+
+    def make_thread_safe(self):
+        """
+        Guards the tracker and all its habits with locks, e.g. after loading it from a storage.
+
+        Adding, editing and deleting habits then hold a lock on the indexes exclusively,
+        while marking and reading only share it. Completions are reported to the storage
+        one at a time, under a storage lock. Every habit gets a lock of its own (see
+        Habit.make_thread_safe), so a period is never completed twice and streaks and
+        copies of a habit are never read halfway through a change. Trackers that are
+        not thread-safe don't pay for the locks at all.
+
+        Must be called before other threads use the tracker.
         """
-        Creates an empty list to store habits.
+        if self._index_lock is not None:
+            return
+        for habit in self._habits.values():
+            habit.make_thread_safe()
+        self._index_lock = ReadWriteLock()
+        self._storage_lock = threading.Lock()
+        self.__class__ = _ThreadSafeHabitTracker
+
+    @property
+    def thread_safe(self):
+        """
+        True if the tracker was made thread-safe, see make_thread_safe.
+        """
+        return self._index_lock is not None
+
+    def _lookup(self, habit_name):
+        """
+        Finds a habit by its name, without the lock of a thread-safe tracker.
         """
-        self.habits = []
+        number = self._numbers_by_name.get(habit_name)
+        return None if number is None else self._habits[number]
+
+    @property
+    def habits(self):
+        """
+        List of all Habit objects in the order they were added.
+        """
+        return list(self._habits.values())
 
     def add_habit(self, habit):
         """
@@ -19,10 +118,103 @@ class HabitTracker:
 
         Args:
             habit (Habit): The habit to add.
+
+        Raises:
+            TypeError: If habit is not a Habit object.
+            ValueError: If a habit with the same name already exists.
         """
         if not isinstance(habit, Habit):
             raise TypeError("habit must be a Habit object.")
-        self.habits.append(habit)
+        if habit.name in self._numbers_by_name:
+            raise ValueError(f"Habit with name '{habit.name}' already exists.")
+        number = self._next_number
+        self._next_number += 1
+        self._habits[number] = habit
+        self._numbers_by_name[habit.name] = number
+        self._numbers_by_periodicity.setdefault(habit.periodicity, set()).add(number)
+        if self._due_index is not None:
+            self._due_index.update(number, habit)
+        if self.storage is not None:
+            self.storage.habit_added(habit)
+
+    def mark_completed(self, habit_name, date):
+        """
+        Marks a habit as completed on the specified date.
+
+        Args:
+            habit_name (str): Name of the habit.
+            date (datetime): The date of completion.
+
+        Raises:
+            ValueError: If the habit doesn't exist, or the date is invalid or already completed.
+        """
+        habit = self._lookup(habit_name)
+        if habit is None:
+            raise ValueError(f"Habit with name '{habit_name}' not found.")
+        habit.mark_completed(date)
+        if self.storage is not None:
+            self._store_completion(habit, date)
+
+    def _store_completion(self, habit, date):
+        """
+        Reports a completion to the storage.
+        """
+        self.storage.habit_completed(habit, date)
+
+    def _store_completions(self, completions):
+        """
+        Reports the completions of a bulk mark to the storage, as one batch.
+
+        Args:
+            completions (list): (habit, dates) pairs of the accepted dates.
+        """
+        with self.storage.batch():
+            for habit, dates in completions:
+                self.storage.habit_completed_many(habit, dates)
+
+    def bulk_mark(self, completions):
+        """
+        Marks many habits as completed on many dates at once, see Habit.mark_completed_many.
+
+        Rejected dates don't stop the others, they are collected and returned instead.
+
+        Args:
+            completions (dict): Maps habit names to iterables of completion dates.
+
+        Returns:
+            dict: Maps the name of every habit with rejected dates to its list of
+            (position, date, reason) tuples. All dates of an unknown habit are rejected.
+        """
+        rejections = {}
+        accepted = []
+        for habit_name, dates in completions.items():
+            dates = list(dates)
+            habit = self._lookup(habit_name)
+            if habit is None:
+                reason = f"Habit with name '{habit_name}' not found."
+                rejections[habit_name] = [(position, date, reason) for position, date in enumerate(dates)]
+                continue
+            rejected = habit.mark_completed_many(dates)
+            if rejected:
+                rejections[habit_name] = rejected
+            if len(rejected) < len(dates):
+                skipped = {position for position, _, _ in rejected}
+                accepted.append((habit, [date for position, date in enumerate(dates) if position not in skipped]))
+        if accepted and self.storage is not None:
+            self._store_completions(accepted)
+        return rejections
+
+    def get_habit(self, habit_name):
+        """
+        Finds a habit by its name.
+
+        Args:
+            habit_name (str): The name of the habit.
+
+        Returns:
+            Habit object or None if not found.
+        """
+        return self._lookup(habit_name)
 
     def get_all_habits(self):
         """
@@ -48,18 +240,89 @@ class HabitTracker:
         valid_periodicities = ["daily", "weekly", "monthly"]
         if periodicity not in valid_periodicities:
             raise ValueError(f"Invalid periodicity: '{periodicity}'. Must be one of: {', '.join(valid_periodicities)}.")
-        return [habit for habit in self.habits if habit.periodicity == periodicity]
+        numbers = sorted(self._numbers_by_periodicity.get(periodicity, ()))
+        return [self._habits[number] for number in numbers]
 
-    def get_longest_streak_all_habits(self):
+    def get_longest_streak_all_habits(self, executor=None):
         """
         Finds the longest streak among all habits.
 
+        Args:
+            executor (AnalyticsExecutor, optional): Compute the streaks in its worker processes.
+
         Returns:
             Longest streak as integer.
         """
-        if not self.habits:
+        habits = self.habits
+        if not habits:
             return 0
-        return max(habit.get_longest_streak() for habit in self.habits)
+        if executor is not None:
+            return max(executor.longest_streaks(habits))
+        return max(habit.get_longest_streak() for habit in habits)
+
+    def get_statistics(self, as_of=None, executor=None):
+        """
+        Calculates streaks and completion rates for all habits at once.
+
+        Args:
+            as_of (datetime, optional): Date used for current streaks and completion rates, defaults to now.
+            executor (AnalyticsExecutor, optional): Compute the statistics missing from the caches in its worker processes.
+
+        Returns:
+            dict: One list per statistic ("name", "periodicity", "longest_streak",
+            "current_streak", "completions", "completion_rate"), in the order of the habits.
+        """
+        return get_statistics(self.habits, as_of, executor=executor)
+
+    def _get_due_index(self):
+        """
+        Returns the due index of the habits, building it if needed.
+        """
+        if self._due_index is None:
+            self._due_index = DueIndex(self._habits.items())
+        return self._due_index
+
+    def get_due_habits(self, as_of=None):
+        """
+        Finds the habits that still have to be completed in the period of a date.
+
+        The habits are kept in an index ordered by the day they are due from (see
+        due.py), built the first time it is needed and kept up to date afterwards,
+        so only the habits that are due are looked at.
+
+        Args:
+            as_of (datetime, optional): The date to check, defaults to now.
+
+        Returns:
+            list: The due Habit objects, those due for the longest time first.
+
+        Raises:
+            ValueError: If as_of is not a datetime object.
+        """
+        if as_of is None:
+            as_of = datetime.now()
+        if not isinstance(as_of, datetime):
+            raise ValueError("Date must be a datetime object.")
+        return self._get_due_index().due(as_of)
+
+    def get_habits_at_risk(self, as_of=None):
+        """
+        Finds the due habits whose current streak breaks if they are not completed in the period of a date.
+
+        Args:
+            as_of (datetime, optional): The date to check, defaults to now.
+
+        Returns:
+            list: The Habit objects at risk, those due for the longest time first.
+
+        Raises:
+            ValueError: If as_of is not a datetime object.
+        """
+        if as_of is None:
+            as_of = datetime.now()
+        if not isinstance(as_of, datetime):
+            raise ValueError("Date must be a datetime object.")
+        return self._get_due_index().at_risk(as_of)
 
     def get_longest_streak_for_habit(self, habit_name):
         """
@@ -73,10 +336,10 @@ class HabitTracker:
         """
         if not isinstance(habit_name, str) or not habit_name.strip():
             raise ValueError("Habit name must be a non-empty string.")
-        for habit in self.habits:
-            if habit.name == habit_name:
-                return habit.get_longest_streak()
-        return 0
+        habit = self.get_habit(habit_name)
+        if habit is None:
+            return 0
+        return habit.get_longest_streak()
 
     def edit_habit(self, habit_name, new_name=None, new_periodicity=None, new_start_date=None):
         """
@@ -90,27 +353,31 @@ class HabitTracker:
         """
         if not isinstance(habit_name, str) or not habit_name.strip():
             raise ValueError("Habit name must be a non-empty string.")
-        for habit in self.habits:
-            if habit.name == habit_name:
-                if new_name is not None:
-                    if not isinstance(new_name, str) or not new_name.strip():
-                         raise ValueError("Habit name must be a non-empty string.")
-                    habit.name = new_name
-                if new_periodicity is not None:
-                    if not isinstance(new_periodicity, str) or not new_periodicity.strip():
-                        raise ValueError("Habit periodicity must be a non-empty string.")
-                    habit.periodicity = new_periodicity
-                if new_start_date is not None:
-                    if not isinstance(new_start_date, datetime):
-                        raise ValueError("Start date must be a datetime object.")
-                    habit.start_date = new_start_date
-                    # Remove completion dates before new start date
-                    if habit.completion_dates and any(date < new_start_date for date in habit.completion_dates):
-                         habit.completion_dates = [
-                            date for date in habit.completion_dates if date >= new_start_date
-                        ]
-                return
-        raise ValueError(f"Habit with name '{habit_name}' not found.")
+        number = self._numbers_by_name.get(habit_name)
+        if number is None:
+            raise ValueError(f"Habit with name '{habit_name}' not found.")
+        if new_name is not None and (not isinstance(new_name, str) or not new_name.strip()):
+            raise ValueError("Habit name must be a non-empty string.")  # Checked before the lookup, which needs a hashable name
+        if new_name is not None and new_name != habit_name and new_name in self._numbers_by_name:
+            raise ValueError(f"Habit with name '{new_name}' already exists.")
+
+        habit = self._habits[number]
+        old_periodicity = habit.periodicity
+        try:
+            # Habit validates the values and removes completions before the new start date
+            habit.edit_habit(name=new_name, periodicity=new_periodicity, start_date=new_start_date)
+        finally:
+            # Values may have changed even if a later one was invalid, so always re-index
+            if habit.name != habit_name:
+                del self._numbers_by_name[habit_name]
+                self._numbers_by_name[habit.name] = number
+            if habit.periodicity != old_periodicity:
+                self._numbers_by_periodicity[old_periodicity].discard(number)
+                self._numbers_by_periodicity.setdefault(habit.periodicity, set()).add(number)
+            if self._due_index is not None:
+                self._due_index.update(number, habit)
+            if self.storage is not None:
+                self.storage.habit_edited(habit_name, habit)
 
     def delete_habit(self, habit_name):
         """
@@ -121,11 +388,39 @@ class HabitTracker:
         """
         if not isinstance(habit_name, str) or not habit_name.strip():
             raise ValueError("Habit name must be a non-empty string.")
-        for index, habit in enumerate(self.habits):
-            if habit.name == habit_name:
-                del self.habits[index]
-                return
-        raise ValueError(f"Habit with name '{habit_name}' not found.")
+        number = self._numbers_by_name.pop(habit_name, None)
+        if number is None:
+            raise ValueError(f"Habit with name '{habit_name}' not found.")
+        habit = self._habits.pop(number)
+        self._numbers_by_periodicity[habit.periodicity].discard(number)
+        if self._due_index is not None:
+            self._due_index.discard(number)
+        if self.storage is not None:
+            self.storage.habit_deleted(habit_name)
+
+    def flush(self):
+        """
+        Makes sure all changes are saved to the storage, see Storage.flush.
+        """
+        if self.storage is not None:
+            self.storage.flush(self)
+
+    def snapshot(self):
+        """
+        Returns a copy of the tracker with copies of all habits, without a storage.
+
+        Each habit of a thread-safe tracker is copied while holding only its own lock,
+        so the copy can be read, analysed or saved at leisure without blocking the
+        threads that keep changing the tracker. Every habit is copied in a consistent
+        state, but habits are copied one after the other.
+
+        Returns:
+            HabitTracker instance.
+        """
+        habit_tracker = HabitTracker()
+        for habit in self.habits:
+            habit_tracker.add_habit(habit.copy())
+        return habit_tracker
 
     def to_json(self):
         """
@@ -137,37 +432,167 @@ class HabitTracker:
                     "name": habit.name,
                     "periodicity": habit.periodicity,
                     "start_date": habit.start_date.strftime("%Y-%m-%d"),
-                    "completion_dates": [date.strftime("%Y-%m-%d") for date in habit.completion_dates]
+                    "completion_dates": [date.strftime("%Y-%m-%d") for date in habit.get_completion_dates()]
                 }
                 for habit in self.habits
             ]
         }
 
     @classmethod
-    def from_json(cls, data):
+    def from_json(cls, data, compact=False):
         """
         Creates a HabitTracker from saved data.
 
         Args:
             data (dict): Data with habits info.
+            compact (bool, optional): Create habits with compact completion storage.
+
+        Returns:
+            HabitTracker instance.
+        """
+        return cls.from_records(data.get("habits", []), compact=compact)
+
+    @classmethod
+    def from_records(cls, records, compact=False):
+        """
+        Creates a HabitTracker from habit records, building one habit at a time.
+
+        Args:
+            records (iterable of dict): Habit records in the format of to_json, e.g. from a generator.
+                Completions may also be given as "completion_days", see storage.habit_record.
+            compact (bool, optional): Create habits with compact completion storage.
 
         Returns:
             HabitTracker instance.
         """
         habit_tracker = cls()
-        for habit_data in data.get("habits", []):
+        for habit_data in records:
             try:
                 name = habit_data["name"]
                 periodicity = habit_data["periodicity"]
-                start_date = datetime.strptime(habit_data["start_date"], "%Y-%m-%d")
-                completion_dates = [
-                    datetime.strptime(date_str, "%Y-%m-%d") for date_str in habit_data.get("completion_dates", [])
-                ]
-                habit = Habit(name, periodicity, start_date)
+                start_date = parse_date(habit_data["start_date"])
+                if "completion_days" in habit_data:
+                    # Compact format: first day ordinal, then the days since the previous completion
+                    completion_dates = CompactCompletions(accumulate(habit_data["completion_days"]))
+                else:
+                    completion_dates = [parse_date(date_str) for date_str in habit_data.get("completion_dates", [])]
+                habit = Habit(name, periodicity, start_date, compact=compact)
                 habit.completion_dates = completion_dates
                 habit_tracker.add_habit(habit)
             except KeyError as e:
-                print(f"Skipping habit due to missing key: {e}")
-            except ValueError as e:
-                print(f"Skipping habit due to invalid data: {e}")
-        return habit_tracker
\ No newline at end of file
+                print(f"Skipping habit due to missing key: {e}", file=sys.stderr)
+            except (TypeError, ValueError) as e:
+                print(f"Skipping habit due to invalid data: {e}", file=sys.stderr)
+        return habit_tracker
+
+    def to_snapshot(self, filename):
+        """
+        Saves all habits to a binary snapshot file, see snapshot.py.
+
+        Args:
+            filename (str): Path of the snapshot file.
+        """
+        write_snapshot(self.get_all_habits(), filename)
+
+    @classmethod
+    def from_snapshot(cls, filename, names=None, periodicities=None, compact=False, lazy=False):
+        """
+        Creates a HabitTracker from a binary snapshot file.
+
+        Only the completions of the selected habits are decoded. In lazy mode not even
+        those are decoded: the habits are listed right away from the snapshot's directory,
+        and each habit decodes its completions from the memory mapped file the first
+        time they are accessed, so loading takes the same time and memory no matter
+        how long the completion histories are.
+
+        Args:
+            filename (str): Path of the snapshot file.
+            names (iterable of str, optional): Only load habits with these names.
+            periodicities (iterable of str, optional): Only load habits with these periodicities.
+            compact (bool, optional): Create habits with compact completion storage.
+            lazy (bool, optional): Decode the completions of each habit on first access.
+
+        Returns:
+            HabitTracker instance.
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist.
+            ValueError: If the file is not a snapshot file.
+        """
+        names = None if names is None else set(names)
+        periodicities = None if periodicities is None else set(periodicities)
+        habit_tracker = cls()
+        reader = SnapshotReader(filename)
+        for index, (name, periodicity, _, _) in enumerate(reader.entries()):
+            if (names is None or name in names) and (periodicities is None or periodicity in periodicities):
+                habit_tracker.add_habit(reader.read_habit(index, compact=compact, lazy=lazy))
+        if not lazy:
+            reader.close()  # Lazy habits keep the reader alive until they are loaded
+        return habit_tracker
+
+
+class _ThreadSafeHabitTracker(HabitTracker):
+    """
+    A tracker after make_thread_safe, whose methods hold the index and storage locks.
+    """
+    @property
+    def habits(self):
+        with self._index_lock.read():
+            return list(self._habits.values())
+
+    def add_habit(self, habit):
+        with self._index_lock.write():
+            if isinstance(habit, Habit):
+                habit.make_thread_safe()
+            super().add_habit(habit)
+
+    def mark_completed(self, habit_name, date):
+        # Holding the index lock, the habit can't be renamed before the storage knows about the completion.
+        # The habit's own lock guards checking and adding the completion, so habits are marked in parallel.
+        with self._index_lock.read():
+            super().mark_completed(habit_name, date)
+
+    def bulk_mark(self, completions):
+        with self._index_lock.read():
+            return super().bulk_mark(completions)
+
+    def _store_completion(self, habit, date):
+        with self._storage_lock:  # Storages write one change at a time
+            super()._store_completion(habit, date)
+
+    def _store_completions(self, completions):
+        with self._storage_lock:
+            super()._store_completions(completions)
+
+    def get_habit(self, habit_name):
+        with self._index_lock.read():
+            return super().get_habit(habit_name)
+
+    def get_habits_by_periodicity(self, periodicity):
+        with self._index_lock.read():
+            return super().get_habits_by_periodicity(periodicity)
+
+    def edit_habit(self, habit_name, new_name=None, new_periodicity=None, new_start_date=None):
+        with self._index_lock.write():
+            super().edit_habit(habit_name, new_name, new_periodicity, new_start_date)
+
+    def delete_habit(self, habit_name):
+        with self._index_lock.write():
+            super().delete_habit(habit_name)
+
+    def get_due_habits(self, as_of=None):
+        # Moves habits completed meanwhile in the due index, so it needs the lock exclusively
+        with self._index_lock.write():
+            return super().get_due_habits(as_of)
+
+    def get_habits_at_risk(self, as_of=None):
+        with self._index_lock.write():
+            return super().get_habits_at_risk(as_of)
+
+    def flush(self):
+        # No change runs meanwhile, so the storage sees the habits in the state of the changes reported to it
+        with self._index_lock.write():
+            super().flush()
+
+    def to_snapshot(self, filename):
+        write_snapshot([habit.copy() for habit in self.habits], filename)
@@ -0,0 +1,325 @@
+"""
+Importing completions exported from other habit trackers.
+
+Rows are read one at a time from CSV or NDJSON files and grouped by habit. Every
+batch_size completions the groups are checked and added to the tracker with
+HabitTracker.bulk_mark, so only one batch of rows is kept in memory however large
+the file is. Rows that can't be imported are collected in an ImportReport instead
+of being printed.
+"""
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from habit import Habit
+from habit_tracker import parse_date
+from periods import PERIODICITIES
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+
+class ImportReport:
+    """
+    Result of an import: what was added and which rows could not be imported.
+
+    Only the first max_errors errors are kept, so the report stays small for files
+    with millions of bad rows. error_count counts all of them.
+    """
+    def __init__(self, max_errors=1000):
+        """
+        Args:
+            max_errors (int, optional): Number of errors kept in errors.
+        """
+        self.rows = 0
+        self.habits_created = 0
+        self.completions_added = 0
+        self.error_count = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def add_error(self, row, habit, value, reason):
+        """
+        Records a row, or a single date of a row, that was not imported.
+
+        Args:
+            row (int): Line number in the file.
+            habit (str): Name of the habit, None if the row has no valid name.
+            value: The rejected value as found in the file.
+            reason (str): Why it was rejected.
+        """
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "habit": habit, "value": value, "reason": reason})
+
+    def to_dict(self):
+        """
+        Returns the report as a dict that can be saved with json.dump.
+        """
+        return {
+            "rows": self.rows,
+            "habits_created": self.habits_created,
+            "completions_added": self.completions_added,
+            "error_count": self.error_count,
+            "errors": list(self.errors),
+        }
+
+    def __repr__(self):
+        return (f"ImportReport(rows={self.rows}, habits_created={self.habits_created}, "
+                f"completions_added={self.completions_added}, error_count={self.error_count})")
+
+
+def _ndjson_row(record, keys):
+    """
+    Picks the fields of an NDJSON row, using the keys of the file.
+
+    Raises:
+        ValueError: If completion_dates is given but not a list.
+    """
+    name, date, dates, periodicity, start_date = (record.get(key) for key in keys)
+    if dates is None:
+        dates = [] if date in (None, "") else [date]
+    elif not isinstance(dates, list):
+        raise ValueError("completion_dates must be a list.")
+    return name, dates, periodicity or None, start_date or None
+
+
+def iter_csv_rows(file, columns=None):
+    """
+    Reads completion rows from a CSV file with a header line, one completion per row.
+
+    Args:
+        file: Text file object, opened with newline="".
+        columns (dict, optional): Maps the fields name, date, periodicity and start_date
+            to the column names used in the file, e.g. for exports of other apps.
+            Only name and date are required.
+
+    Yields:
+        tuple: Line number, the row as a (name, dates, periodicity, start_date) tuple,
+        and None. Periodicity and start_date are None if not given. For rows that
+        can't be read the row is None and the last item is the reason.
+
+    Raises:
+        ValueError: If the file has no name or date column.
+    """
+    columns = columns or {}
+    reader = csv.reader(file)
+    header = next(reader, [])
+    positions = []
+    for field in ("name", "date", "periodicity", "start_date"):
+        column = columns.get(field, field)
+        if column in header:
+            positions.append(header.index(column))
+        elif field in ("name", "date"):
+            raise ValueError(f"CSV file has no '{column}' column.")
+        else:
+            positions.append(None)
+    name_position, date_position, periodicity_position, start_position = positions
+    width = max(position for position in positions if position is not None) + 1
+    for record in reader:
+        if len(record) < width:
+            if record:
+                yield reader.line_num, None, "Invalid row: too few columns."
+            continue
+        date = record[date_position]
+        yield reader.line_num, (
+            record[name_position],
+            [date] if date else [],
+            record[periodicity_position] or None if periodicity_position is not None else None,
+            record[start_position] or None if start_position is not None else None,
+        ), None
+
+
+def iter_ndjson_rows(file, columns=None):
+    """
+    Reads rows from a file with one JSON object per line.
+
+    A row is either a single completion like {"name": ..., "date": ...}, or a whole
+    habit in the format of HabitTracker.to_json with a completion_dates list.
+
+    Args:
+        file: Text file object.
+        columns (dict, optional): Maps the fields name, date, completion_dates,
+            periodicity and start_date to the keys used in the file.
+
+    Yields:
+        tuple: Line number, the row as a tuple like iter_csv_rows, and None. For lines
+        that can't be read the row is None and the last item is the reason.
+    """
+    columns = columns or {}
+    keys = [columns.get(field, field) for field in ("name", "date", "completion_dates", "periodicity", "start_date")]
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Row must be a JSON object.")
+            yield number, _ndjson_row(record, keys), None
+        except ValueError as e:
+            yield number, None, f"Invalid row: {e}"
+
+
+def _parse_dates(start_ordinal, rows):
+    """
+    Parses the dates of one habit's rows and checks them against the start date.
+
+    Runs in a worker process when the import uses a process pool, so it only takes
+    and returns plain values.
+
+    Args:
+        start_ordinal (int): Day ordinal of the habit's start date, None to accept any date.
+        rows (list): (line number, date string) pairs.
+
+    Returns:
+        tuple: (line number, day ordinal) pairs of the valid dates, and
+        (line number, value, reason) tuples of the rejected ones.
+    """
+    accepted = []
+    rejected = []
+    for row, value in rows:
+        try:
+            ordinal = parse_date(value).toordinal()
+        except (TypeError, ValueError):
+            rejected.append((row, value, "Invalid date format. Please use YYYY-MM-DD."))
+            continue
+        if start_ordinal is not None and ordinal < start_ordinal:
+            rejected.append((row, value, "Completion date cannot be earlier than the start date."))
+        else:
+            accepted.append((row, ordinal))
+    return accepted, rejected
+
+
+def _flush(habit_tracker, groups, default_periodicity, implicit_start, report, executor):
+    """
+    Adds the completions of one batch of rows to the tracker, creating missing habits.
+    """
+    jobs = []
+    for name, group in groups.items():
+        habit = habit_tracker.get_habit(name)
+        if habit is not None and name not in implicit_start:
+            start_date = habit.start_date
+        else:
+            start_date = group["start_date"]
+        jobs.append((name, start_date.toordinal() if start_date is not None else None, group["rows"]))
+
+    if executor is not None:
+        results = executor.map(_parse_dates, [job[1] for job in jobs], [job[2] for job in jobs])
+    else:
+        results = (_parse_dates(start_ordinal, rows) for _, start_ordinal, rows in jobs)
+
+    for (name, _, _), (accepted, rejected) in zip(jobs, results):
+        for row, value, reason in rejected:
+            report.add_error(row, name, value, reason)
+        if not accepted:
+            group = groups[name]
+            if habit_tracker.get_habit(name) is not None:
+                continue
+            if group["periodicity"] is not None and group["start_date"] is not None:
+                # A habit without completions, e.g. from the dateless row exporters.py writes for it
+                habit_tracker.add_habit(Habit(name, group["periodicity"], group["start_date"]))
+                report.habits_created += 1
+            else:
+                for row in group["dateless_rows"]:
+                    report.add_error(row, name, None, "Row has no date, and no periodicity and start date to create the habit.")
+            continue
+        dates = [datetime.fromordinal(ordinal) for _, ordinal in accepted]
+        earliest = min(dates)
+        habit = habit_tracker.get_habit(name)
+        if habit is None:
+            group = groups[name]
+            start_date = group["start_date"]
+            if start_date is None:  # Starts with its earliest completion, may move back in a later batch
+                start_date = earliest
+                implicit_start.add(name)
+            habit_tracker.add_habit(Habit(name, group["periodicity"] or default_periodicity, start_date))
+            report.habits_created += 1
+        elif name in implicit_start and earliest < habit.start_date:
+            habit_tracker.edit_habit(name, new_start_date=earliest)
+
+        # Dates in periods that are already completed are rejected with the rules of Habit.mark_completed
+        rejections = habit_tracker.bulk_mark({name: dates}).get(name, ())
+        for position, date, reason in rejections:
+            report.add_error(accepted[position][0], name, date.strftime("%Y-%m-%d"), reason)
+        report.completions_added += len(dates) - len(rejections)
+
+
+def import_completions(habit_tracker, file, format="csv", columns=None, periodicity="daily",
+                       batch_size=100000, workers=None, max_errors=1000):
+    """
+    Imports completions from a CSV or NDJSON export into the tracker.
+
+    Habits that don't exist yet are created with the periodicity and start date of
+    their rows. Without them, the given periodicity is used and the habit starts with
+    its earliest imported completion. Rows without a date create a habit without
+    completions if they carry a periodicity and start date, like the rows exporters.py
+    writes for such habits, and are reported otherwise. Completions are checked like in
+    Habit.mark_completed: invalid dates, dates before the start date and a second
+    completion in the same period are skipped and reported.
+
+    Args:
+        habit_tracker (HabitTracker): The tracker to import into.
+        file: Text file object to read. CSV files should be opened with newline="".
+        format (str, optional): "csv" or "ndjson".
+        columns (dict, optional): Column names used in the file, see iter_csv_rows.
+        periodicity (str, optional): Periodicity of new habits whose rows don't have one.
+        batch_size (int, optional): Number of completions added together, bounds the memory used for rows.
+        workers (int, optional): Parse dates in a pool of this many processes, only
+            worth it for very large files.
+        max_errors (int, optional): Number of errors kept in the report.
+
+    Returns:
+        ImportReport describing the import.
+
+    Raises:
+        ValueError: If the format or periodicity is not supported, or a CSV file lacks the name or date column.
+    """
+    if format not in IMPORT_FORMATS:
+        raise ValueError(f"Invalid import format: '{format}'. Must be one of: {', '.join(IMPORT_FORMATS)}.")
+    if periodicity not in PERIODICITIES:
+        raise ValueError(f"Invalid periodicity: '{periodicity}'. Must be one of: {', '.join(PERIODICITIES)}.")
+    rows = iter_csv_rows(file, columns) if format == "csv" else iter_ndjson_rows(file, columns)
+    report = ImportReport(max_errors)
+    implicit_start = set()  # New habits whose start date is their earliest completion so far
+    groups = {}
+    pending = 0
+    storage = habit_tracker.storage
+    with ProcessPoolExecutor(workers) if workers else nullcontext() as executor, \
+            storage.batch() if storage is not None else nullcontext():
+        for row, record, error in rows:
+            report.rows += 1
+            if error is not None:
+                report.add_error(row, None, None, error)
+                continue
+            name, dates, row_periodicity, start_date = record
+            if not isinstance(name, str) or not name.strip():
+                report.add_error(row, None, name, "Habit name must be a non-empty string.")
+                continue
+            if row_periodicity is not None and row_periodicity not in PERIODICITIES:
+                report.add_error(row, name, row_periodicity, f"Invalid periodicity: '{row_periodicity}'.")
+                continue
+            if start_date is not None:
+                try:
+                    start_date = parse_date(start_date)
+                except (TypeError, ValueError):
+                    report.add_error(row, name, start_date, "Invalid start date format. Please use YYYY-MM-DD.")
+                    continue
+            group = groups.get(name)
+            if group is None:
+                group = groups[name] = {"periodicity": None, "start_date": None, "rows": [], "dateless_rows": []}
+            # Only used if the habit is new, the first row that has them wins
+            group["periodicity"] = group["periodicity"] or row_periodicity
+            group["start_date"] = group["start_date"] or start_date
+            if not dates:
+                group["dateless_rows"].append(row)
+            elif len(dates) == 1:
+                group["rows"].append((row, dates[0]))
+            else:
+                group["rows"].extend((row, date) for date in dates)
+            pending += len(dates)
+            if pending >= batch_size:
+                _flush(habit_tracker, groups, periodicity, implicit_start, report, executor)
+                groups = {}
+                pending = 0
+        _flush(habit_tracker, groups, periodicity, implicit_start, report, executor)
+    return report
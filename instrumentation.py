@@ -0,0 +1,196 @@
+"""
+Opt-in timing of the public methods of Habit and HabitTracker and of other functions.
+
+Nothing is recorded, and nothing costs anything, until enable is called: only then
+are the methods replaced by wrappers that count calls, collect wall times in a
+histogram and count the memory blocks that stay allocated after each call.
+disable puts the original methods back. While enabled, every wrapped call costs a
+few microseconds more, mostly for counting the allocated blocks.
+
+The command line enables it with --profile, or with the HABIT_TRACKER_PROFILE
+environment variable set to "table" or "json".
+"""
+import functools
+import json
+import sys
+import time
+from habit import Habit
+from habit_tracker import HabitTracker
+
+ENV_VAR = "HABIT_TRACKER_PROFILE"
+PROFILE_FORMATS = ("table", "json")
+
+_active = None  # The running Instrumentation, if enabled
+
+
+class CallStats:
+    """
+    Calls and timings of a single function.
+
+    Wall times are counted in a histogram with power of two buckets in microseconds:
+    bucket n holds the calls that took less than 2**n microseconds.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.blocks = 0  # Memory blocks still allocated after the calls, see sys.getallocatedblocks
+        self.histogram = {}
+
+    def add(self, elapsed, blocks):
+        """
+        Records one call.
+
+        Args:
+            elapsed (float): Wall time of the call in seconds.
+            blocks (int): Change of the number of allocated memory blocks during the call.
+        """
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        self.blocks += blocks
+        bucket = int(elapsed * 1e6).bit_length()
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def to_dict(self):
+        """
+        Returns the statistics as a dict that can be saved with json.dump.
+        Histogram keys are the upper bounds of the buckets, e.g. "<16us".
+        """
+        return {
+            "calls": self.calls,
+            "total_seconds": self.total,
+            "mean_seconds": self.total / self.calls if self.calls else 0.0,
+            "max_seconds": self.max,
+            "allocated_blocks": self.blocks,
+            "histogram": {f"<{2 ** bucket}us": count for bucket, count in sorted(self.histogram.items())},
+        }
+
+
+class Instrumentation:
+    """
+    Replaces functions with timing wrappers and collects their CallStats.
+    """
+    def __init__(self):
+        self.stats = {}
+        self._originals = []  # (owner, attribute name, original attribute), to undo the wrapping
+
+    def _wrap(self, name, function):
+        """
+        Returns a wrapper of function that records its calls under name.
+        """
+        stats = self.stats.setdefault(name, CallStats())
+        perf_counter = time.perf_counter
+        allocated_blocks = sys.getallocatedblocks
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            blocks = allocated_blocks()
+            started = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stats.add(perf_counter() - started, allocated_blocks() - blocks)
+        return wrapper
+
+    def instrument_class(self, cls):
+        """
+        Wraps every public method of a class, including class and static methods. Properties are left alone.
+
+        Args:
+            cls (type): The class to instrument.
+        """
+        for attribute, value in list(vars(cls).items()):
+            if attribute.startswith("_"):
+                continue
+            name = f"{cls.__name__}.{attribute}"
+            if isinstance(value, classmethod):
+                wrapped = classmethod(self._wrap(name, value.__func__))
+            elif isinstance(value, staticmethod):
+                wrapped = staticmethod(self._wrap(name, value.__func__))
+            elif callable(value):
+                wrapped = self._wrap(name, value)
+            else:
+                continue
+            self._originals.append((cls, attribute, value))
+            setattr(cls, attribute, wrapped)
+
+    def instrument_functions(self, module, names):
+        """
+        Wraps functions of a module. Only calls that look the function up in the module are recorded.
+
+        Args:
+            module (module): The module that defines the functions.
+            names (iterable of str): Names of the functions.
+        """
+        for attribute in names:
+            function = getattr(module, attribute)
+            self._originals.append((module, attribute, function))
+            setattr(module, attribute, self._wrap(f"{module.__name__}.{attribute}", function))
+
+    def uninstall(self):
+        """
+        Puts all original functions back. The collected statistics are kept.
+        """
+        for owner, attribute, original in reversed(self._originals):
+            setattr(owner, attribute, original)
+        self._originals = []
+
+    def to_dict(self):
+        """
+        Returns the statistics of every function that was called, by name.
+        """
+        return {name: stats.to_dict() for name, stats in sorted(self.stats.items()) if stats.calls}
+
+    def to_json(self):
+        """
+        Returns the statistics as a JSON string.
+        """
+        return json.dumps(self.to_dict(), indent=4)
+
+    def summary(self):
+        """
+        Returns the statistics as a table, slowest functions in total first.
+        """
+        lines = [f"{'function':<40} {'calls':>8} {'total ms':>10} {'mean us':>10} {'max us':>10} {'blocks':>10}"]
+        for name, stats in sorted(self.stats.items(), key=lambda item: item[1].total, reverse=True):
+            if stats.calls:
+                lines.append(f"{name:<40} {stats.calls:>8} {stats.total * 1e3:>10.2f} "
+                             f"{stats.total / stats.calls * 1e6:>10.1f} {stats.max * 1e6:>10.1f} {stats.blocks:>10}")
+        return "\n".join(lines)
+
+
+def enable(functions=()):
+    """
+    Starts recording the public methods of Habit and HabitTracker.
+
+    Args:
+        functions (iterable, optional): (module, names) pairs of more functions to record.
+
+    Returns:
+        Instrumentation: The running instrumentation. If it was already enabled, the running one.
+    """
+    global _active
+    if _active is None:
+        _active = Instrumentation()
+        _active.instrument_class(Habit)
+        _active.instrument_class(HabitTracker)
+        for module, names in functions:
+            _active.instrument_functions(module, names)
+    return _active
+
+
+def disable():
+    """
+    Stops recording and puts the original methods back.
+
+    Returns:
+        Instrumentation: The instrumentation that was running, with its statistics, or None.
+    """
+    global _active
+    instrumentation = _active
+    if instrumentation is not None:
+        instrumentation.uninstall()
+        _active = None
+    return instrumentation
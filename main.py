@@ -1,34 +1,77 @@
+import argparse
 import json
+import os
+import shlex
+import sys
 from datetime import datetime, timedelta
+from analytics import AnalyticsExecutor
 from habit import Habit  # Assuming habit.py is in the same directory
-from habit_tracker import HabitTracker  # Assuming habit_tracker.py is in the same directory
+from habit_tracker import HabitTracker, parse_date  # Assuming habit_tracker.py is in the same directory
+from exporters import EXPORT_FORMATS, export, iter_export, iter_statistics
+from importers import import_completions
+import instrumentation
+from journal import JournalStorage, remove_journal
+from periods import PERIODICITIES
+from storage import SNAPSHOT_EXTENSIONS, JsonFileStorage, SnapshotStorage, open_storage, write_atomic, write_tracker
 
+EXPORT_EXTENSIONS = (".csv", ".ndjson", ".jsonl")  # Exports of other apps, imported with importers.py
+STREAMING_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}  # Written by exporters.py
 
-def load_data(filename="habits.json"):
+
+def load_data(filename="habits.json", names=None, periodicities=None, lazy=False):
     """
-    Loads habits meta-data from a JSON file.
+    Loads habits meta-data from a JSON file, or from a SQLite database for .db, .sqlite and .sqlite3 files.
+    JSON files are read one habit at a time, optionally keeping only the given habit names or periodicities.
+    Changes to a fully loaded JSON file are written to a journal next to it as they happen and replayed on the next load.
+    With lazy=True a .snap snapshot file is memory mapped and each habit's completions are only decoded when first used.
     If the file doesn't exist or is corrupted, it creates a new empty Habit Tracker.
     """
+    journal = names is None and periodicities is None  # A partially loaded file is only read
+    storage = open_storage(filename, journal=journal, lazy=lazy)  # Pick the storage backend from the file extension
     try:
-        with open(filename, "r") as f:
-            data = json.load(f)  # Load JSON data from file
-            return HabitTracker.from_json(data)  # Convert JSON data into a HabitTracker object
+        return storage.load(names=names, periodicities=periodicities)  # Build habits while reading the file
     except FileNotFoundError:
         print("No existing data found, creating a new Habit Tracker.")
-        return HabitTracker()  # Return an empty tracker if the file doesn't exist
+        return HabitTracker(storage=storage)  # Return an empty tracker if the file doesn't exist
     except json.JSONDecodeError:
         print("Error decoding JSON. Creating a new Habit Tracker.")
-        return HabitTracker()  # Return an empty tracker if the file is corrupted
+        return HabitTracker(storage=storage)  # Return an empty tracker if the file is corrupted
+    except ValueError as e:
+        if not isinstance(storage, SnapshotStorage):
+            raise
+        print(f"Error reading snapshot: {e} Creating a new Habit Tracker.")
+        return HabitTracker(storage=storage)  # Return an empty tracker if the snapshot is corrupted
+
+
+def write_habits_file(habit_tracker, filename, format="json"):
+    """
+    Rewrites a JSON habits file with all habits in a format ("json" or "compact").
+    The tracker's own journaled file is saved through its storage, which starts a new journal.
+    Any other file loses its journal, which only applied to the habits being replaced.
+    """
+    storage = habit_tracker.storage
+    if isinstance(storage, JournalStorage) and os.path.abspath(storage.filename) == os.path.abspath(filename):
+        storage.format = format
+        storage.save(habit_tracker)
+        return
+    remove_journal(filename)
+    write_tracker(habit_tracker, filename, format)
 
 
-def save_data(habit_tracker, filename="habits.json"):
+def save_data(habit_tracker, filename="habits.json", format=None):
     """
-    Saves current habit data to a JSON file.
+    Saves current habit data to its storage, or to a JSON file if the tracker has no storage.
+    A SQLite database or a journal has already saved every change, so nothing is rewritten.
+    If a format ("json" or "compact") is given, the whole tracker is written to filename in that format instead.
+    Files are replaced atomically, so a failed save never leaves a truncated file behind.
     Displays an error if there's an issue with file writing.
     """
     try:
-        with open(filename, "w") as f:
-            json.dump(habit_tracker.to_json(), f, indent=4)  # Save data in a nicely formatted JSON
+        if format is not None:
+            write_habits_file(habit_tracker, filename, format)
+            return
+        storage = habit_tracker.storage or open_storage(filename)
+        storage.flush(habit_tracker)
     except Exception as e:
         print(f"An error occurred while saving data: {e}")
 
@@ -104,12 +147,311 @@ def get_date_choice(prompt_message="Enter date (YYYY-MM-DD):"):
             print("Invalid choice. Please enter 1 or 2.")
 
 
-def main():
+def date_argument(value):
+    """
+    Parses a YYYY-MM-DD command line argument into a datetime object.
+    """
+    try:
+        return parse_date(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', please use YYYY-MM-DD")
+
+
+def today():
+    """
+    Returns the current date at midnight, so it matches dates given as YYYY-MM-DD.
+    """
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class BatchArgumentParser(argparse.ArgumentParser):
+    """
+    Parser for the lines of a batch. Reports invalid lines as ValueError instead of exiting the program.
+    """
+    def error(self, message):
+        raise ValueError(message)
+
+
+def add_commands(parser):
+    """
+    Adds the commands that can be given on the command line as well as in a batch to a parser.
+    Returns the subparsers object, so more commands can be added.
+    """
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    add = commands.add_parser("add", help="add a new habit")
+    add.add_argument("name")
+    add.add_argument("periodicity", choices=PERIODICITIES)
+    add.add_argument("--start", type=date_argument, help="start date (YYYY-MM-DD), defaults to today")
+
+    mark = commands.add_parser("mark", help="mark a habit as completed")
+    mark.add_argument("name")
+    mark.add_argument("date", nargs="?", type=date_argument, help="completion date (YYYY-MM-DD), defaults to today")
+
+    list_habits = commands.add_parser("list", help="list habits with their start date and number of completions")
+    list_habits.add_argument("--periodicity", choices=PERIODICITIES)
+
+    streak = commands.add_parser("streak", help="show the longest streak of a habit, or of all habits")
+    streak.add_argument("name", nargs="?")
+
+    due = commands.add_parser("due", help="list the habits still to be completed in the current period, with their current streak")
+    due.add_argument("--at-risk", action="store_true", help="only the habits whose current streak would break")
+    due.add_argument("--date", type=date_argument, help="date to check (YYYY-MM-DD), defaults to today")
+
+    edit = commands.add_parser("edit", help="edit a habit")
+    edit.add_argument("name")
+    edit.add_argument("--name", dest="new_name", help="new name")
+    edit.add_argument("--periodicity", choices=PERIODICITIES, help="new periodicity")
+    edit.add_argument("--start", type=date_argument, help="new start date (YYYY-MM-DD)")
+
+    delete = commands.add_parser("delete", help="delete a habit")
+    delete.add_argument("name")
+
+    import_habits = commands.add_parser("import", help="add the habits of another habits file, or completions from a CSV or NDJSON export")
+    import_habits.add_argument("input", help="habits file in any format supported by --file, or a .csv, .ndjson or .jsonl export")
+    import_habits.add_argument("--periodicity", choices=PERIODICITIES, default="daily",
+                               help="periodicity of new habits when the export has none (default: daily)")
+    import_habits.add_argument("--workers", type=int, help="parse dates of CSV/NDJSON exports in this many processes")
+    import_habits.add_argument("--report", help="write the list of rejected rows of a CSV/NDJSON export to this JSON file")
+
+    export = commands.add_parser("export", help="write all habits to another file, or to standard output")
+    export.add_argument("output", help="file to write, .db/.sqlite/.sqlite3 for SQLite, .snap for a snapshot, "
+                                       ".csv, .ndjson or .jsonl for one line per completion, - for standard output")
+    export.add_argument("--format", choices=EXPORT_FORMATS, help="output format, by default taken from the file extension")
+    export.add_argument("--statistics", action="store_true",
+                        help="write streaks and completion rates of every habit instead of the completions (csv, ndjson or json)")
+    return commands
+
+
+def build_parser():
+    """
+    Creates the parser for the command line. Without a command the interactive menu is started.
+    """
+    parser = argparse.ArgumentParser(description="Track habits and their streaks. Starts the interactive menu when no command is given.")
+    parser.add_argument("--file", default="habits.json",
+                        help="habits file, .db/.sqlite/.sqlite3 for a SQLite database and .snap for a snapshot (default: habits.json)")
+    parser.add_argument("--profile", choices=instrumentation.PROFILE_FORMATS, default=os.environ.get(instrumentation.ENV_VAR) or None,
+                        help=f"time the calls of the habit methods and print a table or JSON to stderr on exit (or set {instrumentation.ENV_VAR})")
+    parser.add_argument("--workers", type=int, dest="menu_workers",
+                        help="list the completions of all habits in the menu in this many processes, for very large histories")
+    commands = add_commands(parser)
+    batch = commands.add_parser("batch", help="run many commands, one per line, with a single load and save")
+    batch.add_argument("input", nargs="?", type=argparse.FileType("r"), default="-", help="file with one command per line, - for standard input (default)")
+    return parser
+
+
+def import_data(habit_tracker, filename):
+    """
+    Adds the habits of another habits file to the tracker.
+    Habits whose name already exists and completions that are rejected by the habit are skipped and reported.
+    Returns the number of imported habits.
+    """
+    if not os.path.exists(filename) and not os.path.exists(filename + ".journal"):
+        raise FileNotFoundError(f"Habits file '{filename}' not found.")
+    storage = open_storage(filename, journal=True)  # Changes still in the journal of a JSON file are part of its habits
+    try:
+        # The file is only read, never repaired or compacted
+        source = storage.load(read_only=True) if isinstance(storage, JournalStorage) else storage.load()
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Habits file '{filename}' is not valid JSON: {e}")
+    finally:
+        storage.close()
+    imported = 0
+    for habit in source.get_all_habits():
+        try:
+            habit_tracker.add_habit(Habit(habit.name, habit.periodicity, habit.start_date))
+        except ValueError as e:
+            print(f"Skipping habit: {e}", file=sys.stderr)
+            continue
+        rejections = habit_tracker.bulk_mark({habit.name: habit.completion_dates})  # Recorded by the tracker's storage
+        for _, date, reason in rejections.get(habit.name, ()):
+            print(f"Skipping completion of '{habit.name}' on {date.strftime('%Y-%m-%d')}: {reason}", file=sys.stderr)
+        imported += 1
+    return imported
+
+
+def import_export_file(habit_tracker, args):
+    """
+    Imports completions from a CSV or NDJSON export, see importers.import_completions.
+    Rejected rows are listed on standard error, or written to the --report file.
+    """
+    format = "csv" if args.input.lower().endswith(".csv") else "ndjson"
+    with open(args.input, "r", newline="") as f:
+        report = import_completions(habit_tracker, f, format=format, periodicity=args.periodicity, workers=args.workers)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report.to_dict(), f, indent=4)
+    else:
+        for error in report.errors:
+            habit = f"{error['habit']}: " if error["habit"] is not None else ""
+            print(f"Line {error['row']}: {habit}{error['reason']}", file=sys.stderr)
+        if report.error_count > len(report.errors):
+            print(f"... and {report.error_count - len(report.errors)} more errors.", file=sys.stderr)
+    print(f"Imported {report.completions_added} completion(s) and created {report.habits_created} habit(s) "
+          f"from {report.rows} row(s), {report.error_count} error(s).")
+
+
+def export_data(habit_tracker, filename, format=None, statistics=False):
+    """
+    Writes all habits to filename, using the storage matching its extension.
+    CSV and NDJSON files, statistics and standard output ("-") are written piece by piece by exporters.py instead.
+    Without a format it is taken from the file extension.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if format is None:
+        format = STREAMING_FORMATS.get(extension, "csv" if statistics else "json")
+    if filename == "-" or statistics or format in ("ndjson", "csv"):
+        if filename == "-":
+            export(habit_tracker, sys.stdout, format, statistics)
+        else:
+            write_atomic(filename, iter_statistics(habit_tracker, format) if statistics else iter_export(habit_tracker, format))
+        return
+    storage = open_storage(filename, format=format)
+    if isinstance(storage, JsonFileStorage):
+        write_habits_file(habit_tracker, filename, format)  # Takes care of journals of the file
+        return
+    try:
+        storage.save(habit_tracker)
+    finally:
+        storage.close()
+
+
+def run_command(habit_tracker, args):
+    """
+    Applies one parsed command to the Habit Tracker and prints its result.
+    Returns True if the command changed the habits.
+    Raises ValueError if the command fails, e.g. because the habit doesn't exist, or OSError if a file can't be read or written.
+    """
+    if args.command == "add":
+        habit_tracker.add_habit(Habit(args.name, args.periodicity, args.start or today()))
+    elif args.command == "mark":
+        habit_tracker.mark_completed(args.name, args.date or today())
+    elif args.command == "edit":
+        habit_tracker.edit_habit(args.name, new_name=args.new_name, new_periodicity=args.periodicity,
+                                 new_start_date=args.start)
+    elif args.command == "delete":
+        habit_tracker.delete_habit(args.name)
+    elif args.command == "import":
+        if os.path.splitext(args.input)[1].lower() in EXPORT_EXTENSIONS:
+            import_export_file(habit_tracker, args)
+        else:
+            print(f"Imported {import_data(habit_tracker, args.input)} habit(s).")
+    elif args.command == "list":
+        if args.periodicity:
+            habits = habit_tracker.get_habits_by_periodicity(args.periodicity)
+        else:
+            habits = habit_tracker.get_all_habits()
+        for habit in habits:
+            print(f"{habit.name}\t{habit.periodicity}\t{habit.start_date.strftime('%Y-%m-%d')}\t{len(habit.completion_dates)}")
+        return False
+    elif args.command == "streak":
+        if args.name is None:
+            print(habit_tracker.get_longest_streak_all_habits())
+        else:
+            habit = habit_tracker.get_habit(args.name)
+            if habit is None:
+                raise ValueError(f"Habit with name '{args.name}' not found.")
+            print(habit.get_streak_duration_string(habit.get_longest_streak()))
+        return False
+    elif args.command == "due":
+        as_of = args.date or today()
+        habits = habit_tracker.get_habits_at_risk(as_of) if args.at_risk else habit_tracker.get_due_habits(as_of)
+        for habit in habits:
+            print(f"{habit.name}\t{habit.periodicity}\t{habit.get_current_streak(as_of)}")
+        return False
+    elif args.command == "export":
+        export_data(habit_tracker, args.output, args.format, args.statistics)
+        return False
+    else:
+        raise ValueError(f"Unknown command: {args.command}")
+    return True
+
+
+def run_batch(habit_tracker, lines):
+    """
+    Applies one command per line, written like on the command line without the program name, e.g.
+    mark "Morning run" 2024-05-01. Empty lines and lines starting with # are skipped.
+    A failing line is reported with its line number and the remaining lines still run.
+    Returns a tuple of whether any command changed the habits and the number of failed lines.
+    """
+    parser = BatchArgumentParser(prog="batch", add_help=False)
+    add_commands(parser)
+    changed = False
+    failures = 0
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            words = shlex.split(line) if any(c in line for c in "\"'\\") else line.split()  # shlex is slow, only needed for quoting
+            args = parser.parse_args(words)
+            if args.command is None:
+                raise ValueError("a command is required")
+            changed = run_command(habit_tracker, args) or changed
+        except (ValueError, OSError) as e:
+            failures += 1
+            print(f"Line {number}: {e}", file=sys.stderr)
+    return changed, failures
+
+
+def run_cli(argv=None):
+    """
+    Runs a single command or a batch of commands from the command line.
+    The habits file is loaded once before and saved once after all commands, and only if something changed.
+    Returns the exit status: 0 on success, 1 if a command failed.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.profile not in (None, *instrumentation.PROFILE_FORMATS):  # Unknown value of the environment variable
+        parser.error(f"{instrumentation.ENV_VAR} must be one of: {', '.join(instrumentation.PROFILE_FORMATS)}")
+    if args.profile is None:
+        return run_args(args)
+
+    profile = instrumentation.enable([(sys.modules[__name__], ("load_data", "save_data", "import_data", "export_data"))])
+    try:
+        return run_args(args)
+    finally:
+        instrumentation.disable()
+        print(profile.summary() if args.profile == "table" else profile.to_json(), file=sys.stderr)
+
+
+def run_args(args):
+    """
+    Runs the command of parsed command line arguments, see run_cli.
+    """
+    if args.command is None:
+        main(args.file, workers=args.menu_workers)
+        return 0
+
+    lazy = os.path.splitext(args.file)[1].lower() in SNAPSHOT_EXTENSIONS  # Only the habits a command uses are decoded
+    habit_tracker = load_data(args.file, lazy=lazy)
+    storage = habit_tracker.storage
+    try:
+        with storage.batch():  # SQLite commits once and the journal is fsync'd once, at the end
+            if args.command == "batch":
+                changed, failures = run_batch(habit_tracker, args.input)
+            else:
+                try:
+                    changed, failures = run_command(habit_tracker, args), 0
+                except (ValueError, OSError) as e:
+                    print(f"Error: {e}", file=sys.stderr)
+                    changed, failures = False, 1
+        if changed:
+            save_data(habit_tracker, args.file)
+    finally:
+        storage.close()
+    return 1 if failures else 0
+
+
+def main(filename="habits.json", workers=None):
     """
     Main function to run the Habit Tracker App with a simple text-based menu.
     Handles user input and calls appropriate actions based on their choice.
+    With workers, the completions listed by option 3 are sorted and formatted in that many processes.
     """
-    habit_tracker = load_data()  # Initialize the Habit Tracker from saved data (if it exists)
+    lazy = os.path.splitext(filename)[1].lower() in SNAPSHOT_EXTENSIONS  # Only the habits the menu touches are decoded
+    habit_tracker = load_data(filename, lazy=lazy)  # Initialize the Habit Tracker from saved data (if it exists)
+    executor = AnalyticsExecutor(workers) if workers else None
 
     while True:
         # Menu displayed to the user
@@ -153,7 +495,7 @@ def main():
                 if habit_to_mark:
                     completion_date = get_date_choice("Enter completion date (YYYY-MM-DD)")
                     try:
-                        habit_to_mark.mark_completed(completion_date)  # Mark the habit as completed
+                        habit_tracker.mark_completed(habit_to_mark.name, completion_date)  # Mark the habit as completed
                         print("Habit marked as completed.")
                     except ValueError as e:
                         print(f"Error: {e}")
@@ -164,15 +506,19 @@ def main():
                 # Display all tracked habits
                 all_habits = habit_tracker.get_all_habits()
                 if all_habits:
+                    listing = executor.completion_listing(all_habits) if executor is not None else None
                     print("\n--- All Habits ---")
                     for i, habit in enumerate(all_habits):
                         print(
                             f"{i + 1}. {habit.name} (Periodicity: {habit.periodicity}, Started: {habit.start_date.strftime('%Y-%m-%d')})")
                         # Display completion stats
-                        if habit.completion_dates:
-                            sorted_dates = sorted(habit.completion_dates)
-                            print(f"   Last completed: {sorted_dates[-1].strftime('%Y-%m-%d')}")
-                            print(f"   Completions: {[d.strftime('%Y-%m-%d') for d in sorted_dates]}")
+                        if listing is not None:
+                            dates = listing[i]  # Already sorted and formatted by the worker processes
+                        else:
+                            dates = [d.strftime('%Y-%m-%d') for d in sorted(habit.completion_dates)]
+                        if dates:
+                            print(f"   Last completed: {dates[-1]}")
+                            print(f"   Completions: {dates}")
                         else:
                             print("   No completions yet.")
                     print("-------------------")
@@ -182,7 +528,11 @@ def main():
 
             elif choice == "8":
                 # Exit the program and save any changes
-                save_data(habit_tracker)
+                save_data(habit_tracker, filename)
+                if habit_tracker.storage is not None:
+                    habit_tracker.storage.close()  # Wait for a running compaction to finish
+                if executor is not None:
+                    executor.close()
                 print("Exiting Habit Tracker. Your data has been saved.")
                 break
 
@@ -195,4 +545,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(run_cli())
\ No newline at end of file
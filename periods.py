@@ -0,0 +1,102 @@
+"""
+Helpers for mapping dates onto the period buckets used by habits.
+
+Every supported periodicity is turned into a single integer index, so two dates
+fall into the same period exactly when their indices are equal, and two periods
+follow each other exactly when their indices differ by one.
+"""
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, plain Python is used without it
+    np = None
+
+PERIODICITIES = ("daily", "weekly", "monthly")
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()  # NumPy datetime64 values count days from this date
+
+
+def period_index(date, periodicity):
+    """
+    Returns the index of the period (day, ISO week or month) the date falls into.
+
+    Args:
+        date (datetime): The date to convert.
+        periodicity (str): "daily", "weekly", or "monthly".
+
+    Returns:
+        int: Day ordinal, number of ISO weeks since 0001-01-01 or number of months since year 0.
+
+    Raises:
+        ValueError: If the periodicity is not supported.
+    """
+    if periodicity == "daily":
+        return date.toordinal()
+    elif periodicity == "weekly":
+        return (date.toordinal() - 1) // 7  # 0001-01-01 was a Monday, so every ISO week is one block of 7 ordinals
+    elif periodicity == "monthly":
+        return date.year * 12 + date.month - 1
+    else:
+        raise ValueError(f"Unsupported periodicity: {periodicity}")
+
+
+def period_start_ordinal(period, periodicity):
+    """
+    Returns the day ordinal of the first day of a period, the inverse of period_index.
+
+    Args:
+        period (int): The period index.
+        periodicity (str): "daily", "weekly", or "monthly".
+
+    Returns:
+        int: Day ordinal of the first day in the period.
+
+    Raises:
+        ValueError: If the periodicity is not supported.
+    """
+    if periodicity == "daily":
+        return period
+    elif periodicity == "weekly":
+        return period * 7 + 1
+    elif periodicity == "monthly":
+        return date(period // 12, period % 12 + 1, 1).toordinal()
+    else:
+        raise ValueError(f"Unsupported periodicity: {periodicity}")
+
+
+def period_indices(ordinals, periodicity):
+    """
+    Converts many day ordinals to period indices at once.
+
+    With NumPy installed the conversion is vectorized and a NumPy array is
+    returned, otherwise a list of ints.
+
+    Args:
+        ordinals (sequence of int): Day ordinals, e.g. CompactCompletions.ordinals.
+        periodicity (str): "daily", "weekly", or "monthly".
+
+    Returns:
+        NumPy array or list of int: The period index of every ordinal, in the same order.
+
+    Raises:
+        ValueError: If the periodicity is not supported.
+    """
+    if np is not None:
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        if periodicity == "daily":
+            return ordinals
+        elif periodicity == "weekly":
+            return (ordinals - 1) // 7
+        elif periodicity == "monthly":
+            days = (ordinals - _EPOCH_ORDINAL).astype("datetime64[D]")
+            return days.astype("datetime64[M]").astype(np.int64) + 1970 * 12  # datetime64 months count from 1970-01
+        raise ValueError(f"Unsupported periodicity: {periodicity}")
+
+    if periodicity == "daily":
+        return list(ordinals)
+    elif periodicity == "weekly":
+        return [(ordinal - 1) // 7 for ordinal in ordinals]
+    elif periodicity == "monthly":
+        return [period_index(date.fromordinal(ordinal), periodicity) for ordinal in ordinals]
+    raise ValueError(f"Unsupported periodicity: {periodicity}")
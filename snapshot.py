@@ -0,0 +1,311 @@
+"""
+Binary snapshot format for habits, built for long completion histories.
+
+Layout of a snapshot file (all integers little-endian):
+
+    header       magic, format version, number of habits, offset of the directory
+    records      completions of every habit, one record after the other
+    directory    per habit: record offset and length, completion count, start date,
+                 name and periodicity
+
+Completions are stored as sorted day ordinals: the first ordinal, followed by
+(difference, repeat) pairs saying that the next "repeat" completions are each
+"difference" days after the previous one. All numbers are varints (7 bits per
+byte), so a daily habit completed for years without a gap takes a few bytes.
+
+The file is read through mmap, and the directory gives the position of every
+record, so a single habit can be decoded without touching the others. Habits can
+also be created lazily, decoding their record only when the completions are
+first accessed.
+"""
+import mmap
+import os
+import struct
+from array import array
+from datetime import datetime
+from completions import CompactCompletions
+from habit import Habit
+
+MAGIC = b"HABITSNP"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIQ")  # Magic, version, reserved, habit count, directory offset
+ENTRY = struct.Struct("<QIIiHH")  # Record offset, record length, completion count, start ordinal, name and periodicity lengths
+_MAX_ORDINAL = datetime.max.toordinal()
+
+
+def _write_varint(value, out):
+    """
+    Appends an unsigned integer to a bytearray, 7 bits per byte.
+    """
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, position):
+    """
+    Reads an unsigned integer written by _write_varint.
+
+    Returns:
+        tuple: The value and the position right after it.
+
+    Raises:
+        ValueError: If the data ends inside the integer.
+    """
+    value = 0
+    shift = 0
+    while True:
+        if position >= len(data):
+            raise ValueError("Corrupt habits snapshot: record ends inside a number.")
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def encode_ordinals(ordinals):
+    """
+    Encodes sorted day ordinals as a first ordinal and (difference, repeat) varint pairs.
+
+    Args:
+        ordinals (sequence of int): Sorted day ordinals.
+
+    Returns:
+        bytes: The encoded record.
+    """
+    out = bytearray()
+    if not len(ordinals):
+        return bytes(out)
+    _write_varint(ordinals[0], out)
+    previous = ordinals[0]
+    difference = None
+    repeat = 0
+    for ordinal in ordinals[1:]:
+        if ordinal - previous == difference:
+            repeat += 1
+        else:
+            if repeat:
+                _write_varint(difference, out)
+                _write_varint(repeat, out)
+            difference = ordinal - previous
+            repeat = 1
+        previous = ordinal
+    if repeat:
+        _write_varint(difference, out)
+        _write_varint(repeat, out)
+    return bytes(out)
+
+
+def decode_ordinals(data, count=None):
+    """
+    Decodes a record written by encode_ordinals.
+
+    Args:
+        data (bytes-like): The encoded record.
+        count (int, optional): The number of completions the record must hold.
+
+    Returns:
+        array: Sorted day ordinals as array('i').
+
+    Raises:
+        ValueError: If the record is corrupt or doesn't hold count completions.
+    """
+    ordinals = array("i")
+    if len(data):
+        previous, position = _read_varint(data, 0)
+        if not 1 <= previous <= _MAX_ORDINAL:
+            raise ValueError("Corrupt habits snapshot: invalid completion date.")
+        ordinals.append(previous)
+        while position < len(data):
+            difference, position = _read_varint(data, position)
+            repeat, position = _read_varint(data, position)
+            # Checked before expanding, so a corrupt repeat can't allocate huge arrays
+            if count is not None and len(ordinals) + repeat > count:
+                raise ValueError("Corrupt habits snapshot: record holds more completions than its entry.")
+            if previous + difference * repeat > _MAX_ORDINAL:
+                raise ValueError("Corrupt habits snapshot: invalid completion date.")
+            if difference:
+                ordinals.extend(range(previous + difference, previous + difference * repeat + 1, difference))
+            else:
+                ordinals.extend([previous] * repeat)
+            previous += difference * repeat
+    if count is not None and len(ordinals) != count:
+        raise ValueError("Corrupt habits snapshot: record doesn't hold the completions of its entry.")
+    return ordinals
+
+
+def _iter_snapshot(habits):
+    """
+    Yields the parts of a snapshot file for the given habits.
+    """
+    records = []
+    directory = bytearray()
+    offset = HEADER.size
+    for habit in habits:
+        if habit.compact:
+            ordinals = habit.completion_dates.ordinals
+        else:
+            ordinals = sorted(date.toordinal() for date in habit.completion_dates)
+        record = encode_ordinals(ordinals)
+        name = habit.name.encode("utf-8")
+        periodicity = habit.periodicity.encode("utf-8")
+        directory += ENTRY.pack(offset, len(record), len(ordinals), habit.start_date.toordinal(), len(name), len(periodicity))
+        directory += name + periodicity
+        records.append(record)
+        offset += len(record)
+    yield HEADER.pack(MAGIC, VERSION, 0, len(records), offset)
+    yield from records
+    yield bytes(directory)
+
+
+def write_snapshot(habits, filename):
+    """
+    Saves habits to a snapshot file atomically.
+
+    Args:
+        habits (iterable of Habit): The habits to save.
+        filename (str): Path of the snapshot file.
+    """
+    from storage import write_atomic  # storage.py builds on this module
+    write_atomic(filename, _iter_snapshot(habits), binary=True)
+
+
+class SnapshotReader:
+    """
+    Reads habits from a snapshot file through mmap.
+
+    Opening the file only reads the header and the directory, so names,
+    periodicities and completion counts of all habits are known at once while
+    completions are only decoded for the habits that are read.
+
+    The file itself is closed right after it is mapped. The mapping stays valid
+    until close is called, or until the reader and all lazy habits created from
+    it are garbage collected, even if the file is replaced in the meantime.
+    """
+    def __init__(self, filename):
+        """
+        Opens a snapshot file.
+
+        Args:
+            filename (str): Path of the snapshot file.
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist.
+            ValueError: If the file is not a snapshot file.
+        """
+        with open(filename, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise ValueError("Not a habits snapshot file.")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, position = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("Not a habits snapshot file.")
+        try:
+            self._read_directory(count, position)
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_directory(self, count, position):
+        """
+        Reads the directory entries, checking every offset and length against the file size.
+
+        Raises:
+            ValueError: If the file is truncated or the directory is corrupt.
+        """
+        size = len(self._map)
+        directory = position
+        if not HEADER.size <= directory <= size:
+            raise ValueError("Corrupt habits snapshot: invalid directory offset.")
+        self._entries = []  # (name, periodicity, start ordinal, completion count, record offset, record length)
+        self._positions = {}
+        for index in range(count):
+            if position + ENTRY.size > size:
+                raise ValueError("Corrupt habits snapshot: the directory is truncated.")
+            offset, length, completions, start, name_length, periodicity_length = ENTRY.unpack_from(self._map, position)
+            position += ENTRY.size
+            if position + name_length + periodicity_length > size:
+                raise ValueError("Corrupt habits snapshot: the directory is truncated.")
+            if offset < HEADER.size or offset + length > directory or not 1 <= start <= _MAX_ORDINAL:
+                raise ValueError("Corrupt habits snapshot: invalid habit entry.")
+            name = self._map[position:position + name_length].decode("utf-8")  # UnicodeDecodeError is a ValueError
+            position += name_length
+            periodicity = self._map[position:position + periodicity_length].decode("utf-8")
+            position += periodicity_length
+            self._entries.append((name, periodicity, start, completions, offset, length))
+            self._positions[name] = index
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Unmaps the file. Lazy habits that were not loaded yet can't be loaded afterwards.
+        """
+        self._map.close()
+
+    def index(self, name):
+        """
+        Returns the position of a habit in the snapshot.
+
+        Raises:
+            ValueError: If there is no habit with this name.
+        """
+        if name not in self._positions:
+            raise ValueError(f"Habit with name '{name}' not found.")
+        return self._positions[name]
+
+    def entries(self):
+        """
+        Lists the habits without decoding any completions.
+
+        Returns:
+            list: (name, periodicity, start date, completion count) for every habit.
+        """
+        return [(name, periodicity, datetime.fromordinal(start), completions)
+                for name, periodicity, start, completions, _, _ in self._entries]
+
+    def read_ordinals(self, index):
+        """
+        Decodes the completions of one habit.
+
+        Args:
+            index (int): Position of the habit, see index.
+
+        Returns:
+            array: Sorted day ordinals as array('i').
+        """
+        _, _, _, completions, offset, length = self._entries[index]
+        with memoryview(self._map) as view:
+            return decode_ordinals(view[offset:offset + length], completions)
+
+    def read_habit(self, index, compact=False, lazy=False):
+        """
+        Creates the Habit at the given position, decoding only its own record.
+
+        Args:
+            index (int): Position of the habit, see index.
+            compact (bool, optional): Create the habit with compact completion storage.
+            lazy (bool, optional): Decode the record when the completions are first
+                accessed instead of right away, see Habit.defer_completions.
+
+        Returns:
+            Habit object.
+        """
+        name, periodicity, start, _, _, _ = self._entries[index]
+        habit = Habit(name, periodicity, datetime.fromordinal(start), compact=compact)
+        if lazy:
+            habit.defer_completions(lambda: CompactCompletions.from_sorted(self.read_ordinals(index)))
+        else:
+            habit.completion_dates = CompactCompletions.from_sorted(self.read_ordinals(index))
+        return habit
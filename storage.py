@@ -0,0 +1,667 @@
+import json
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+from habit_tracker import HabitTracker
+
+_WHITESPACE = " \t\n\r"
+# Read once at import: os.umask can only be read by setting it, which would race with other threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class _JsonStream:
+    """
+    Reads JSON values one by one from a text file without loading the whole file.
+
+    Only the part of the file that has not been decoded yet is kept in memory.
+    """
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.decoder = json.JSONDecoder()
+
+    def _read_more(self, size=None):
+        """
+        Appends the next chunk of the file to the buffer, dropping what was already decoded.
+
+        Args:
+            size (int, optional): Number of characters to read, defaults to the chunk size.
+
+        Returns:
+            bool: False if the end of the file was reached.
+        """
+        chunk = self.file.read(size or self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        """
+        Skips whitespace and returns the next character, or "" at the end of the file.
+        """
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._read_more():
+                return ""
+
+    def expect(self, character):
+        """
+        Consumes the next non-whitespace character, which must be the given one.
+
+        Raises:
+            json.JSONDecodeError: If another character follows.
+        """
+        if self.peek() != character:
+            raise json.JSONDecodeError(f"Expecting '{character}'", self.buffer, self.position)
+        self.position += 1
+
+    def value(self):
+        """
+        Decodes the next complete JSON value, reading more of the file until it is complete.
+
+        Raises:
+            json.JSONDecodeError: If the value is invalid.
+        """
+        if self.peek() not in "{[\"":
+            # A number or literal may continue in the next chunk, so read on until it is terminated
+            while not any(character in self.buffer[self.position:] for character in ",]} \t\n\r"):
+                if not self._read_more():
+                    break
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # Double the undecoded part on every retry, so large records aren't parsed over and over
+                if not self._read_more(max(self.chunk_size, len(self.buffer) - self.position)):
+                    raise
+                continue
+            self.position = end
+            return value
+
+
+def iter_habit_records(file, chunk_size=65536, metadata=None):
+    """
+    Yields the habit records of a habits.json file one at a time.
+
+    The file is parsed incrementally, so only one habit record is held in memory at
+    once instead of the whole parsed document.
+
+    Args:
+        file: Text file object opened for reading.
+        chunk_size (int, optional): Number of characters read at a time.
+        metadata (dict, optional): Filled with the other top level keys of the file.
+
+    Yields:
+        dict: One habit record with name, periodicity, start_date and completion_dates.
+
+    Raises:
+        json.JSONDecodeError: If the file is not valid JSON.
+    """
+    stream = _JsonStream(file, chunk_size)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key == "habits":
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.position += 1
+            else:
+                while True:
+                    yield stream.value()
+                    if stream.peek() == ",":
+                        stream.position += 1
+                        continue
+                    stream.expect("]")
+                    break
+        else:
+            value = stream.value()  # Other top level keys are only kept if asked for
+            if metadata is not None:
+                metadata[key] = value
+        if stream.peek() == ",":
+            stream.position += 1
+            continue
+        stream.expect("}")
+        return
+
+
+def load_tracker(filename, names=None, periodicities=None, compact=False, metadata=None):
+    """
+    Loads a HabitTracker from a habits.json file, building habits while the file is read.
+
+    Args:
+        filename (str): Path of the JSON file.
+        names (iterable of str, optional): Only load habits with these names.
+        periodicities (iterable of str, optional): Only load habits with these periodicities.
+        compact (bool, optional): Create habits with compact completion storage.
+        metadata (dict, optional): Filled with the other top level keys of the file.
+
+    Returns:
+        HabitTracker instance.
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist.
+        json.JSONDecodeError: If the file is not valid JSON.
+    """
+    names = None if names is None else set(names)
+    periodicities = None if periodicities is None else set(periodicities)
+    with open(filename, "r") as f:
+        records = (
+            record for record in iter_habit_records(f, metadata=metadata)
+            if (names is None or record.get("name") in names)
+            and (periodicities is None or record.get("periodicity") in periodicities)
+        )
+        return HabitTracker.from_records(records, compact=compact)
+
+
+FORMATS = ("json", "compact")
+
+
+@lru_cache(maxsize=65536)
+def format_ordinal(ordinal):
+    """
+    Formats a day ordinal as a "YYYY-MM-DD" string. Results are cached, the same days repeat across habits.
+    """
+    return date.fromordinal(ordinal).isoformat()
+
+
+def habit_record(habit, format="json"):
+    """
+    Creates the saved record of a single habit.
+
+    The "compact" format stores completions as "completion_days": the day ordinal of
+    the first completion followed by the number of days since the previous one, which
+    is mostly 1 for daily habits.
+
+    Args:
+        habit (Habit): The habit to save.
+        format (str, optional): "json" or "compact".
+
+    Returns:
+        dict: The record, in the format of HabitTracker.to_json for "json".
+    """
+    record = {
+        "name": habit.name,
+        "periodicity": habit.periodicity,
+        "start_date": habit.start_date.strftime("%Y-%m-%d"),
+    }
+    if habit.compact:
+        ordinals = habit.completion_dates.ordinals  # Already sorted
+    else:
+        ordinals = [date.toordinal() for date in habit.completion_dates]
+    if format == "compact":
+        days = []
+        previous = 0
+        for ordinal in (ordinals if habit.compact else sorted(ordinals)):
+            days.append(ordinal - previous)
+            previous = ordinal
+        record["completion_days"] = days
+    else:
+        record["completion_dates"] = [format_ordinal(ordinal) for ordinal in ordinals]
+    return record
+
+
+def _iter_document(records, format, metadata):
+    """
+    Yields a habits document piece by piece around the given records.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported format: '{format}'. Must be one of: {', '.join(FORMATS)}.")
+    indented = format == "json"
+    yield "{\n" if indented else "{"
+    for key, value in (metadata or {}).items():
+        yield f"    {json.dumps(key)}: {json.dumps(value)},\n" if indented else f"{json.dumps(key)}:{json.dumps(value)},"
+    yield '    "habits": [' if indented else '"habits":['
+    empty = True
+    for record in records:
+        if indented:
+            # Nest the record two levels deep, the same layout json.dump(..., indent=4) creates
+            yield ("\n        " if empty else ",\n        ") + json.dumps(record, indent=4).replace("\n", "\n        ")
+        else:
+            yield ("" if empty else ",") + json.dumps(record, separators=(",", ":"))
+        empty = False
+    if indented:
+        yield "]\n}" if empty else "\n    ]\n}"
+    else:
+        yield "]}"
+
+
+def iter_json_chunks(habit_tracker, format="json", metadata=None):
+    """
+    Yields the saved JSON document of a tracker piece by piece, one habit at a time.
+
+    The "json" format is the indented layout of habits.json, the "compact" format is
+    minified and stores completions as day differences, see habit_record.
+
+    Args:
+        habit_tracker (HabitTracker): The tracker to save.
+        format (str, optional): "json" or "compact".
+        metadata (dict, optional): Extra top level keys written before the habits.
+
+    Yields:
+        str: Consecutive parts of the document.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    return _iter_document((habit_record(habit, format) for habit in habit_tracker.get_all_habits()), format, metadata)
+
+
+def _fsync_directory(directory):
+    """
+    Forces a rename in a directory onto the disk. Skipped where directories can't be opened, e.g. on Windows.
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(filename, chunks, binary=False):
+    """
+    Streams chunks into a temporary file next to filename, fsyncs it and renames it over filename.
+
+    The file keeps the permissions of the file it replaces, and a new file gets the
+    permissions open would give it. The directory is fsync'd too, so the rename itself
+    survives a crash.
+
+    Args:
+        filename (str): Path of the file.
+        chunks (iterable of str or bytes): Consecutive parts of the file.
+        binary (bool, optional): The chunks are bytes instead of text.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    try:
+        mode = os.stat(filename).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    with tempfile.NamedTemporaryFile("wb" if binary else "w", dir=directory, prefix=os.path.basename(filename) + ".",
+                                     suffix=".tmp", delete=False) as f:
+        try:
+            os.chmod(f.name, mode)  # Temporary files are only readable by their owner
+            f.writelines(chunks)
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+    os.replace(f.name, filename)
+    _fsync_directory(directory)
+
+
+def write_tracker(habit_tracker, filename, format="json", metadata=None):
+    """
+    Saves a tracker to a file atomically.
+
+    The document is streamed into a temporary file next to the target, which is
+    fsync'd and then renamed over the target. A crash while saving leaves the old
+    file untouched instead of a truncated one.
+
+    Args:
+        habit_tracker (HabitTracker): The tracker to save.
+        filename (str): Path of the file.
+        format (str, optional): "json" or "compact", see iter_json_chunks.
+        metadata (dict, optional): Extra top level keys written before the habits.
+    """
+    write_atomic(filename, iter_json_chunks(habit_tracker, format, metadata))
+
+
+def write_records(records, filename, format="json", metadata=None):
+    """
+    Saves habit records created by habit_record to a file atomically, like write_tracker.
+    """
+    write_atomic(filename, _iter_document(records, format, metadata))
+
+
+class Storage:
+    """
+    Base class for the places a HabitTracker is saved to.
+
+    A tracker created by load calls the habit_* hooks after every change, so a storage
+    can write single changes as they happen instead of rewriting everything on save.
+    """
+    def load(self, names=None, periodicities=None):
+        """
+        Loads the saved habits into a new HabitTracker that reports its changes to this storage.
+
+        Args:
+            names (iterable of str, optional): Only load habits with these names.
+            periodicities (iterable of str, optional): Only load habits with these periodicities.
+
+        Returns:
+            HabitTracker instance.
+        """
+        raise NotImplementedError
+
+    def save(self, habit_tracker):
+        """
+        Replaces everything saved with the habits of the tracker.
+
+        Args:
+            habit_tracker (HabitTracker): The tracker to save.
+        """
+        raise NotImplementedError
+
+    def flush(self, habit_tracker):
+        """
+        Makes sure all changes of the tracker are saved. Storages that write changes as
+        they happen have nothing left to do here.
+
+        Args:
+            habit_tracker (HabitTracker): The tracker to save.
+        """
+        self.save(habit_tracker)
+
+    def close(self):
+        """
+        Releases files or connections held by the storage.
+        """
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups the changes made inside the with block, so a storage that writes every
+        change as it happens can save them together.
+        """
+        yield
+
+    def habit_added(self, habit):
+        """
+        Called after a habit was added to the tracker.
+        """
+
+    def habit_completed(self, habit, date):
+        """
+        Called after a habit was marked as completed.
+        """
+
+    def habit_completed_many(self, habit, dates):
+        """
+        Called after a habit was marked as completed on many dates at once.
+        """
+        for date in dates:
+            self.habit_completed(habit, date)
+
+    def habit_edited(self, habit_name, habit):
+        """
+        Called after a habit was edited. habit_name is the name before the change.
+        """
+
+    def habit_deleted(self, habit_name):
+        """
+        Called after a habit was deleted from the tracker.
+        """
+
+
+class JsonFileStorage(Storage):
+    """
+    Saves habits to a JSON file like habits.json. The whole file is rewritten on every save.
+    """
+    def __init__(self, filename="habits.json", compact=False, format="json"):
+        """
+        Args:
+            filename (str, optional): Path of the JSON file.
+            compact (bool, optional): Create habits with compact completion storage when loading.
+            format (str, optional): "json" for the indented layout or "compact" for minified
+                JSON with delta encoded completions, see iter_json_chunks.
+        """
+        self.filename = filename
+        self.compact = compact
+        self.format = format
+        self.partial = False
+
+    def load(self, names=None, periodicities=None):
+        """
+        Loads the habits from the JSON file, see load_tracker.
+
+        A tracker loaded with names or periodicities only holds part of the file,
+        so it can't be saved back to it.
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist.
+            json.JSONDecodeError: If the file is not valid JSON.
+        """
+        habit_tracker = load_tracker(self.filename, names=names, periodicities=periodicities, compact=self.compact)
+        habit_tracker.storage = self
+        self.partial = names is not None or periodicities is not None
+        return habit_tracker
+
+    def save(self, habit_tracker):
+        """
+        Rewrites the JSON file with the habits of the tracker.
+
+        Raises:
+            ValueError: If the habits were loaded with a name or periodicity filter.
+        """
+        if self.partial and habit_tracker.storage is self:
+            raise ValueError("Only part of the habits were loaded, saving would remove the others from the file.")
+        write_tracker(habit_tracker, self.filename, self.format)
+
+
+class SqliteStorage(Storage):
+    """
+    Saves habits to a SQLite database.
+
+    Every add, completion, edit and delete is written as a single statement on an
+    indexed table right when it happens, so saving costs as much as the change itself
+    and not as much as the whole history.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS habits (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            periodicity TEXT NOT NULL,
+            start_date TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS habits_periodicity ON habits (periodicity);
+        CREATE TABLE IF NOT EXISTS completions (
+            habit_id INTEGER NOT NULL REFERENCES habits (id) ON DELETE CASCADE,
+            date TEXT NOT NULL,
+            PRIMARY KEY (habit_id, date)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, filename="habits.db", compact=False):
+        """
+        Opens the database, creating the tables if they don't exist yet.
+
+        Args:
+            filename (str, optional): Path of the database file.
+            compact (bool, optional): Create habits with compact completion storage when loading.
+        """
+        self.filename = filename
+        self.compact = compact
+        # Autocommit, each statement is saved at once. A thread-safe HabitTracker reports changes from
+        # many threads, one at a time, so the connection may be used by other threads than its creator.
+        self.connection = sqlite3.connect(filename, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(self.SCHEMA)
+
+    def _records(self, names, periodicities):
+        """
+        Yields the saved habits as records in the format of HabitTracker.to_json.
+        """
+        query = "SELECT id, name, periodicity, start_date FROM habits"
+        conditions = []
+        parameters = []
+        for column, values in (("name", names), ("periodicity", periodicities)):
+            if values is not None:
+                values = list(values)
+                conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                parameters.extend(values)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        for habit_id, name, periodicity, start_date in self.connection.execute(query + " ORDER BY id", parameters).fetchall():
+            dates = self.connection.execute(
+                "SELECT date FROM completions WHERE habit_id = ? ORDER BY date", (habit_id,)
+            )
+            yield {
+                "name": name,
+                "periodicity": periodicity,
+                "start_date": start_date,
+                "completion_dates": [date for (date,) in dates],
+            }
+
+    def load(self, names=None, periodicities=None):
+        habit_tracker = HabitTracker.from_records(self._records(names, periodicities), compact=self.compact)
+        habit_tracker.storage = self
+        return habit_tracker
+
+    def save(self, habit_tracker):
+        with self.connection:  # One transaction, so a failed save leaves the old data in place
+            self.connection.execute("BEGIN")
+            self.connection.execute("DELETE FROM habits")
+            for habit in habit_tracker.get_all_habits():
+                self.habit_added(habit)  # With its completions
+
+    def flush(self, habit_tracker):
+        pass  # Every change has been written already
+
+    def close(self):
+        self.connection.close()
+
+    @contextmanager
+    def batch(self):
+        if self.connection.in_transaction:  # Already inside a batch
+            yield
+            return
+        with self.connection:  # One transaction instead of one commit per change
+            self.connection.execute("BEGIN")
+            yield
+
+    def habit_added(self, habit):
+        with self.batch():  # The habit and its completions are saved together
+            habit_id = self.connection.execute(
+                "INSERT INTO habits (name, periodicity, start_date) VALUES (?, ?, ?)",
+                (habit.name, habit.periodicity, habit.start_date.strftime("%Y-%m-%d"))
+            ).lastrowid
+            # A habit may be added with its history, e.g. by an import
+            self.connection.executemany(
+                "INSERT INTO completions (habit_id, date) VALUES (?, ?)",
+                [(habit_id, format_ordinal(date.toordinal())) for date in habit.completion_dates]
+            )
+
+    def habit_completed(self, habit, date):
+        self.connection.execute(
+            "INSERT OR IGNORE INTO completions (habit_id, date) SELECT id, ? FROM habits WHERE name = ?",
+            (date.strftime("%Y-%m-%d"), habit.name)
+        )
+
+    def habit_completed_many(self, habit, dates):
+        (habit_id,) = self.connection.execute("SELECT id FROM habits WHERE name = ?", (habit.name,)).fetchone()
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO completions (habit_id, date) VALUES (?, ?)",
+            [(habit_id, format_ordinal(date.toordinal())) for date in dates]
+        )
+
+    def habit_edited(self, habit_name, habit):
+        start_date = habit.start_date.strftime("%Y-%m-%d")
+        self.connection.execute(
+            "UPDATE habits SET name = ?, periodicity = ?, start_date = ? WHERE name = ?",
+            (habit.name, habit.periodicity, start_date, habit_name)
+        )
+        # Completions before a later start date were removed from the habit as well
+        self.connection.execute(
+            "DELETE FROM completions WHERE habit_id = (SELECT id FROM habits WHERE name = ?) AND date < ?",
+            (habit.name, start_date)
+        )
+
+    def habit_deleted(self, habit_name):
+        self.connection.execute("DELETE FROM habits WHERE name = ?", (habit_name,))  # Completions are deleted by cascade
+
+
+class SnapshotStorage(Storage):
+    """
+    Saves habits to a binary snapshot file, see snapshot.py. The whole file is rewritten on every save.
+    """
+    def __init__(self, filename="habits.snap", compact=False, lazy=False):
+        """
+        Args:
+            filename (str, optional): Path of the snapshot file.
+            compact (bool, optional): Create habits with compact completion storage when loading.
+            lazy (bool, optional): Decode the completions of each habit on first access, see HabitTracker.from_snapshot.
+        """
+        self.filename = filename
+        self.compact = compact
+        self.lazy = lazy
+        self.partial = False
+
+    def load(self, names=None, periodicities=None):
+        """
+        Loads the habits from the snapshot, decoding only the selected ones.
+
+        A tracker loaded with names or periodicities only holds part of the file,
+        so it can't be saved back to it.
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist.
+            ValueError: If the file is not a snapshot file.
+        """
+        habit_tracker = HabitTracker.from_snapshot(self.filename, names=names, periodicities=periodicities,
+                                                   compact=self.compact, lazy=self.lazy)
+        habit_tracker.storage = self
+        self.partial = names is not None or periodicities is not None
+        return habit_tracker
+
+    def save(self, habit_tracker):
+        """
+        Rewrites the snapshot file with the habits of the tracker.
+
+        Raises:
+            ValueError: If the habits were loaded with a name or periodicity filter.
+        """
+        if self.partial and habit_tracker.storage is self:
+            raise ValueError("Only part of the habits were loaded, saving would remove the others from the file.")
+        habit_tracker.to_snapshot(self.filename)
+
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+SNAPSHOT_EXTENSIONS = (".snap",)
+
+
+def open_storage(filename, compact=False, journal=False, format="json", lazy=False):
+    """
+    Creates the storage matching the file extension: SQLite for .db, .sqlite and .sqlite3 files,
+    a binary snapshot for .snap files and JSON otherwise.
+
+    Args:
+        filename (str): Path of the data file.
+        compact (bool, optional): Create habits with compact completion storage when loading.
+        journal (bool, optional): Keep a journal of changes next to JSON files, see journal.JournalStorage.
+        format (str, optional): Format of JSON files, "json" or "compact", see iter_json_chunks.
+        lazy (bool, optional): Decode completions on first access, only supported for snapshot files.
+
+    Returns:
+        Storage instance.
+
+    Raises:
+        ValueError: If lazy loading is requested for a file that is not a snapshot.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in SNAPSHOT_EXTENSIONS:
+        return SnapshotStorage(filename, compact=compact, lazy=lazy)
+    if lazy:
+        raise ValueError("Lazy loading needs a snapshot (.snap) file.")
+    if extension in SQLITE_EXTENSIONS:
+        return SqliteStorage(filename, compact=compact)
+    if journal:
+        from journal import JournalStorage  # journal.py builds on this module
+        return JournalStorage(filename, compact=compact, format=format)
+    return JsonFileStorage(filename, compact=compact, format=format)
@@ -0,0 +1,167 @@
+"""
+Serving the habit trackers of many users from one process.
+
+Every user has a habits file of their own, so users never share a file, a journal
+or a lock. The files are spread over shard directories by a hash of the user id,
+which keeps directories small with many thousands of users. Only the trackers used
+most recently are kept in memory; the least recently used one is flushed, closed
+and dropped when a new one has to be loaded.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from urllib.parse import quote
+from storage import open_storage
+
+BACKENDS = {"json": ".json", "sqlite": ".db"}  # Backend -> extension of the user files
+
+
+class TrackerManager:
+    """
+    Loads, caches and saves the trackers of many users.
+
+    Trackers are loaded on first use with get and report every change to their
+    storage: a journaled JSON file or a SQLite database. Their changes are already
+    on disk, so evicting a tracker only has to flush and close its storage.
+
+    Every loaded tracker keeps a file or connection open, so capacity should stay
+    well below the limit of open files of the process.
+    """
+    def __init__(self, directory, backend="json", capacity=256, shards=256, compact=False):
+        """
+        Args:
+            directory (str): Directory of the shard directories, created if needed.
+            backend (str, optional): "json" for journaled JSON files, "sqlite" for SQLite databases.
+            capacity (int, optional): Number of trackers kept in memory.
+            shards (int, optional): Number of shard directories the users are spread over.
+            compact (bool, optional): Load habits with compact completion storage.
+
+        Raises:
+            ValueError: If the backend is not supported, or capacity or shards is smaller than 1.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Invalid backend: '{backend}'. Must be one of: {', '.join(BACKENDS)}.")
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1.")
+        if shards < 1:
+            raise ValueError("Number of shards must be at least 1.")
+        self.directory = directory
+        self.backend = backend
+        self.capacity = capacity
+        self.shards = shards
+        self.compact = compact
+        self._trackers = OrderedDict()  # User id -> tracker, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, user_id):
+        """
+        Returns the path of a user's habits file.
+
+        The shard is picked with a stable hash of the user id, so a user always ends up
+        in the same directory, and the id is escaped to a safe file name.
+
+        Args:
+            user_id (str): The user.
+
+        Raises:
+            ValueError: If user_id is empty or not a string.
+        """
+        if not isinstance(user_id, str) or not user_id.strip():
+            raise ValueError("User id must be a non-empty string.")
+        digest = hashlib.sha1(user_id.encode("utf-8")).digest()
+        shard = int.from_bytes(digest[:4], "big") % self.shards
+        name = quote(user_id, safe="").replace(".", "%2E")  # No ".." or hidden files
+        return os.path.join(self.directory, f"{shard:04x}", name + BACKENDS[self.backend])
+
+    def get(self, user_id):
+        """
+        Returns the tracker of a user, loading it if it isn't in memory.
+        A user without a habits file gets an empty tracker, saved with its first change.
+
+        Args:
+            user_id (str): The user.
+
+        Returns:
+            HabitTracker instance that saves its changes to the user's file.
+
+        Raises:
+            ValueError: If user_id is empty or not a string.
+        """
+        habit_tracker = self._trackers.get(user_id)
+        if habit_tracker is not None:
+            self._trackers.move_to_end(user_id)
+            self.hits += 1
+            return habit_tracker
+        filename = self.path(user_id)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        storage = open_storage(filename, compact=self.compact, journal=True)
+        try:
+            habit_tracker = storage.load()
+        except BaseException:
+            storage.close()
+            raise
+        self.misses += 1
+        self._trackers[user_id] = habit_tracker
+        while len(self._trackers) > self.capacity:
+            self._evict(*self._trackers.popitem(last=False))
+        return habit_tracker
+
+    def _evict(self, user_id, habit_tracker):
+        """
+        Saves and closes the storage of a tracker that was removed from memory.
+        """
+        self.evictions += 1
+        try:
+            habit_tracker.storage.flush(habit_tracker)
+        finally:
+            habit_tracker.storage.close()
+
+    def evict(self, user_id):
+        """
+        Saves a user's tracker and removes it from memory.
+
+        Args:
+            user_id (str): The user.
+
+        Returns:
+            bool: False if the tracker was not in memory.
+        """
+        habit_tracker = self._trackers.pop(user_id, None)
+        if habit_tracker is None:
+            return False
+        self._evict(user_id, habit_tracker)
+        return True
+
+    def flush(self):
+        """
+        Saves the pending changes of all trackers in memory, keeping them loaded.
+        """
+        for habit_tracker in self._trackers.values():
+            habit_tracker.storage.flush(habit_tracker)
+
+    def close(self):
+        """
+        Saves and removes all trackers from memory.
+        """
+        while self._trackers:
+            self._evict(*self._trackers.popitem(last=False))
+
+    def __contains__(self, user_id):
+        """
+        Checks if a user's tracker is in memory.
+        """
+        return user_id in self._trackers
+
+    def __len__(self):
+        """
+        Returns the number of trackers in memory.
+        """
+        return len(self._trackers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
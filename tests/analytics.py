@@ -0,0 +1,341 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+from completions import CompactCompletions
+from habit import Habit
+from periods import period_index, period_indices
+from streaks import StreakIndex
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, plain Python is used without it
+    np = None
+
+STATISTICS_COLUMNS = ("name", "periodicity", "longest_streak", "current_streak", "completions", "completion_rate")
+
+
+def _completion_ordinals(habit):
+    """
+    Returns the day ordinals of a habit's completions as a NumPy array.
+    """
+    dates = habit.completion_dates
+    if habit.compact:
+        # Copied: a view would keep other threads from adding completions while it exists
+        return np.array(dates.ordinals, dtype=np.int32)
+    return np.fromiter((date.toordinal() for date in dates), dtype=np.int64, count=len(dates))
+
+
+def _elapsed_periods(habit, as_of_period):
+    """
+    Returns the number of periods from the habit's start up to and including as_of_period.
+    """
+    return max(as_of_period - period_index(habit.start_date, habit.periodicity) + 1, 0)
+
+
+def _statistics_python(habits, as_of):
+    """
+    Collects the statistics habit by habit from the streak index each habit keeps up to date.
+    """
+    columns = {column: [] for column in STATISTICS_COLUMNS}
+    for habit in habits:
+        completed_periods = habit.count_completed_periods(as_of)
+        elapsed = _elapsed_periods(habit, period_index(as_of, habit.periodicity))
+        columns["name"].append(habit.name)
+        columns["periodicity"].append(habit.periodicity)
+        columns["longest_streak"].append(habit.get_longest_streak())
+        columns["current_streak"].append(habit.get_current_streak(as_of))
+        columns["completions"].append(len(habit.completion_dates))
+        columns["completion_rate"].append(min(completed_periods / elapsed, 1.0) if elapsed else 0.0)
+    return columns
+
+
+def _statistics_vectorized(habits, as_of):
+    """
+    Computes the statistics of all habits together on one segmented array.
+
+    The period indices of every habit are shifted by habit_number * stride, where
+    the stride is larger than any gap between periods. A single sort then groups
+    each habit's periods, and the shift guarantees that runs never continue from
+    one habit into the next, so one np.diff finds the runs of all habits at once.
+    """
+    count = len(habits)
+    ids = []
+    periods = []
+    as_of_periods = np.empty(count, dtype=np.int64)
+    start_periods = np.empty(count, dtype=np.int64)
+    for periodicity in {habit.periodicity for habit in habits}:
+        members = [i for i, habit in enumerate(habits) if habit.periodicity == periodicity]
+        ordinals = [_completion_ordinals(habits[i]) for i in members]
+        ids.append(np.repeat(np.asarray(members, dtype=np.int64), [len(part) for part in ordinals]))
+        periods.append(np.asarray(period_indices(np.concatenate(ordinals) if ordinals else [], periodicity), dtype=np.int64))
+        as_of_periods[members] = period_index(as_of, periodicity)
+        start_ordinals = np.array([habits[i].start_date.toordinal() for i in members], dtype=np.int64)
+        start_periods[members] = period_indices(start_ordinals, periodicity)
+    ids = np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+    periods = np.concatenate(periods) if periods else np.empty(0, dtype=np.int64)
+
+    # The lowest period in use, so the offsets within a segment start near 0 instead of at the day ordinals
+    low = min(periods.min() if len(periods) else 0, as_of_periods.min() if count else 0)
+    stride = max(periods.max(initial=0), as_of_periods.max(initial=0)) - low + 3
+    keys = np.sort(ids * stride + (periods - low))
+    as_of_keys = np.arange(count, dtype=np.int64) * stride + (as_of_periods - low)
+
+    # Runs of consecutive keys, duplicates (same period completed twice) differ by 0
+    breaks = np.flatnonzero(np.diff(keys) > 1) + 1
+    run_starts = keys[np.concatenate(([0], breaks))] if len(keys) else keys
+    run_ends = keys[np.concatenate((breaks - 1, [len(keys) - 1]))] if len(keys) else keys
+    run_lengths = run_ends - run_starts + 1
+    longest = np.zeros(count, dtype=np.int64)
+    np.maximum.at(longest, run_starts // stride, run_lengths)
+
+    # Current streak: the run containing the as_of period, or else the period before it
+    current = np.zeros(count, dtype=np.int64)
+    for offset in (1, 0):
+        target = as_of_keys - offset
+        position = np.searchsorted(run_starts, target, side="right") - 1
+        valid = position >= 0
+        hit = np.zeros(count, dtype=bool)
+        hit[valid] = run_ends[position[valid]] >= target[valid]
+        current[hit] = run_lengths[position[hit]]
+
+    # Completed periods up to as_of, counted once per period
+    first_in_period = np.concatenate(([True], np.diff(keys) != 0)) if len(keys) else np.empty(0, dtype=bool)
+    owners = keys // stride
+    counted = first_in_period & (keys <= as_of_keys[owners])
+    completed_periods = np.bincount(owners[counted], minlength=count)
+    completions = np.bincount(ids, minlength=count)
+    elapsed = np.maximum(as_of_periods - start_periods + 1, 0)
+    rates = np.minimum(np.divide(completed_periods, elapsed, out=np.zeros(count), where=elapsed > 0), 1.0)
+
+    return {
+        "name": [habit.name for habit in habits],
+        "periodicity": [habit.periodicity for habit in habits],
+        "longest_streak": longest.tolist(),
+        "current_streak": current.tolist(),
+        "completions": completions.tolist(),
+        "completion_rate": rates.tolist(),
+    }
+
+
+CACHED_COLUMNS = ("longest_streak", "current_streak", "completions", "completion_rate")
+CACHE_SIZE = 8  # as_of periods remembered per habit
+
+
+def _compute(habits, as_of, vectorized, executor=None):
+    """
+    Computes the statistics of habits without looking at their caches.
+    """
+    if executor is not None:
+        return executor.compute_statistics(habits, as_of)
+    if vectorized:
+        return _statistics_vectorized(habits, as_of)
+    return _statistics_python(habits, as_of)
+
+
+def _ordinal_array(habit):
+    """
+    Returns the sorted day ordinals of a habit's completions as an array('i'), which pickles as raw bytes.
+    """
+    dates = habit.completion_dates
+    if habit.compact:
+        return dates.ordinals[:]
+    return array("i", sorted(date.toordinal() for date in dates))
+
+
+def _rebuild_habits(records):
+    """
+    Creates compact habits from (periodicity, start ordinal, ordinals) records in a worker process.
+    """
+    habits = []
+    for periodicity, start_ordinal, ordinals in records:
+        habit = Habit("habit", periodicity, datetime.fromordinal(start_ordinal), compact=True)
+        habit.completion_dates = CompactCompletions.from_sorted(ordinals)
+        habits.append(habit)
+    return habits
+
+
+def _statistics_chunk(records, as_of):
+    """
+    Computes the statistics columns of one chunk of habit records in a worker process.
+    """
+    columns = _compute(_rebuild_habits(records), as_of, np is not None)
+    return tuple(columns[column] for column in CACHED_COLUMNS)
+
+
+def _longest_streaks_chunk(records):
+    """
+    Computes the longest streak of every habit record of one chunk in a worker process.
+    """
+    return [StreakIndex.from_ordinals(ordinals, periodicity).longest if len(ordinals) else 0
+            for periodicity, _, ordinals in records]
+
+
+def _completion_listing_chunk(records):
+    """
+    Formats the sorted completion dates of every habit record of one chunk in a worker process.
+    """
+    from storage import format_ordinal  # storage.py builds on habit_tracker.py, which imports this module
+    return [[format_ordinal(ordinal) for ordinal in ordinals] for _, _, ordinals in records]
+
+
+class AnalyticsExecutor:
+    """
+    Computes streaks, statistics and completion listings of many habits in worker processes.
+
+    The habits are split into chunks of chunk_size. Each habit is sent as its
+    periodicity, start date and an array of day ordinals, which is far smaller and
+    faster to pickle than a list of datetime objects, and the results of the chunks
+    are put back together in the order of the habits. Only worth it for large
+    trackers: every call pays for sending the ordinals to the workers.
+    """
+    def __init__(self, workers=None, chunk_size=2000):
+        """
+        Args:
+            workers (int, optional): Number of worker processes, defaults to the number of CPUs.
+            chunk_size (int, optional): Number of habits handled by a worker at a time.
+
+        Raises:
+            ValueError: If chunk_size is smaller than 1.
+        """
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be at least 1.")
+        self.chunk_size = chunk_size
+        self._pool = ProcessPoolExecutor(workers)
+
+    def _map(self, function, habits, *args):
+        """
+        Runs function on chunks of habit records and returns the results of the chunks in order.
+        """
+        chunks = []
+        for start in range(0, len(habits), self.chunk_size):
+            chunks.append([(habit.periodicity, habit.start_date.toordinal(), _ordinal_array(habit))
+                           for habit in habits[start:start + self.chunk_size]])
+        return self._pool.map(function, chunks, *(repeat(arg, len(chunks)) for arg in args))
+
+    def compute_statistics(self, habits, as_of=None):
+        """
+        Computes the statistics of habits like get_statistics, without using their caches.
+
+        Returns:
+            dict: Columnar result, one list per column in STATISTICS_COLUMNS, in the order of habits.
+        """
+        habits = list(habits)
+        if as_of is None:
+            as_of = datetime.now()
+        columns = {
+            "name": [habit.name for habit in habits],
+            "periodicity": [habit.periodicity for habit in habits],
+        }
+        for column in CACHED_COLUMNS:
+            columns[column] = []
+        for chunk in self._map(_statistics_chunk, habits, as_of):
+            for column, values in zip(CACHED_COLUMNS, chunk):
+                columns[column].extend(values)
+        return columns
+
+    def longest_streaks(self, habits):
+        """
+        Returns the longest streak of every habit, in the order of habits.
+        """
+        streaks = []
+        for chunk in self._map(_longest_streaks_chunk, list(habits)):
+            streaks.extend(chunk)
+        return streaks
+
+    def completion_listing(self, habits):
+        """
+        Returns the sorted completion dates of every habit as "YYYY-MM-DD" strings, in the order of habits.
+        """
+        listing = []
+        for chunk in self._map(_completion_listing_chunk, list(habits)):
+            listing.extend(chunk)
+        return listing
+
+    def close(self):
+        """
+        Shuts the worker processes down.
+        """
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def get_statistics(habits, as_of=None, vectorized=None, cached=True, executor=None):
+    """
+    Computes streaks, completion counts and completion rates for many habits in one pass.
+
+    The completion rate is the share of periods between the habit's start and as_of
+    in which the habit was completed.
+
+    Results are kept in each habit's statistics_cache, which the habit empties whenever
+    it changes, so asking again for the same period only computes the habits that
+    changed in between.
+
+    Args:
+        habits (list): Habit objects to analyse.
+        as_of (datetime, optional): Date used for current streaks and completion rates, defaults to now.
+        vectorized (bool, optional): Force or disable the NumPy path. By default NumPy
+            is used when it is installed.
+        cached (bool, optional): Use and fill the habits' caches.
+        executor (AnalyticsExecutor, optional): Compute the habits missing from the caches in its worker processes.
+
+    Returns:
+        dict: Columnar result, one list per column in STATISTICS_COLUMNS, in the order of habits.
+
+    Raises:
+        ValueError: If as_of is not a datetime object or a habit has an unsupported periodicity.
+    """
+    if as_of is None:
+        as_of = datetime.now()
+    if not isinstance(as_of, datetime):
+        raise ValueError("Date must be a datetime object.")
+    habits = list(habits)
+    if vectorized is None:
+        vectorized = np is not None
+    if vectorized and np is None:
+        raise ValueError("NumPy is required for the vectorized statistics.")
+    if not cached:
+        return _compute(habits, as_of, vectorized, executor)
+
+    # Every statistic depends only on the period of as_of, not on the exact date
+    as_of_periods = {}
+    keys = []
+    caches = []
+    rows = []
+    missing = []
+    for position, habit in enumerate(habits):
+        periodicity = habit.periodicity
+        period = as_of_periods.get(periodicity)
+        if period is None:
+            period = as_of_periods[periodicity] = period_index(as_of, periodicity)
+        # Taken before computing: if the habit changes meanwhile, its new cache doesn't get the old result
+        cache = habit.statistics_cache
+        row = cache.get(period)
+        if row is None:
+            missing.append(position)
+        keys.append(period)
+        caches.append(cache)
+        rows.append(row)
+
+    if missing:
+        computed = _compute([habits[position] for position in missing], as_of, vectorized, executor)
+        for position, row in zip(missing, zip(*(computed[column] for column in CACHED_COLUMNS))):
+            cache = caches[position]
+            if len(cache) >= CACHE_SIZE:
+                cache.clear()
+            cache[keys[position]] = rows[position] = row
+
+    columns = {
+        "name": [habit.name for habit in habits],
+        "periodicity": [habit.periodicity for habit in habits],
+    }
+    for column, values in zip(CACHED_COLUMNS, zip(*rows)):
+        columns[column] = list(values)
+    for column in CACHED_COLUMNS:
+        columns.setdefault(column, [])
+    return columns
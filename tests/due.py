@@ -0,0 +1,124 @@
+"""
+An index of the habits that are due, see HabitTracker.get_due_habits.
+
+A habit is due from the first day of the earliest period it still has to be
+completed in (Habit.get_next_due_date) until it is completed again, and it is at
+risk while it is due and its current streak is still alive: missing the current
+period would break the streak. Habits are kept in a heap ordered by the day they
+are due from, for all periodicities at once, so finding the k habits due on a day
+takes O(k log k) steps, no matter how many habits or completions there are.
+"""
+from heapq import heapify, heappop, heappush
+from itertools import count
+
+
+class DueIndex:
+    """
+    Heap of habits keyed by the day ordinal they are due from.
+
+    Completions only ever move a habit's due day later, so the heap doesn't have to
+    be told about them: a habit found due is checked against its actual due day and
+    moved further down the heap if it was completed meanwhile. Changes that can move
+    the due day earlier (a new periodicity or start date) must be reported with update.
+
+    Replaced and removed entries stay in the heap until they are found, or until
+    they make up half of the heap, when it is rebuilt.
+    """
+    def __init__(self, habits=()):
+        """
+        Args:
+            habits (iterable, optional): (key, habit) pairs to index, the key identifies the habit in update and discard.
+        """
+        self._counter = count()  # Breaks ties between equal days, habits are never compared
+        self._entries = {}  # Key -> current (day ordinal, number, key, habit) entry of the heap
+        for key, habit in habits:
+            self._entries[key] = self._entry(key, habit)
+        self._heap = list(self._entries.values())
+        heapify(self._heap)
+
+    def _entry(self, key, habit):
+        return (habit.get_next_due_date().toordinal(), next(self._counter), key, habit)
+
+    def update(self, key, habit):
+        """
+        Adds a habit, or indexes it again after it changed.
+
+        Args:
+            key: Identifies the habit, e.g. its name.
+            habit (Habit): The habit.
+        """
+        entry = self._entry(key, habit)
+        self._entries[key] = entry
+        heappush(self._heap, entry)
+        self._compact()
+
+    def discard(self, key):
+        """
+        Removes a habit if it is indexed.
+
+        Args:
+            key: The key the habit was indexed with.
+        """
+        if self._entries.pop(key, None) is not None:
+            self._compact()
+
+    def _compact(self):
+        """
+        Rebuilds the heap from the current entries once half of it is replaced or removed entries.
+        """
+        if len(self._heap) > 2 * len(self._entries) + 16:
+            self._heap = list(self._entries.values())
+            heapify(self._heap)
+
+    def due(self, as_of):
+        """
+        Finds the habits that are due on a day.
+
+        The heap is walked from its smallest entry down to the entries due on as_of at
+        the latest, without taking any out, so only the habits found and their
+        children in the heap are looked at.
+
+        Args:
+            as_of (datetime): The day to check.
+
+        Returns:
+            list of Habit: The habits due on as_of, those due for the longest time first.
+        """
+        day = as_of.toordinal()
+        heap = self._heap
+        found = []
+        moved = []
+        frontier = [(heap[0][0], heap[0][1], 0)] if heap and heap[0][0] <= day else []
+        while frontier:
+            _, _, position = heappop(frontier)
+            entry = heap[position]
+            _, _, key, habit = entry
+            if self._entries.get(key) is entry:
+                if habit.get_next_due_date().toordinal() <= day:
+                    found.append(habit)
+                else:
+                    moved.append((key, habit))  # Completed since it was indexed
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap) and heap[child][0] <= day:
+                    heappush(frontier, (heap[child][0], heap[child][1], child))
+        for key, habit in moved:
+            self.update(key, habit)
+        return found
+
+    def at_risk(self, as_of):
+        """
+        Finds the habits that are due on a day and would break a streak if not completed in its period.
+
+        Args:
+            as_of (datetime): The day to check.
+
+        Returns:
+            list of Habit: The habits at risk on as_of, in the order of due.
+        """
+        return [habit for habit in self.due(as_of) if habit.get_current_streak(as_of)]
+
+    def __len__(self):
+        """
+        Returns the number of indexed habits.
+        """
+        return len(self._entries)
@@ -0,0 +1,273 @@
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from habit import Habit
+from habit_tracker import HabitTracker, parse_date
+from storage import Storage, habit_record, load_tracker, write_records
+
+
+def remove_journal(filename):
+    """
+    Removes the journal of a habits file, e.g. before the file is replaced with other habits.
+
+    Args:
+        filename (str): Path of the habits file.
+    """
+    for path in (filename + ".journal", filename + ".journal.compacting"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class JournalStorage(Storage):
+    """
+    Saves habits as a JSON snapshot plus an append-only journal of changes.
+
+    Every add, completion, edit and delete is appended to the journal as one JSON
+    line right when it happens, and the journal is fsync'd every batch_size events
+    and on flush. Loading reads the snapshot and replays the journal on top of it.
+    Once the journal has grown by compact_after events, it is compacted: the current
+    habits are written to a new snapshot in a background thread and the journal
+    starts over.
+
+    Events are numbered, and the snapshot remembers the number of the last event it
+    contains, so events that are already part of the snapshot are never replayed twice.
+    """
+    def __init__(self, filename="habits.json", batch_size=64, compact_after=10000, compact=False, format="json"):
+        """
+        Args:
+            filename (str, optional): Path of the JSON snapshot, the journal is kept next to it.
+            batch_size (int, optional): Number of events written before the journal is fsync'd.
+            compact_after (int, optional): Number of journal events that triggers a compaction on flush.
+            compact (bool, optional): Create habits with compact completion storage when loading.
+            format (str, optional): Format of the snapshot, see storage.iter_json_chunks.
+        """
+        self.filename = filename
+        self.journal_filename = filename + ".journal"
+        self.compacting_filename = filename + ".journal.compacting"  # Journal that is being folded into the snapshot
+        self.batch_size = batch_size
+        self.compact_after = compact_after
+        self.compact = compact
+        self.format = format
+        self.sequence = 0  # Number of the last event
+        self._journal = None
+        self._unsynced = 0
+        self._journal_events = 0
+        self._compaction = None  # Background compaction thread
+
+    def _replay(self, habit_tracker, filename, snapshot_sequence):
+        """
+        Applies the events of a journal file that are newer than the snapshot.
+        """
+        try:
+            f = open(filename, "r")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # The last line may be cut off if the process died while writing it
+                self.sequence = max(self.sequence, event["seq"])
+                if event["seq"] <= snapshot_sequence:
+                    continue
+                self._journal_events += 1
+                try:
+                    self._apply(habit_tracker, event)
+                except (KeyError, ValueError) as e:
+                    print(f"Skipping journal event due to invalid data: {e}", file=sys.stderr)
+
+    def _apply(self, habit_tracker, event):
+        """
+        Applies a single journal event to the tracker.
+        """
+        if event["op"] == "add":
+            habit = Habit(event["name"], event["periodicity"], parse_date(event["start_date"]), compact=self.compact)
+            habit.completion_dates = [parse_date(date_str) for date_str in event.get("completion_dates", [])]
+            habit_tracker.add_habit(habit)
+        elif event["op"] == "mark":
+            habit_tracker.mark_completed(event["name"], parse_date(event["date"]))
+        elif event["op"] == "mark_many":
+            habit_tracker.bulk_mark({event["name"]: [parse_date(date) for date in event["dates"]]})
+        elif event["op"] == "edit":
+            habit_tracker.edit_habit(
+                event["name"], new_name=event["new_name"], new_periodicity=event["periodicity"],
+                new_start_date=parse_date(event["start_date"])
+            )
+        elif event["op"] == "delete":
+            habit_tracker.delete_habit(event["name"])
+        else:
+            raise ValueError(f"Unknown journal event: {event['op']}")
+
+    def load(self, names=None, periodicities=None, read_only=False):
+        """
+        Loads the snapshot and replays the journal.
+
+        A snapshot that is not valid JSON is moved aside to a ".corrupt" file and the
+        whole journal is replayed on an empty tracker, which is then written as the new
+        snapshot right away. Otherwise the journal would keep growing on top of a
+        snapshot that can never be read, and every later load would fail the same way.
+
+        With read_only nothing is written, e.g. when the file is the input of an import:
+        an unreadable snapshot is an error, a journal left by an interrupted compaction
+        is only replayed, and the tracker doesn't report its changes to the storage.
+
+        Raises:
+            ValueError: If names or periodicities are given, a journaled file can only be loaded as a whole.
+            json.JSONDecodeError: If read_only is set and the snapshot is not valid JSON.
+        """
+        if names is not None or periodicities is not None:
+            raise ValueError("A journaled habits file can only be loaded as a whole.")
+        metadata = {}
+        corrupt = False
+        try:
+            habit_tracker = load_tracker(self.filename, compact=self.compact, metadata=metadata)
+        except FileNotFoundError:
+            habit_tracker = HabitTracker()
+        except json.JSONDecodeError:
+            if read_only:
+                raise
+            print(f"Error decoding JSON, keeping the file as {self.filename}.corrupt and rebuilding the habits "
+                  f"from the journal.", file=sys.stderr)
+            os.replace(self.filename, self.filename + ".corrupt")
+            habit_tracker = HabitTracker()
+            corrupt = True
+        snapshot_sequence = metadata.get("journal_sequence", 0)
+        self.sequence = snapshot_sequence
+        self._journal_events = 0
+        leftover = os.path.exists(self.compacting_filename)
+        self._replay(habit_tracker, self.compacting_filename, snapshot_sequence)
+        self._replay(habit_tracker, self.journal_filename, snapshot_sequence)
+        if read_only:
+            return habit_tracker
+        habit_tracker.storage = self
+        if leftover or corrupt:
+            # A compaction was interrupted or the snapshot is unreadable, write a new one right away
+            self.compact_now(habit_tracker, background=False)
+        return habit_tracker
+
+    def _append(self, event):
+        """
+        Writes one event to the journal, fsyncing every batch_size events.
+        """
+        if self._journal is None:
+            self._journal = open(self.journal_filename, "a")
+        self.sequence += 1
+        event["seq"] = self.sequence
+        self._journal.write(json.dumps(event) + "\n")
+        self._journal.flush()  # Hand the line to the OS, so it survives if the process dies
+        self._unsynced += 1
+        self._journal_events += 1
+        if self._unsynced >= self.batch_size:
+            self._sync()
+
+    def _sync(self):
+        """
+        Forces the journal onto the disk.
+        """
+        if self._journal is not None and self._unsynced:
+            os.fsync(self._journal.fileno())
+            self._unsynced = 0
+
+    @contextmanager
+    def batch(self):
+        """
+        Defers fsyncing the journal to the end of the with block.
+        """
+        batch_size = self.batch_size
+        self.batch_size = float("inf")
+        try:
+            yield
+        finally:
+            self.batch_size = batch_size
+            self._sync()
+
+    def habit_added(self, habit):
+        event = {"op": "add", "name": habit.name, "periodicity": habit.periodicity,
+                 "start_date": habit.start_date.strftime("%Y-%m-%d")}
+        if habit.completion_dates:  # A habit may be added with its history, e.g. by an import
+            event["completion_dates"] = habit_record(habit)["completion_dates"]
+        self._append(event)
+
+    def habit_completed(self, habit, date):
+        self._append({"op": "mark", "name": habit.name, "date": date.strftime("%Y-%m-%d")})
+
+    def habit_completed_many(self, habit, dates):
+        self._append({"op": "mark_many", "name": habit.name, "dates": [date.strftime("%Y-%m-%d") for date in dates]})
+
+    def habit_edited(self, habit_name, habit):
+        self._append({"op": "edit", "name": habit_name, "new_name": habit.name, "periodicity": habit.periodicity,
+                      "start_date": habit.start_date.strftime("%Y-%m-%d")})
+
+    def habit_deleted(self, habit_name):
+        self._append({"op": "delete", "name": habit_name})
+
+    def flush(self, habit_tracker):
+        """
+        Forces pending journal events onto the disk and starts a background compaction
+        if the journal has grown large enough.
+        """
+        self._sync()
+        if self._journal_events >= self.compact_after:
+            self.compact_now(habit_tracker)
+
+    def save(self, habit_tracker):
+        """
+        Writes all habits of the tracker to the snapshot and empties the journal.
+        """
+        self.compact_now(habit_tracker, background=False)
+
+    def compact_now(self, habit_tracker, background=True):
+        """
+        Folds the journal into a new snapshot of the tracker.
+
+        The habits are copied and the journal is set aside right away, so new events
+        go to a fresh journal while the snapshot is written. If the process dies
+        before the snapshot is in place, the set aside journal is replayed on the
+        next load.
+
+        Args:
+            habit_tracker (HabitTracker): The tracker to write to the snapshot.
+            background (bool, optional): Write the snapshot in a background thread.
+        """
+        if self._compaction is not None:
+            self._compaction.join()  # Only one compaction at a time
+            self._compaction = None
+        records = [habit_record(habit, self.format) for habit in habit_tracker.get_all_habits()]
+        metadata = {"journal_sequence": self.sequence}
+        self._sync()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.exists(self.journal_filename):
+            os.replace(self.journal_filename, self.compacting_filename)
+        self._journal_events = 0
+        if background:
+            self._compaction = threading.Thread(target=self._write_snapshot, args=(records, metadata), daemon=True)
+            self._compaction.start()
+        else:
+            self._write_snapshot(records, metadata)
+
+    def _write_snapshot(self, records, metadata):
+        """
+        Writes the snapshot atomically and drops the set aside journal.
+        """
+        write_records(records, self.filename, self.format, metadata)
+        if os.path.exists(self.compacting_filename):
+            os.remove(self.compacting_filename)
+
+    def close(self):
+        """
+        Waits for a running compaction and closes the journal.
+        """
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+        self._sync()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,65 @@
+"""
+Locks for using a HabitTracker from many threads, see HabitTracker(thread_safe=True).
+"""
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """
+    Lets many readers or a single writer in at a time.
+
+    Waiting writers are preferred: once a writer waits, new readers wait behind it,
+    so a steady stream of readers can't starve the writers. The writer may acquire
+    the lock again, for reading or writing, but a reader must not acquire it again
+    while holding it.
+    """
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None  # Identifier of the thread holding the write lock
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        """
+        Holds the lock shared with other readers for the with block.
+        """
+        if self._writer == threading.get_ident():  # Already holds the write lock
+            yield
+            return
+        with self._condition:
+            while self._writer is not None or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        """
+        Holds the lock exclusively for the with block.
+        """
+        thread = threading.get_ident()
+        if self._writer == thread:
+            yield
+            return
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = thread
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = None
+                self._condition.notify_all()
@@ -0,0 +1,363 @@
+"""
+A small HTTP/JSON API over the habit tracker, built on asyncio streams.
+
+Run from the repository root:
+    python server.py --file habits.json --port 8000
+    python server.py --users users/ --port 8000
+
+With --users every user has a tracker of their own (see tenants.py) and the paths
+start with /users/<user id>. Endpoints:
+
+    GET    /habits[?periodicity=daily]      list the habits
+    POST   /habits                          add a habit: {"name", "periodicity", "start_date"}
+    GET    /habits/<name>                   one habit with its streaks
+    PATCH  /habits/<name>                   edit a habit: {"name", "periodicity", "start_date"}
+    DELETE /habits/<name>                   delete a habit
+    POST   /habits/<name>/completions       mark a habit as completed: {"date"}, defaults to today
+    GET    /habits/<name>/streak            longest and current streak of a habit
+    GET    /streak                          longest streak of all habits
+
+Dates are YYYY-MM-DD strings. Invalid requests get a 400 response with
+{"error": message}, unknown habits a 404.
+
+Requests are handled on one event loop, so reads never wait for each other.
+Writes to the same tracker are serialized by a lock per tracker, and the changes
+they report to the storage are grouped into one storage batch (one SQLite
+transaction, one journal fsync) that is committed flush_interval seconds after
+the first write.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import weakref
+from urllib.parse import parse_qs, unquote, urlsplit
+from habit import Habit
+from habit_tracker import parse_date
+from main import load_data, today
+from periods import PERIODICITIES
+from tenants import TrackerManager
+
+REASONS = {
+    200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error",
+}
+MAX_BODY_SIZE = 1 << 20
+
+
+class HttpError(Exception):
+    """
+    Ends a request with an error response.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def habit_summary(habit, as_of=None):
+    """
+    Returns the fields of a habit sent by the API.
+    """
+    return {
+        "name": habit.name,
+        "periodicity": habit.periodicity,
+        "start_date": habit.start_date.strftime("%Y-%m-%d"),
+        "completions": len(habit.completion_dates),
+        "longest_streak": habit.get_longest_streak(),
+        "current_streak": habit.get_current_streak(as_of),
+    }
+
+
+def _date(value, field):
+    """
+    Parses a date of a request body, None if it wasn't given.
+    """
+    if value is None:
+        return None
+    try:
+        return parse_date(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f"Invalid {field}: {value!r}. Please use YYYY-MM-DD.")
+
+
+def _periodicity(value):
+    """
+    Checks a periodicity of a request body, None if it wasn't given.
+    """
+    if value is not None and value not in PERIODICITIES:
+        raise HttpError(400, f"Invalid periodicity: {value!r}. Must be one of: {', '.join(PERIODICITIES)}.")
+    return value
+
+
+class HabitServer:
+    """
+    Serves one tracker, or the trackers of many users with a TrackerManager.
+    """
+    def __init__(self, habit_tracker=None, manager=None, flush_interval=1.0):
+        """
+        Args:
+            habit_tracker (HabitTracker, optional): The tracker to serve.
+            manager (TrackerManager, optional): Serve a tracker per user instead.
+            flush_interval (float, optional): Seconds between the first write of a batch
+                and its commit. 0 commits every write right away.
+
+        Raises:
+            ValueError: If not exactly one of habit_tracker and manager is given.
+        """
+        if (habit_tracker is None) == (manager is None):
+            raise ValueError("Either a habit tracker or a tracker manager must be given.")
+        self.habit_tracker = habit_tracker
+        self.manager = manager
+        self.flush_interval = flush_interval
+        # User id (None for a single tracker) -> write lock, dropped once no write holds or waits for it
+        self._locks = weakref.WeakValueDictionary()
+        self._batches = {}  # User id -> (tracker, open storage batch, timer)
+
+    def _tracker(self, user_id):
+        """
+        Returns the tracker of a user, committing open batches before a load could evict a tracker.
+        """
+        if self.manager is None:
+            return self.habit_tracker
+        if user_id not in self.manager and len(self.manager) >= self.manager.capacity:
+            self.flush()
+        return self.manager.get(user_id)
+
+    def _begin_write(self, user_id, habit_tracker):
+        """
+        Opens a storage batch for the writes to a tracker, unless one is already open.
+        """
+        if user_id in self._batches or habit_tracker.storage is None:
+            return
+        batch = habit_tracker.storage.batch()
+        batch.__enter__()
+        timer = None
+        if self.flush_interval > 0:
+            timer = asyncio.get_running_loop().call_later(self.flush_interval, self._commit, user_id)
+        self._batches[user_id] = (habit_tracker, batch, timer)
+
+    def _commit(self, user_id):
+        """
+        Closes the open storage batch of a tracker and flushes its storage.
+        """
+        habit_tracker, batch, timer = self._batches.pop(user_id)
+        if timer is not None:
+            timer.cancel()
+        try:
+            batch.__exit__(None, None, None)
+        finally:
+            habit_tracker.storage.flush(habit_tracker)
+
+    def flush(self):
+        """
+        Commits every open storage batch.
+        """
+        for user_id in list(self._batches):
+            self._commit(user_id)
+
+    async def _write(self, user_id, habit_tracker, change):
+        """
+        Applies a change to a tracker while holding its write lock.
+        """
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        async with lock:
+            self._begin_write(user_id, habit_tracker)
+            try:
+                return change()
+            finally:
+                if self.flush_interval <= 0 and user_id in self._batches:
+                    self._commit(user_id)
+
+    async def dispatch(self, method, target, body=b""):
+        """
+        Handles one request.
+
+        Args:
+            method (str): HTTP method.
+            target (str): Path with the query string.
+            body (bytes, optional): Request body, JSON.
+
+        Returns:
+            tuple: Status code and the JSON-serializable response, None for no content.
+        """
+        try:
+            return await self._dispatch(method, target, body)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+
+    async def _dispatch(self, method, target, body):
+        url = urlsplit(target)
+        segments = [unquote(segment) for segment in url.path.strip("/").split("/")] if url.path.strip("/") else []
+        user_id = None
+        if self.manager is not None:
+            if len(segments) < 2 or segments[0] != "users":
+                raise HttpError(404, "Paths must start with /users/<user id>.")
+            user_id = segments[1]
+            segments = segments[2:]
+        habit_tracker = self._tracker(user_id)
+        data = {}
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                raise HttpError(400, "Request body must be JSON.")
+            if not isinstance(data, dict):
+                raise HttpError(400, "Request body must be a JSON object.")
+
+        if segments == ["habits"]:
+            if method == "GET":
+                periodicity = parse_qs(url.query).get("periodicity", [None])[0]
+                if periodicity is None:
+                    habits = habit_tracker.get_all_habits()
+                else:
+                    habits = habit_tracker.get_habits_by_periodicity(periodicity)
+                return 200, [habit_summary(habit) for habit in habits]
+            if method == "POST":
+                habit = Habit(data.get("name"), _periodicity(data.get("periodicity")), _date(data.get("start_date"), "start_date") or today())
+                await self._write(user_id, habit_tracker, lambda: habit_tracker.add_habit(habit))
+                return 201, habit_summary(habit)
+            raise HttpError(405, f"Method {method} is not allowed here.")
+        if segments == ["streak"]:
+            if method == "GET":
+                return 200, {"longest_streak": habit_tracker.get_longest_streak_all_habits()}
+            raise HttpError(405, f"Method {method} is not allowed here.")
+        if len(segments) < 2 or segments[0] != "habits" or len(segments) > 3:
+            raise HttpError(404, f"Unknown path: {url.path}")
+
+        name = segments[1]
+        habit = habit_tracker.get_habit(name)
+        if habit is None:
+            raise HttpError(404, f"Habit with name '{name}' not found.")
+        action = segments[2] if len(segments) == 3 else None
+        if action is None and method == "GET":
+            return 200, habit_summary(habit)
+        if action is None and method == "PATCH":
+            await self._write(user_id, habit_tracker, lambda: habit_tracker.edit_habit(
+                name, new_name=data.get("name"), new_periodicity=_periodicity(data.get("periodicity")),
+                new_start_date=_date(data.get("start_date"), "start_date")))
+            return 200, habit_summary(habit)
+        if action is None and method == "DELETE":
+            await self._write(user_id, habit_tracker, lambda: habit_tracker.delete_habit(name))
+            return 204, None
+        if action == "completions" and method == "POST":
+            date = _date(data.get("date"), "date") or today()
+            await self._write(user_id, habit_tracker, lambda: habit_tracker.mark_completed(name, date))
+            return 201, habit_summary(habit, as_of=date)
+        if action == "streak" and method == "GET":
+            return 200, {"longest_streak": habit.get_longest_streak(), "current_streak": habit.get_current_streak()}
+        if action in (None, "completions", "streak"):
+            raise HttpError(405, f"Method {method} is not allowed here.")
+        raise HttpError(404, f"Unknown path: {url.path}")
+
+    async def _read_request(self, reader):
+        """
+        Reads one request from a connection, None when the client closed it.
+        """
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "Invalid request line.")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length.")
+        if length > MAX_BODY_SIZE:
+            raise HttpError(413, "Request body is too large.")
+        body = await reader.readexactly(length) if length else b""
+        keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+        return method.upper(), target, body, keep_alive
+
+    async def handle_connection(self, reader, writer):
+        """
+        Answers the requests of one connection until the client closes it.
+        """
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    keep_alive = False
+                    status, payload = e.status, {"error": str(e)}
+                else:
+                    if request is None:
+                        break
+                    method, target, body, keep_alive = request
+                    try:
+                        status, payload = await self.dispatch(method, target, body)
+                    except Exception as e:  # Keep serving the other requests
+                        print(f"Error handling {method} {target}: {e!r}", file=sys.stderr)
+                        status, payload = 500, {"error": "Internal server error."}
+                content = b"" if payload is None else json.dumps(payload).encode("utf-8")
+                head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                        f"Content-Type: application/json\r\nContent-Length: {len(content)}\r\n")
+                if not keep_alive:
+                    head += "Connection: close\r\n"
+                writer.write(head.encode("latin-1") + b"\r\n" + content)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        """
+        Serves requests until cancelled, then commits the open batches.
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"Serving on http://{host}:{port}", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP/JSON API for the habit tracker.")
+    parser.add_argument("--file", default="habits.json", help="habits file to serve (default: habits.json)")
+    parser.add_argument("--users", help="serve a tracker per user, kept in this directory")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json", help="storage of the user trackers")
+    parser.add_argument("--capacity", type=int, default=256, help="user trackers kept in memory (default: 256)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="0 picks a free port (default: 8000)")
+    parser.add_argument("--flush-interval", type=float, default=1.0,
+                        help="seconds writes are collected before they are committed, 0 commits every write (default: 1)")
+    args = parser.parse_args(argv)
+
+    if args.users:
+        manager = TrackerManager(args.users, backend=args.backend, capacity=args.capacity)
+        server = HabitServer(manager=manager, flush_interval=args.flush_interval)
+    else:
+        manager = None
+        server = HabitServer(load_data(args.file), flush_interval=args.flush_interval)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if manager is not None:
+            manager.close()
+        elif server.habit_tracker.storage is not None:
+            server.habit_tracker.storage.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+from bisect import bisect_right
+from periods import period_indices
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, plain Python is used without it
+    np = None
+
+VECTORIZE_THRESHOLD = 256  # Below this many periods the NumPy call overhead is larger than the gain
+
+
+def find_runs(periods, vectorized=None):
+    """
+    Splits period indices into runs of consecutive periods.
+
+    With NumPy the periods are sorted with np.sort and the runs are found with
+    np.diff instead of a Python loop.
+
+    Args:
+        periods (iterable of int): Period indices in any order, duplicates allowed.
+        vectorized (bool, optional): Force or disable the NumPy path. By default
+            NumPy is used when installed and there are enough periods.
+
+    Returns:
+        tuple: Two lists with the first and last period index of every run.
+    """
+    if not hasattr(periods, "__len__"):
+        periods = list(periods)
+    if vectorized is None:
+        vectorized = np is not None and len(periods) >= VECTORIZE_THRESHOLD
+    if vectorized:
+        if np is None:
+            raise ValueError("NumPy is required for the vectorized streak computation.")
+        if isinstance(periods, (set, frozenset)):
+            periods = np.fromiter(periods, dtype=np.int64, count=len(periods))
+        ordered = np.sort(np.asarray(periods, dtype=np.int64))
+        if not len(ordered):
+            return [], []
+        breaks = np.flatnonzero(np.diff(ordered) > 1) + 1  # Positions where a new run begins, duplicates differ by 0
+        starts = ordered[np.concatenate(([0], breaks))]
+        ends = ordered[np.concatenate((breaks - 1, [len(ordered) - 1]))]
+        return starts.tolist(), ends.tolist()
+
+    starts = []
+    ends = []
+    for period in sorted(set(periods)):
+        if ends and ends[-1] == period - 1:
+            ends[-1] = period
+        else:
+            starts.append(period)
+            ends.append(period)
+    return starts, ends
+
+
+def compute_streaks(ordinals, periodicity, as_of_period=None, vectorized=None):
+    """
+    Computes the longest and current streak of a completion history in one pass.
+
+    Args:
+        ordinals (sequence of int): Day ordinals of the completions.
+        periodicity (str): "daily", "weekly", or "monthly".
+        as_of_period (int, optional): Period index used for the current streak,
+            defaults to the period of the latest completion.
+        vectorized (bool, optional): Force or disable the NumPy path.
+
+    Returns:
+        tuple: Longest streak and current streak.
+    """
+    streaks = StreakIndex.from_ordinals(ordinals, periodicity, vectorized=vectorized)
+    if not len(streaks):
+        return 0, 0
+    if as_of_period is None:
+        as_of_period = streaks._ends[-1]
+    return streaks.longest, streaks.current(as_of_period)
+
+
+class StreakIndex:
+    """
+    Keeps the runs of consecutive period indices a habit was completed in.
+
+    Runs are stored as two parallel sorted lists of start and end indices (both
+    inclusive). Adding a period finds its neighbouring runs with a binary search
+    and extends or merges them, so the longest streak is always known and never
+    has to be recomputed from the full history.
+    """
+    def __init__(self, periods=(), vectorized=None):
+        """
+        Builds the runs from any iterable of period indices.
+
+        Args:
+            periods (iterable of int): Period indices, in any order, duplicates allowed.
+            vectorized (bool, optional): Force or disable the NumPy path, see find_runs.
+        """
+        self._starts, self._ends = find_runs(periods, vectorized)
+        self.longest = max((end - start + 1 for start, end in zip(self._starts, self._ends)), default=0)
+
+    @classmethod
+    def from_ordinals(cls, ordinals, periodicity, vectorized=None):
+        """
+        Builds the runs straight from day ordinals.
+
+        Args:
+            ordinals (sequence of int): Day ordinals of the completions.
+            periodicity (str): "daily", "weekly", or "monthly".
+            vectorized (bool, optional): Force or disable the NumPy path.
+        """
+        periods = period_indices(ordinals, periodicity)
+        if vectorized is False and np is not None:
+            periods = periods.tolist()
+        return cls(periods, vectorized)
+
+    def __len__(self):
+        """
+        Returns the number of separate runs.
+        """
+        return len(self._starts)
+
+    def add(self, period):
+        """
+        Adds a single period index, merging it with the runs right before and after it.
+
+        Args:
+            period (int): The period index to add.
+
+        Returns:
+            bool: False if the period was already part of a run, True otherwise.
+        """
+        i = bisect_right(self._starts, period) - 1  # Run starting at or before the period
+        if i >= 0 and self._ends[i] >= period:
+            return False
+        joins_previous = i >= 0 and self._ends[i] == period - 1
+        joins_next = i + 1 < len(self._starts) and self._starts[i + 1] == period + 1
+
+        if joins_previous and joins_next:
+            self._ends[i] = self._ends[i + 1]
+            del self._starts[i + 1]
+            del self._ends[i + 1]
+        elif joins_previous:
+            self._ends[i] = period
+        elif joins_next:
+            i += 1
+            self._starts[i] = period
+        else:
+            i += 1
+            self._starts.insert(i, period)
+            self._ends.insert(i, period)
+
+        self.longest = max(self.longest, self._ends[i] - self._starts[i] + 1)
+        return True
+
+    @property
+    def last(self):
+        """
+        The latest completed period index, or None without any runs.
+        """
+        return self._ends[-1] if self._ends else None
+
+    def run_length_at(self, period):
+        """
+        Returns the length of the run that contains the period, or 0 if it was not completed.
+
+        Args:
+            period (int): The period index to look up.
+        """
+        if not self._starts:
+            return 0
+        if period >= self._starts[-1]:  # Most lookups are about the latest run, no search needed
+            i = len(self._starts) - 1
+        else:
+            i = bisect_right(self._starts, period) - 1
+            if i < 0:
+                return 0
+        if self._ends[i] < period:
+            return 0
+        return self._ends[i] - self._starts[i] + 1
+
+    def current(self, period):
+        """
+        Returns the streak that is still alive in the given period.
+
+        The given period counts as still open, so a run that ended in the period
+        right before it is not broken yet.
+
+        Args:
+            period (int): The period index of the current date.
+        """
+        return self.run_length_at(period) or self.run_length_at(period - 1)
+
+    def count_until(self, period):
+        """
+        Returns the number of completed periods up to and including the given period.
+
+        Args:
+            period (int): The last period index to count.
+        """
+        total = 0
+        for start, end in zip(self._starts, self._ends):
+            if start > period:
+                break
+            total += min(end, period) - start + 1
+        return total
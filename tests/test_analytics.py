@@ -0,0 +1,97 @@
+import random
+import pytest
+from datetime import datetime, timedelta
+from habit import Habit
+from analytics import get_statistics, np
+
+
+@pytest.fixture # Creates a few habits with completions, gaps and one without completions
+def habits():
+    start = datetime(2025, 1, 1)
+    daily = Habit("Exercise", "daily", start)
+    for day in [0, 1, 2, 4, 5]:
+        daily.mark_completed(start + timedelta(days=day))
+    weekly = Habit("Laundry", "weekly", start, compact=True)
+    for week in [0, 1, 3]:
+        weekly.mark_completed(start + timedelta(weeks=week))
+    monthly = Habit("Report", "monthly", start)
+    return [daily, weekly, monthly]
+
+
+def test_get_statistics_python(habits):
+    columns = get_statistics(habits, as_of=datetime(2025, 1, 7), vectorized=False)
+    assert columns["name"] == ["Exercise", "Laundry", "Report"]
+    assert columns["longest_streak"] == [3, 2, 0]
+    assert columns["current_streak"] == [2, 2, 0]
+    assert columns["completions"] == [5, 3, 0]
+    # 5 completions in 7 days, both weeks up to the week of 2025-01-07 completed
+    assert columns["completion_rate"] == [5 / 7, 1.0, 0.0]
+
+
+@pytest.mark.skipif(np is None, reason="NumPy is not installed")
+def test_get_statistics_vectorized_matches_python(habits):
+    rng = random.Random(3)
+    start = datetime(2024, 1, 1)
+    for i in range(30):
+        habit = Habit(f"Habit {i}", rng.choice(["daily", "weekly", "monthly"]), start, compact=i % 2 == 0)
+        for day in rng.sample(range(400), rng.randint(0, 200)):
+            try:
+                habit.mark_completed(start + timedelta(days=day))
+            except ValueError:
+                pass
+        habits.append(habit)
+    for as_of in [datetime(2023, 6, 1), datetime(2024, 5, 5), datetime(2025, 3, 1)]:
+        assert get_statistics(habits, as_of, vectorized=True, cached=False) == get_statistics(habits, as_of, vectorized=False, cached=False)
+
+
+def test_get_statistics_empty():
+    assert get_statistics([], vectorized=False)["name"] == []
+
+
+def test_get_statistics_cached(habits, monkeypatch):
+    as_of = datetime(2025, 1, 7)
+    expected = get_statistics(habits, as_of, vectorized=False)
+    calls = []
+    import analytics
+    compute = analytics._compute
+    monkeypatch.setattr(analytics, "_compute", lambda habits, *args: calls.append(len(habits)) or compute(habits, *args))
+
+    assert get_statistics(habits, as_of, vectorized=False) == expected
+    assert get_statistics(habits, datetime(2025, 1, 7, 18), vectorized=False) == expected  # Same day, same periods
+    assert calls == []
+
+    daily, weekly, monthly = habits
+    daily.mark_completed(datetime(2025, 1, 7))
+    assert get_statistics(habits, as_of, vectorized=False)["current_streak"] == [3, 2, 0]
+    weekly.edit_habit(start_date=datetime(2024, 12, 23))  # A week earlier, one more week without a completion
+    assert get_statistics(habits, as_of, vectorized=False)["completion_rate"][1] == 2 / 3
+    monthly.completion_dates = [datetime(2025, 1, 2)]
+    assert get_statistics(habits, as_of, vectorized=False)["completions"][2] == 1
+    daily.edit_habit(periodicity="weekly")
+    assert get_statistics(habits, as_of, vectorized=False)["longest_streak"][0] == 2
+    assert calls == [1, 1, 1, 1]
+
+
+def test_analytics_executor_matches_serial(habits):
+    from analytics import AnalyticsExecutor
+    from habit_tracker import HabitTracker
+    rng = random.Random(5)
+    start = datetime(2024, 1, 1)
+    habit_tracker = HabitTracker()
+    for habit in habits:
+        habit_tracker.add_habit(habit)
+    for i in range(20):
+        habit = Habit(f"Habit {i}", rng.choice(["daily", "weekly", "monthly"]), start, compact=i % 2 == 0)
+        habit.mark_completed_many([start + timedelta(days=day) for day in rng.sample(range(300), rng.randint(0, 150))])
+        habit_tracker.add_habit(habit)
+    as_of = datetime(2024, 8, 1)
+    with AnalyticsExecutor(workers=2, chunk_size=4) as executor:
+        assert executor.compute_statistics(habit_tracker.habits, as_of) == get_statistics(habit_tracker.habits, as_of, cached=False)
+        assert habit_tracker.get_statistics(as_of, executor=executor) == get_statistics(habit_tracker.habits, as_of)
+        assert executor.longest_streaks(habit_tracker.habits) == [habit.get_longest_streak() for habit in habit_tracker.habits]
+        assert habit_tracker.get_longest_streak_all_habits(executor=executor) == habit_tracker.get_longest_streak_all_habits()
+        assert executor.completion_listing(habit_tracker.habits) == [
+            sorted(date.strftime("%Y-%m-%d") for date in habit.get_completion_dates()) for habit in habit_tracker.habits]
+        assert executor.longest_streaks([]) == []
+    with pytest.raises(ValueError):
+        AnalyticsExecutor(chunk_size=0)
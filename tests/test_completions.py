@@ -0,0 +1,26 @@
+from datetime import datetime
+from completions import CompactCompletions
+
+
+def test_completions_are_sorted_day_ordinals():
+    completions = CompactCompletions.from_dates([datetime(2025, 6, 3, 18, 30), datetime(2025, 6, 1)])
+    assert completions.ordinals.tolist() == [datetime(2025, 6, 1).toordinal(), datetime(2025, 6, 3).toordinal()]
+    # Items are created as datetimes at midnight on access
+    assert completions[1] == datetime(2025, 6, 3)
+    assert completions[-1:] == [datetime(2025, 6, 3)]
+
+
+def test_append_keeps_order():
+    completions = CompactCompletions()
+    completions.append(datetime(2025, 6, 5))
+    completions.append(datetime(2025, 6, 2))
+    assert completions == [datetime(2025, 6, 2), datetime(2025, 6, 5)]
+    assert datetime(2025, 6, 5) in completions
+    assert datetime(2025, 6, 4) not in completions
+
+
+def test_any_between():
+    completions = CompactCompletions([10, 20])
+    assert completions.any_between(5, 11)
+    assert not completions.any_between(11, 20)
+    assert not completions.any_between(21, 30)
@@ -0,0 +1,59 @@
+import random
+from datetime import datetime, timedelta
+from habit import Habit
+from habit_tracker import HabitTracker
+from periods import period_index
+
+
+def names(habits):
+    return [habit.name for habit in habits]
+
+
+def test_due_and_at_risk():
+    habit_tracker = HabitTracker()
+    habit_tracker.add_habit(Habit("Exercise", "daily", datetime(2025, 1, 1)))
+    habit_tracker.add_habit(Habit("Laundry", "weekly", datetime(2025, 1, 1), compact=True))
+    habit_tracker.add_habit(Habit("Report", "monthly", datetime(2025, 2, 1)))
+    as_of = datetime(2025, 1, 8)  # A Wednesday
+    assert names(habit_tracker.get_due_habits(as_of)) == ["Exercise", "Laundry"]
+    assert habit_tracker.get_habits_at_risk(as_of) == []
+
+    habit_tracker.mark_completed("Exercise", datetime(2025, 1, 7))
+    habit_tracker.mark_completed("Laundry", datetime(2025, 1, 7))  # Completes the current week
+    assert names(habit_tracker.get_due_habits(as_of)) == ["Exercise"]
+    assert names(habit_tracker.get_habits_at_risk(as_of)) == ["Exercise"]
+    assert habit_tracker.get_habits_at_risk(datetime(2025, 1, 9)) == []  # The streak already broke
+    assert names(habit_tracker.get_due_habits(datetime(2025, 1, 13))) == ["Exercise", "Laundry"]
+
+    habit_tracker.get_habit("Exercise").mark_completed(as_of)  # Directly on the habit
+    assert habit_tracker.get_due_habits(as_of) == []
+    assert names(habit_tracker.get_due_habits(datetime(2025, 2, 1))) == ["Exercise", "Laundry", "Report"]
+
+    habit_tracker.edit_habit("Exercise", new_name="Running", new_periodicity="monthly")
+    assert names(habit_tracker.get_due_habits(datetime(2025, 2, 1))) == ["Laundry", "Report", "Running"]  # Same day, indexed again last
+    habit_tracker.delete_habit("Laundry")
+    assert names(habit_tracker.get_habits_at_risk(datetime(2025, 2, 1))) == ["Running"]
+
+
+def test_due_matches_scan():
+    rng = random.Random(7)
+    start = datetime(2024, 1, 1)
+    habit_tracker = HabitTracker()
+    for i in range(200):
+        habit = Habit(f"Habit {i}", rng.choice(["daily", "weekly", "monthly"]), start + timedelta(days=rng.randrange(60)), compact=i % 2 == 0)
+        habit_tracker.add_habit(habit)
+    for day in range(120):
+        as_of = start + timedelta(days=day)
+        for habit in rng.sample(habit_tracker.habits, 60):
+            try:
+                habit_tracker.mark_completed(habit.name, as_of)
+            except ValueError:
+                pass
+        due = []
+        for habit in habit_tracker.habits:
+            last = max((period_index(date, habit.periodicity) for date in habit.completion_dates), default=None)
+            if habit.start_date <= as_of and (last is None or last < period_index(as_of, habit.periodicity)):
+                due.append(habit.name)
+        assert sorted(names(habit_tracker.get_due_habits(as_of))) == sorted(due)
+        at_risk = [habit.name for habit in habit_tracker.habits if habit.name in due and habit.get_current_streak(as_of)]
+        assert sorted(names(habit_tracker.get_habits_at_risk(as_of))) == sorted(at_risk)
@@ -0,0 +1,65 @@
+import io
+import json
+import pytest
+from datetime import datetime
+from habit import Habit
+from habit_tracker import HabitTracker
+from exporters import export, iter_export, iter_statistics
+from importers import import_completions
+
+
+@pytest.fixture # Creates a tracker with a compact habit, a habit that needs quoting in CSV and a habit without completions
+def tracker():
+    tracker = HabitTracker()
+    exercise = Habit("Exercise", "daily", datetime(2024, 1, 1), compact=True)
+    exercise.completion_dates = [datetime(2024, 1, day) for day in (1, 2, 3, 5)]
+    laundry = Habit('Laundry, "big" loads', "weekly", datetime(2024, 1, 1))
+    laundry.completion_dates = [datetime(2024, 1, 10), datetime(2024, 1, 3)]
+    tracker.add_habit(exercise)
+    tracker.add_habit(laundry)
+    tracker.add_habit(Habit("Read", "monthly", datetime(2024, 1, 1)))
+    return tracker
+
+
+def export_to_string(tracker, format, **kwargs):
+    output = io.StringIO()
+    export(tracker, output, format, **kwargs)
+    return output.getvalue()
+
+
+def test_json_export_matches_to_json(tracker):
+    assert export_to_string(tracker, "json") == json.dumps(tracker.to_json(), indent=4)
+    assert export_to_string(HabitTracker(), "json") == json.dumps(HabitTracker().to_json(), indent=4)
+
+
+@pytest.mark.parametrize("format", ["csv", "ndjson"])
+def test_export_import_round_trip(tracker, format):
+    imported = HabitTracker()
+    report = import_completions(imported, io.StringIO(export_to_string(tracker, format)), format=format)
+    assert report.error_count == 0
+    assert report.completions_added == 6
+    for name in ("Exercise", 'Laundry, "big" loads'):
+        original = tracker.get_habit(name)
+        habit = imported.get_habit(name)
+        assert (habit.periodicity, habit.start_date) == (original.periodicity, original.start_date)
+        assert sorted(habit.completion_dates) == sorted(original.completion_dates)
+
+
+def test_export_is_streamed(tracker):
+    chunks = iter_export(tracker, "ndjson")
+    assert json.loads(next(chunks)) == {"name": "Exercise", "date": "2024-01-01", "periodicity": "daily", "start_date": "2024-01-01"}
+    assert len(list(chunks)) == 6  # One line per completion and one for the habit without completions
+
+
+def test_statistics_export(tracker):
+    lines = export_to_string(tracker, "ndjson", statistics=True, as_of=datetime(2024, 1, 5)).splitlines()
+    assert [json.loads(line)["longest_streak"] for line in lines] == [3, 2, 0]
+    chunked = "".join(iter_statistics(tracker, "json", as_of=datetime(2024, 1, 5), chunk_size=2))
+    assert [row["completions"] for row in json.loads(chunked)["statistics"]] == [4, 2, 0]
+
+
+def test_invalid_export_format(tracker):
+    with pytest.raises(ValueError):
+        iter_export(tracker, "xml")
+    with pytest.raises(ValueError):
+        iter_statistics(tracker, "compact")
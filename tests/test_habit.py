@@ -66,6 +66,29 @@ class TestHabit:
         with pytest.raises(ValueError):
             habit.mark_completed(later_same_month)
 
+    def test_mark_completed_duplicate_weekly_across_year_boundary(self):
+        # 2026-12-31 and 2027-01-03 are both in ISO week 53 of 2026
+        habit = Habit("Gym workout", "weekly", datetime(2026, 12, 1))
+        habit.mark_completed(datetime(2026, 12, 31))
+        with pytest.raises(ValueError):
+            habit.mark_completed(datetime(2027, 1, 3))
+        habit.mark_completed(datetime(2027, 1, 4))
+        assert len(habit.get_completion_dates()) == 2
+
+    def test_mark_completed_after_periodicity_change(self):
+        # Duplicate detection follows the new periodicity
+        self.habit.mark_completed(self.today)
+        self.habit.periodicity = "weekly"
+        with pytest.raises(ValueError):
+            self.habit.mark_completed(self.today + timedelta(days=2))
+
+    def test_mark_completed_after_assigning_completion_dates(self):
+        # Assigning completion dates directly keeps duplicate detection in sync
+        self.habit.completion_dates = [self.today]
+        with pytest.raises(ValueError):
+            self.habit.mark_completed(self.today)
+        self.habit.mark_completed(self.today + timedelta(days=1))
+
     def test_get_longest_streak_daily(self):
         # Test streak calculation for consecutive daily completions
         self.habit.mark_completed(self.today)
@@ -107,6 +130,30 @@ class TestHabit:
         # Longest streak in this monthly pattern should be 3
         assert habit.get_longest_streak() == 3
 
+    def test_get_longest_streak_out_of_order(self):
+        # Completions added out of order still merge into one streak
+        self.habit.mark_completed(self.today + timedelta(days=2))
+        self.habit.mark_completed(self.today)
+        assert self.habit.get_longest_streak() == 1
+        self.habit.mark_completed(self.today + timedelta(days=1))
+        assert self.habit.get_longest_streak() == 3
+
+    def test_get_longest_streak_weekly_53_week_year(self):
+        # 2026 has 53 ISO weeks, week 53 is followed by week 1 of 2027
+        habit = Habit("Laundry", "weekly", datetime(2026, 12, 1))
+        habit.mark_completed(datetime(2026, 12, 21))
+        habit.mark_completed(datetime(2026, 12, 28))
+        habit.mark_completed(datetime(2027, 1, 4))
+        assert habit.get_longest_streak() == 3
+
+    def test_get_current_streak(self):
+        self.habit.mark_completed(self.today)
+        self.habit.mark_completed(self.today + timedelta(days=1))
+        # The streak is still running on the next day, but broken the day after
+        assert self.habit.get_current_streak(self.today + timedelta(days=1)) == 2
+        assert self.habit.get_current_streak(self.today + timedelta(days=2)) == 2
+        assert self.habit.get_current_streak(self.today + timedelta(days=3)) == 0
+
     def test_get_streak_duration_string(self):
         # Check string formatting depending on periodicity
         assert self.habit.get_streak_duration_string(2) == "2 day(s)"
@@ -133,4 +180,46 @@ class TestHabit:
     def test_repr_output(self):
         output = repr(self.habit)
         assert "Habit(name=" in output
-        assert self.habit.name in output
\ No newline at end of file
+        assert self.habit.name in output
+
+    def test_compact_mark_completed(self):
+        # Compact habits keep completions sorted and reject duplicates like regular ones
+        habit = Habit("Exercise", "weekly", self.today, compact=True)
+        habit.mark_completed(self.today + timedelta(days=7))
+        habit.mark_completed(self.today)
+        with pytest.raises(ValueError):
+            habit.mark_completed(self.today + timedelta(days=9))
+        assert habit.get_completion_dates() == [self.today, self.today + timedelta(days=7)]
+        assert habit.get_longest_streak() == 2
+
+    def test_compact_edit_habit_start_date(self):
+        habit = Habit("Exercise", "daily", self.today, compact=True)
+        habit.mark_completed(self.today)
+        habit.mark_completed(self.today + timedelta(days=1))
+        habit.edit_habit(start_date=self.today + timedelta(days=1))
+        assert list(habit.get_completion_dates()) == [self.today + timedelta(days=1)]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_mark_completed_many(compact):
+    habit = Habit("Exercise", "weekly", datetime(2024, 1, 1), compact=compact)
+    habit.mark_completed(datetime(2024, 1, 8))
+    rejected = habit.mark_completed_many([
+        datetime(2024, 1, 22),
+        datetime(2023, 12, 31),  # Before the start date
+        datetime(2024, 1, 2),
+        datetime(2024, 1, 10),  # Week that was already completed
+        "2024-01-16",
+        datetime(2024, 1, 16),
+        datetime(2024, 1, 4),  # Same week as 2024-01-02
+    ])
+    assert [(position, reason) for position, _, reason in rejected] == [
+        (1, "Completion date cannot be earlier than the start date."),
+        (3, "Habit already marked as completed during this week."),
+        (4, "Completion date must be a datetime object."),
+        (6, "Habit already marked as completed during this week."),
+    ]
+    assert sorted(habit.completion_dates) == [datetime(2024, 1, 2), datetime(2024, 1, 8), datetime(2024, 1, 16), datetime(2024, 1, 22)]
+    assert habit.get_longest_streak() == 4
+    with pytest.raises(ValueError):
+        habit.mark_completed(datetime(2024, 1, 17))
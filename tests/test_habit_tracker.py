@@ -1,7 +1,7 @@
 import pytest
 from datetime import datetime, timedelta
 from habit import Habit
-from habit_tracker import HabitTracker
+from habit_tracker import HabitTracker, parse_date
 
 
 @pytest.fixture # Creates Habit type object for futher testing
@@ -26,6 +26,16 @@ def test_add_invalid_habit(): # Tests adding a string instead of a Habit class i
         tracker.add_habit("not_a_habit")
 
 
+def test_add_duplicate_habit(tracker): # Habit names must be unique
+    with pytest.raises(ValueError):
+        tracker.add_habit(Habit("Exercise", "weekly", datetime.today()))
+
+
+def test_get_habit(tracker, sample_habit):
+    assert tracker.get_habit("Exercise") is sample_habit
+    assert tracker.get_habit("NonExistent") is None
+
+
 def test_get_habits_by_periodicity(tracker): # Tests retrieving habits by periodicity
     result = tracker.get_habits_by_periodicity("daily")
     assert len(result) == 1
@@ -67,10 +77,29 @@ def test_edit_habit(tracker):
     assert habit.start_date == new_start
 
 
+def test_edit_habit_updates_indexes(tracker):
+    tracker.add_habit(Habit("Read", "daily", datetime.today()))
+    tracker.edit_habit("Exercise", new_name="Workout", new_periodicity="weekly")
+    # Renamed habit is found under its new name only, and keeps its position
+    assert tracker.get_habit("Exercise") is None
+    assert [habit.name for habit in tracker.get_all_habits()] == ["Workout", "Read"]
+    assert [habit.name for habit in tracker.get_habits_by_periodicity("weekly")] == ["Workout"]
+    assert [habit.name for habit in tracker.get_habits_by_periodicity("daily")] == ["Read"]
+
+
+def test_edit_habit_duplicate_name(tracker):
+    tracker.add_habit(Habit("Read", "daily", datetime.today()))
+    with pytest.raises(ValueError):
+        tracker.edit_habit("Read", new_name="Exercise")
+
+
 def test_edit_habit_invalid_name(tracker):
     # Test error when trying to edit with an invalid or empty name
     with pytest.raises(ValueError):
         tracker.edit_habit("Exercise", new_name="")
+    with pytest.raises(ValueError):
+        tracker.edit_habit("Exercise", new_name=["x"])  # Unhashable
+    assert tracker.get_habit("Exercise") is not None
 
 
 def test_edit_nonexistent_habit(tracker):
@@ -85,6 +114,16 @@ def test_delete_habit(tracker):
     assert tracker.get_all_habits() == []
 
 
+def test_delete_habit_updates_indexes(tracker):
+    tracker.add_habit(Habit("Read", "daily", datetime.today()))
+    tracker.delete_habit("Exercise")
+    assert tracker.get_habit("Exercise") is None
+    assert [habit.name for habit in tracker.get_habits_by_periodicity("daily")] == ["Read"]
+    # The name can be used again after deleting
+    tracker.add_habit(Habit("Exercise", "weekly", datetime.today()))
+    assert [habit.name for habit in tracker.get_all_habits()] == ["Read", "Exercise"]
+
+
 def test_delete_nonexistent_habit(tracker):
     # Expect an error when trying to delete a habit that doesn't exist
     with pytest.raises(ValueError):
@@ -114,3 +153,71 @@ def test_from_json():
     habit = tracker.get_all_habits()[0]
     assert habit.name == "Read"
     assert len(habit.completion_dates) == 2
+
+
+def test_from_json_compact():
+    data = {
+        "habits": [
+            {
+                "name": "Read",
+                "periodicity": "daily",
+                "start_date": "2023-01-01",
+                "completion_dates": ["2023-01-02", "2023-01-01"]
+            }
+        ]
+    }
+    tracker = HabitTracker.from_json(data, compact=True)
+    habit = tracker.get_all_habits()[0]
+    assert habit.get_completion_dates() == [datetime(2023, 1, 1), datetime(2023, 1, 2)]
+    assert tracker.to_json()["habits"][0]["completion_dates"] == ["2023-01-01", "2023-01-02"]
+
+
+def test_get_statistics(tracker, sample_habit):
+    sample_habit.mark_completed(sample_habit.start_date)
+    columns = tracker.get_statistics(as_of=sample_habit.start_date)
+    assert columns["name"] == ["Exercise"]
+    assert columns["current_streak"] == [1]
+    assert columns["completion_rate"] == [1.0]
+
+
+def test_parse_date():
+    assert parse_date("2023-01-05") == datetime(2023, 1, 5)
+    # Single digit months and days are still accepted like with strptime
+    assert parse_date("2023-1-5") == datetime(2023, 1, 5)
+    # Parsed dates are shared between habits
+    assert parse_date("2023-01-05") is parse_date("2023-01-05")
+
+
+def test_parse_invalid_date():
+    with pytest.raises(ValueError):
+        parse_date("2023-02-30")
+    with pytest.raises(ValueError):
+        parse_date("2023-W01-1")
+
+
+def test_mark_completed(tracker, sample_habit):
+    tracker.mark_completed("Exercise", sample_habit.start_date)
+    assert sample_habit.get_completion_dates() == [sample_habit.start_date]
+    with pytest.raises(ValueError):
+        tracker.mark_completed("NonExistent", sample_habit.start_date)
+
+
+def test_bulk_mark(tracker, sample_habit):
+    dates = [sample_habit.start_date + timedelta(days=day) for day in (2, 0, 1, 1)]
+    rejections = tracker.bulk_mark({"Exercise": dates, "NonExistent": [sample_habit.start_date]})
+    assert [position for position, _, _ in rejections["Exercise"]] == [3]
+    assert [reason for _, _, reason in rejections["NonExistent"]] == ["Habit with name 'NonExistent' not found."]
+    assert tracker.get_longest_streak_for_habit("Exercise") == 3
+
+
+def test_statistics_follow_changes(tracker, sample_habit):
+    as_of = sample_habit.start_date + timedelta(days=2)
+    tracker.bulk_mark({"Exercise": [sample_habit.start_date, as_of]})
+    assert tracker.get_statistics(as_of)["longest_streak"] == [1]
+    assert tracker.get_statistics(as_of) == tracker.get_statistics(as_of)  # Served from the cache
+    tracker.mark_completed("Exercise", sample_habit.start_date + timedelta(days=1))
+    assert tracker.get_statistics(as_of)["longest_streak"] == [3]
+    tracker.edit_habit("Exercise", new_name="Running", new_start_date=as_of)
+    statistics = tracker.get_statistics(as_of)
+    assert statistics["name"] == ["Running"]
+    assert statistics["completions"] == [1]
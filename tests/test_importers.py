@@ -0,0 +1,106 @@
+import io
+import json
+import pytest
+from datetime import datetime
+from habit import Habit
+from habit_tracker import HabitTracker
+from exporters import iter_export
+from importers import ImportReport, import_completions, iter_csv_rows
+
+CSV_EXPORT = """name,date,periodicity
+Exercise,2024-01-03,daily
+Exercise,2024-01-01,
+Exercise,2024-01-02,
+Exercise,2024-01-02,
+Exercise,2024-02-30,
+Laundry,2024-01-01,weekly
+Laundry,2024-01-03,weekly
+,2024-01-01,
+Yoga,2024-01-01,yearly
+"""
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 1000])
+def test_import_csv(batch_size):
+    tracker = HabitTracker()
+    report = import_completions(tracker, io.StringIO(CSV_EXPORT), batch_size=batch_size)
+    assert (report.rows, report.habits_created, report.completions_added) == (9, 2, 4)
+    assert [(error["row"], error["habit"], error["reason"]) for error in sorted(report.errors, key=lambda e: e["row"])] == [
+        (5, "Exercise", "Habit already marked as completed on this day."),
+        (6, "Exercise", "Invalid date format. Please use YYYY-MM-DD."),
+        (8, "Laundry", "Habit already marked as completed during this week."),
+        (9, None, "Habit name must be a non-empty string."),
+        (10, "Yoga", "Invalid periodicity: 'yearly'."),
+    ]
+    exercise = tracker.get_habit("Exercise")
+    # New habits start with their earliest completion, even if it comes in a later batch
+    assert exercise.start_date == datetime(2024, 1, 1)
+    assert exercise.get_longest_streak() == 3
+    assert tracker.get_habit("Laundry").periodicity == "weekly"
+
+
+def test_import_into_existing_habit():
+    tracker = HabitTracker()
+    tracker.add_habit(Habit("Exercise", "daily", datetime(2024, 1, 2)))
+    tracker.mark_completed("Exercise", datetime(2024, 1, 2))
+    report = import_completions(tracker, io.StringIO(CSV_EXPORT))
+    reasons = {error["row"]: error["reason"] for error in report.errors}
+    assert reasons[3] == "Completion date cannot be earlier than the start date."
+    assert reasons[4] == "Habit already marked as completed on this day."
+    assert tracker.get_habit("Exercise").start_date == datetime(2024, 1, 2)
+
+
+def test_import_ndjson_with_columns():
+    lines = [
+        {"habit": "Read", "day": "2024-03-01"},
+        {"habit": "Read", "completion_dates": ["2024-03-02", "2024-03-03"], "start_date": "2024-02-01"},
+        "not an object",
+    ]
+    data = "\n".join(json.dumps(line) for line in lines) + "\n{broken\n"
+    tracker = HabitTracker()
+    report = import_completions(tracker, io.StringIO(data), format="ndjson", columns={"name": "habit", "date": "day"})
+    assert report.completions_added == 3
+    assert [error["row"] for error in report.errors] == [3, 4]
+    assert tracker.get_habit("Read").start_date == datetime(2024, 2, 1)
+
+
+def test_import_with_workers():
+    rows = "".join(f"Habit {habit},2024-01-{day:02d}\n" for habit in range(20) for day in range(1, 29))
+    tracker = HabitTracker()
+    report = import_completions(tracker, io.StringIO("name,date\n" + rows), batch_size=100, workers=2)
+    assert report.completions_added == 20 * 28
+    assert tracker.get_longest_streak_all_habits() == 28
+
+
+def test_report_keeps_max_errors():
+    report = ImportReport(max_errors=2)
+    for row in range(5):
+        report.add_error(row, None, None, "Invalid row.")
+    assert report.error_count == 5
+    assert len(report.to_dict()["errors"]) == 2
+
+
+def test_invalid_import_arguments():
+    with pytest.raises(ValueError):
+        list(iter_csv_rows(io.StringIO("habit,when\nRead,2024-01-01\n")))
+    with pytest.raises(ValueError):
+        import_completions(HabitTracker(), io.StringIO(""), format="xml")
+
+
+@pytest.mark.parametrize("format", ["csv", "ndjson"])
+def test_import_export_keeps_habits_without_completions(format):
+    tracker = HabitTracker()
+    tracker.add_habit(Habit("Exercise", "daily", datetime(2024, 1, 1)))
+    tracker.add_habit(Habit("Laundry", "weekly", datetime(2024, 1, 1)))
+    tracker.mark_completed("Exercise", datetime(2024, 1, 2))
+    imported = HabitTracker()
+    report = import_completions(imported, io.StringIO("".join(iter_export(tracker, format))), format=format)
+    assert (report.habits_created, report.completions_added, report.error_count) == (2, 1, 0)
+    assert imported.to_json() == tracker.to_json()
+
+
+def test_import_dateless_row_without_habit_details():
+    tracker = HabitTracker()
+    report = import_completions(tracker, io.StringIO("name,date,periodicity\nRead,,weekly\n"))
+    assert tracker.get_habit("Read") is None
+    assert [(error["row"], error["habit"]) for error in report.errors] == [(2, "Read")]
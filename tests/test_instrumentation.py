@@ -0,0 +1,49 @@
+import json
+from datetime import datetime
+import instrumentation
+from habit import Habit
+from habit_tracker import HabitTracker
+
+
+def test_records_calls_and_restores_methods():
+    original = Habit.mark_completed
+    from_json = HabitTracker.__dict__["from_json"]
+    profile = instrumentation.enable()
+    try:
+        assert instrumentation.enable() is profile
+        assert Habit.mark_completed is not original
+        tracker = HabitTracker.from_json({"habits": []})
+        tracker.add_habit(Habit("Exercise", "daily", datetime(2024, 1, 1)))
+        for day in range(1, 4):
+            tracker.mark_completed("Exercise", datetime(2024, 1, day))
+        assert tracker.get_longest_streak_for_habit("Exercise") == 3
+    finally:
+        assert instrumentation.disable() is profile
+    assert Habit.mark_completed is original
+    assert HabitTracker.__dict__["from_json"] is from_json
+    assert instrumentation.disable() is None
+
+    stats = profile.to_dict()
+    assert stats["HabitTracker.from_json"]["calls"] == 1
+    assert stats["HabitTracker.mark_completed"]["calls"] == 3
+    assert stats["Habit.mark_completed"]["calls"] == 3
+    assert sum(stats["Habit.mark_completed"]["histogram"].values()) == 3
+    assert "Habit.delete" not in stats  # Never called
+    assert json.loads(profile.to_json()) == stats
+    table = profile.summary().splitlines()
+    assert table[0].split()[:2] == ["function", "calls"]
+    assert any(line.startswith("HabitTracker.mark_completed ") for line in table)
+
+
+def test_records_exceptions():
+    profile = instrumentation.enable()
+    try:
+        habit = Habit("Exercise", "daily", datetime(2024, 1, 1))
+        habit.mark_completed(datetime(2024, 1, 1))
+        try:
+            habit.mark_completed(datetime(2024, 1, 1))
+        except ValueError:
+            pass
+    finally:
+        instrumentation.disable()
+    assert profile.stats["Habit.mark_completed"].calls == 2
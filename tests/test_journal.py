@@ -0,0 +1,132 @@
+import json
+import os
+import pytest
+from datetime import datetime
+from habit import Habit
+from journal import JournalStorage
+
+
+@pytest.fixture # Path of a habits file inside a temporary directory
+def filename(tmp_path):
+    return str(tmp_path / "habits.json")
+
+
+def make_changes(tracker):
+    tracker.add_habit(Habit("Read", "daily", datetime(2023, 1, 1)))
+    tracker.add_habit(Habit("Gym", "weekly", datetime(2023, 1, 1)))
+    tracker.mark_completed("Read", datetime(2023, 1, 1))
+    tracker.mark_completed("Read", datetime(2023, 1, 2))
+    tracker.edit_habit("Read", new_name="Reading")
+    tracker.delete_habit("Gym")
+
+
+def test_journal_replay(filename): # Changes are journaled as they happen and replayed without a save
+    storage = JournalStorage(filename)
+    make_changes(storage.load())
+    storage.close()
+    assert not os.path.exists(filename)
+    with open(filename + ".journal") as f:
+        assert len(f.readlines()) == 6
+
+    tracker = JournalStorage(filename).load()
+    assert [habit.name for habit in tracker.get_all_habits()] == ["Reading"]
+    assert tracker.get_longest_streak_for_habit("Reading") == 2
+
+
+def test_journal_ignores_cut_off_line(filename):
+    storage = JournalStorage(filename)
+    make_changes(storage.load())
+    storage.close()
+    with open(filename + ".journal", "a") as f:
+        f.write('{"op": "delete", "na')
+    tracker = JournalStorage(filename).load()
+    assert tracker.get_habit("Reading") is not None
+
+
+@pytest.mark.parametrize("background", [True, False])
+def test_journal_compaction(filename, background):
+    storage = JournalStorage(filename)
+    tracker = storage.load()
+    make_changes(tracker)
+    storage.compact_now(tracker, background=background)
+    tracker.mark_completed("Reading", datetime(2023, 1, 3))
+    storage.close()
+
+    # The snapshot holds everything up to the compaction, the journal only what came after
+    with open(filename) as f:
+        assert json.load(f)["journal_sequence"] == 6
+    with open(filename + ".journal") as f:
+        assert len(f.readlines()) == 1
+    assert not os.path.exists(filename + ".journal.compacting")
+    assert JournalStorage(filename).load().get_longest_streak_for_habit("Reading") == 3
+
+
+def test_journal_compacts_on_flush(filename):
+    storage = JournalStorage(filename, compact_after=5)
+    tracker = storage.load()
+    make_changes(tracker)
+    storage.flush(tracker)
+    storage.close()
+    assert os.path.exists(filename)
+    assert not os.path.exists(filename + ".journal")
+
+
+def test_journal_interrupted_compaction(filename):
+    storage = JournalStorage(filename)
+    make_changes(storage.load())
+    storage.close()
+    # The process died after setting the journal aside, before the snapshot was written
+    os.replace(filename + ".journal", filename + ".journal.compacting")
+    storage = JournalStorage(filename)
+    tracker = storage.load()
+    storage.close()
+    assert tracker.get_longest_streak_for_habit("Reading") == 2
+    assert not os.path.exists(filename + ".journal.compacting")
+    assert JournalStorage(filename).load().get_longest_streak_for_habit("Reading") == 2
+
+
+def test_journal_partial_load(filename):
+    with pytest.raises(ValueError):
+        JournalStorage(filename).load(names=["Read"])
+
+
+def test_journal_bulk_mark(filename): # A bulk mark is a single journal event
+    storage = JournalStorage(filename)
+    tracker = storage.load()
+    tracker.add_habit(Habit("Read", "daily", datetime(2023, 1, 1)))
+    tracker.bulk_mark({"Read": [datetime(2023, 1, day) for day in (1, 2, 2, 3)]})
+    storage.close()
+    with open(filename + ".journal") as f:
+        assert len(f.readlines()) == 2
+
+    tracker = JournalStorage(filename).load()
+    assert len(tracker.get_habit("Read").completion_dates) == 3
+
+
+def test_journal_corrupt_snapshot(filename, capsys): # The journal is replayed and a readable snapshot written again
+    storage = JournalStorage(filename)
+    make_changes(storage.load())
+    storage.close()
+    with open(filename, "w") as f:
+        f.write('{"habits": [{"name": "Re')
+    storage = JournalStorage(filename)
+    tracker = storage.load()
+    assert "Error decoding JSON" in capsys.readouterr().err
+    tracker.mark_completed("Reading", datetime(2023, 1, 3))
+    storage.close()
+    assert os.path.exists(filename + ".corrupt")
+
+    tracker = JournalStorage(filename).load()
+    assert tracker.get_longest_streak_for_habit("Reading") == 3
+    assert capsys.readouterr().err == ""
+
+
+def test_journal_add_habit_with_completions(filename):
+    storage = JournalStorage(filename)
+    tracker = storage.load()
+    habit = Habit("Read", "daily", datetime(2023, 1, 1))
+    habit.mark_completed(datetime(2023, 1, 2))
+    tracker.add_habit(habit)
+    storage.close()
+    tracker = JournalStorage(filename).load()
+    assert tracker.get_habit("Read").get_completion_dates() == [datetime(2023, 1, 2)]
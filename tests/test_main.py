@@ -0,0 +1,200 @@
+import io
+import json
+import pytest
+from habit_tracker import HabitTracker
+from main import run_cli
+from storage import open_storage
+
+
+@pytest.fixture(params=["habits.json", "habits.db", "habits.snap"])
+def filename(request, tmp_path):
+    return str(tmp_path / request.param)
+
+
+def load(filename):
+    storage = open_storage(filename, journal=filename.endswith(".json"))
+    try:
+        return storage.load()
+    finally:
+        storage.close()
+
+
+def test_single_commands(filename, capsys):
+    assert run_cli(["--file", filename, "add", "Exercise", "daily", "--start", "2024-01-01"]) == 0
+    assert run_cli(["--file", filename, "mark", "Exercise", "2024-01-01"]) == 0
+    assert run_cli(["--file", filename, "mark", "Exercise", "2024-01-02"]) == 0
+    assert run_cli(["--file", filename, "mark", "Exercise", "2024-01-02"]) == 1
+    assert "already marked" in capsys.readouterr().err
+    assert run_cli(["--file", filename, "streak", "Exercise"]) == 0
+    assert capsys.readouterr().out == "2 day(s)\n"
+    assert run_cli(["--file", filename, "due", "--at-risk", "--date", "2024-01-03"]) == 0
+    assert capsys.readouterr().out == "Exercise\tdaily\t2\n"
+    assert run_cli(["--file", filename, "edit", "Exercise", "--name", "Running", "--periodicity", "weekly"]) == 0
+    assert run_cli(["--file", filename, "list"]) == 0
+    assert capsys.readouterr().out == "Running\tweekly\t2024-01-01\t2\n"
+    assert run_cli(["--file", filename, "delete", "Running"]) == 0
+    assert load(filename).get_all_habits() == []
+
+
+def test_batch(filename, monkeypatch, capsys):
+    commands = io.StringIO(
+        "# Backfill\n"
+        "add 'Morning run' daily --start 2024-01-01\n"
+        "add Laundry weekly --start 2024-01-01\n"
+        "\n"
+        "mark 'Morning run' 2024-01-01\n"
+        "mark 'Morning run' 2024-01-02\n"
+        "mark Laundry 2024-01-03\n"
+        "mark Laundry 2024-01-04\n"
+        "mark Unknown 2024-01-04\n"
+        "jump Laundry\n"
+        "mark Laundry 2024-02-30\n"
+    )
+    monkeypatch.setattr("sys.stdin", commands)
+    assert run_cli(["--file", filename, "batch"]) == 1
+    errors = capsys.readouterr().err.splitlines()
+    assert [error.split(":")[0] for error in errors] == ["Line 8", "Line 9", "Line 10", "Line 11"]
+    habit_tracker = load(filename)
+    assert habit_tracker.get_longest_streak_for_habit("Morning run") == 2
+    assert len(habit_tracker.get_habit("Laundry").completion_dates) == 1
+
+
+def test_import_export(filename, tmp_path, capsys):
+    source = HabitTracker.from_json({"habits": [
+        {"name": "Exercise", "periodicity": "daily", "start_date": "2024-01-01",
+         "completion_dates": ["2024-01-01", "2024-01-02", "2024-01-02"]},
+    ]})
+    source_file = str(tmp_path / "other.snap")
+    source.to_snapshot(source_file)
+    assert run_cli(["--file", filename, "import", source_file]) == 0
+    assert "Skipping completion" in capsys.readouterr().err  # The duplicate completion
+    assert run_cli(["--file", filename, "import", source_file]) == 0
+    assert "already exists" in capsys.readouterr().err
+    export_file = str(tmp_path / "export.json")
+    assert run_cli(["--file", filename, "export", export_file]) == 0
+    assert load(export_file).to_json() == load(filename).to_json()
+    assert load(filename).get_longest_streak_for_habit("Exercise") == 2
+
+
+def test_import_csv_export(filename, tmp_path, capsys):
+    export_file = tmp_path / "export.csv"
+    export_file.write_text("name,date\nExercise,2024-01-01\nExercise,2024-01-02\nExercise,2024-01-02\n")
+    report_file = str(tmp_path / "report.json")
+    assert run_cli(["--file", filename, "import", str(export_file), "--report", report_file]) == 0
+    assert "Imported 2 completion(s) and created 1 habit(s) from 3 row(s), 1 error(s)." in capsys.readouterr().out
+    with open(report_file) as f:
+        assert [error["row"] for error in json.load(f)["errors"]] == [4]
+    assert load(filename).get_longest_streak_for_habit("Exercise") == 2
+
+
+def test_export_to_standard_output(filename, capsys):
+    run_cli(["--file", filename, "add", "Exercise", "daily", "--start", "2024-01-01"])
+    run_cli(["--file", filename, "mark", "Exercise", "2024-01-01"])
+    capsys.readouterr()
+    assert run_cli(["--file", filename, "export", "-", "--format", "csv"]) == 0
+    assert capsys.readouterr().out == "name,date,periodicity,start_date\nExercise,2024-01-01,daily,2024-01-01\n"
+
+
+def test_profile(filename, monkeypatch, capsys):
+    assert run_cli(["--file", filename, "--profile", "json", "add", "Exercise", "daily", "--start", "2024-01-01"]) == 0
+    profile = json.loads(capsys.readouterr().err)
+    assert profile["main.load_data"]["calls"] == 1
+    assert profile["main.save_data"]["calls"] == 1
+    assert profile["HabitTracker.add_habit"]["calls"] == 1
+
+    monkeypatch.setenv("HABIT_TRACKER_PROFILE", "table")
+    assert run_cli(["--file", filename, "streak", "Exercise"]) == 0
+    err = capsys.readouterr().err
+    assert "Habit.get_longest_streak " in err
+    assert "main.save_data" not in err  # Nothing changed
+
+
+def test_save_data_with_format(tmp_path):
+    from main import load_data, save_data
+    filename = str(tmp_path / "habits.json")
+    assert run_cli(["--file", filename, "add", "A", "daily", "--start", "2024-01-01"]) == 0
+    habit_tracker = load_data(filename)
+    habit_tracker.edit_habit("A", new_name="B")  # Only in the journal
+    save_data(habit_tracker, filename, format="compact")
+    habit_tracker.storage.close()
+    assert [habit.name for habit in load(filename).get_all_habits()] == ["B"]
+
+
+def test_export_onto_journaled_file(tmp_path, capsys):
+    filename = str(tmp_path / "habits.json")
+    other = str(tmp_path / "other.json")
+    with open(other + ".journal", "w") as f:  # Stale journal of the file that is replaced
+        f.write(json.dumps({"op": "add", "name": "Stale", "periodicity": "daily", "start_date": "2024-01-01", "seq": 1}) + "\n")
+    assert run_cli(["--file", filename, "add", "A", "daily", "--start", "2024-01-01"]) == 0
+    assert run_cli(["--file", filename, "edit", "A", "--name", "B"]) == 0
+    assert run_cli(["--file", filename, "export", filename, "--format", "compact"]) == 0
+    assert run_cli(["--file", filename, "export", other]) == 0
+    capsys.readouterr()
+    assert run_cli(["--file", filename, "list"]) == 0
+    assert run_cli(["--file", other, "list"]) == 0
+    assert capsys.readouterr().out == "B\tdaily\t2024-01-01\t0\nB\tdaily\t2024-01-01\t0\n"
+
+
+def test_export_to_standard_output_with_warnings(tmp_path, capsys):
+    filename = str(tmp_path / "habits.json")
+    with open(filename + ".journal", "w") as f:
+        f.write(json.dumps({"op": "mark", "name": "Missing", "date": "2024-01-01", "seq": 1}) + "\n")
+    assert run_cli(["--file", filename, "export", "-", "--format", "csv"]) == 0
+    out, err = capsys.readouterr()
+    assert out == "name,date,periodicity,start_date\n"
+    assert "Skipping journal event" in err
+
+
+def test_menu_listing_with_workers(tmp_path, monkeypatch, capsys):
+    filename = str(tmp_path / "habits.json")
+    run_cli(["--file", filename, "add", "Exercise", "daily", "--start", "2024-01-01"])
+    run_cli(["--file", filename, "add", "Report", "monthly", "--start", "2024-01-01"])
+    for date in ("2024-01-03", "2024-01-01"):
+        run_cli(["--file", filename, "mark", "Exercise", date])
+    outputs = []
+    for workers in ([], ["--workers", "2"]):
+        capsys.readouterr()
+        monkeypatch.setattr("sys.stdin", io.StringIO("3\n8\n"))
+        assert run_cli(["--file", filename, *workers]) == 0
+        outputs.append(capsys.readouterr().out)
+    assert "Completions: ['2024-01-01', '2024-01-03']" in outputs[0]
+    assert outputs[0] == outputs[1]
+
+
+def test_import_never_writes_to_its_input(tmp_path, capsys):
+    filename = str(tmp_path / "habits.json")
+    source = tmp_path / "src.json"
+    source.write_text('{"habits": [{"name": "Re')
+    assert run_cli(["--file", filename, "import", str(source)]) == 1
+    assert "not valid JSON" in capsys.readouterr().err
+    assert source.read_text() == '{"habits": [{"name": "Re'
+    assert not (tmp_path / "src.json.corrupt").exists()
+
+    source.write_text('{"habits": []}')
+    (tmp_path / "src.json.journal.compacting").write_text(
+        json.dumps({"op": "add", "name": "Read", "periodicity": "daily", "start_date": "2024-01-01", "seq": 1}) + "\n")
+    assert run_cli(["--file", filename, "import", str(source)]) == 0
+    assert "Imported 1 habit(s)." in capsys.readouterr().out
+    assert source.read_text() == '{"habits": []}'
+    assert (tmp_path / "src.json.journal.compacting").exists()
+
+
+def test_corrupt_snapshot(tmp_path, capsys):
+    filename = tmp_path / "habits.snap"
+    filename.write_bytes(b"HABITSNP\x01\x00\x00\x00\x05\x00\x00\x00\xff\xff\x00\x00\x00\x00\x00\x00")
+    assert run_cli(["--file", str(filename), "list"]) == 0
+    assert "Error reading snapshot" in capsys.readouterr().out
+
+
+def test_menu_loads_snapshot_lazily(tmp_path, monkeypatch, capsys):
+    filename = str(tmp_path / "habits.snap")
+    run_cli(["--file", filename, "add", "Exercise", "daily", "--start", "2024-01-01"])
+    run_cli(["--file", filename, "mark", "Exercise", "2024-01-01"])
+    import main
+    loaded = []
+    load_data = main.load_data
+    monkeypatch.setattr(main, "load_data", lambda *args, **kwargs: loaded.append(kwargs) or load_data(*args, **kwargs))
+    monkeypatch.setattr("sys.stdin", io.StringIO("3\n8\n"))
+    assert run_cli(["--file", filename]) == 0
+    assert loaded == [{"lazy": True}]
+    assert "Completions: ['2024-01-01']" in capsys.readouterr().out
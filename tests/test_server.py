@@ -0,0 +1,105 @@
+import asyncio
+import json
+import pytest
+from main import load_data
+from server import HabitServer
+from tenants import TrackerManager
+
+
+def request(server, method, target, body=None):
+    return asyncio.run(server.dispatch(method, target, json.dumps(body).encode() if body is not None else b""))
+
+
+@pytest.fixture(params=["habits.json", "habits.db"])
+def filename(request, tmp_path):
+    return str(tmp_path / request.param)
+
+
+def test_endpoints(filename):
+    server = HabitServer(load_data(filename), flush_interval=0)
+    status, habit = request(server, "POST", "/habits", {"name": "Morning run", "periodicity": "daily", "start_date": "2024-01-01"})
+    assert status == 201 and habit["name"] == "Morning run"
+    assert request(server, "POST", "/habits", {"name": "Morning run", "periodicity": "daily"})[0] == 400
+    for date in ("2024-01-01", "2024-01-02"):
+        assert request(server, "POST", "/habits/Morning%20run/completions", {"date": date})[0] == 201
+    status, error = request(server, "POST", "/habits/Morning%20run/completions", {"date": "2024-01-02"})
+    assert status == 400 and "already marked" in error["error"]
+    assert request(server, "GET", "/habits/Morning%20run/streak")[1]["longest_streak"] == 2
+    assert request(server, "GET", "/streak") == (200, {"longest_streak": 2})
+    assert request(server, "PATCH", "/habits/Morning%20run", {"name": "Run", "periodicity": "weekly"})[1]["name"] == "Run"
+    assert [habit["name"] for habit in request(server, "GET", "/habits?periodicity=weekly")[1]] == ["Run"]
+    assert request(server, "GET", "/habits/Morning%20run")[0] == 404
+    assert request(server, "GET", "/habits?periodicity=yearly")[0] == 400
+    assert request(server, "PUT", "/habits")[0] == 405
+    assert request(server, "GET", "/nothing")[0] == 404
+    server.habit_tracker.storage.close()
+    habit_tracker = load_data(filename)
+    assert habit_tracker.get_habit("Run").get_longest_streak() == 1  # Both days are in the same week
+
+    server = HabitServer(habit_tracker, flush_interval=0)
+    assert request(server, "DELETE", "/habits/Run") == (204, None)
+    habit_tracker.storage.close()
+    assert load_data(filename).get_all_habits() == []
+
+
+def test_writes_are_batched(tmp_path):
+    filename = str(tmp_path / "habits.db")
+
+    async def run():
+        server = HabitServer(load_data(filename), flush_interval=60)
+        await server.dispatch("POST", "/habits", b'{"name": "Run", "periodicity": "daily", "start_date": "2024-01-01"}')
+        await server.dispatch("POST", "/habits/Run/completions", b'{"date": "2024-01-01"}')
+        assert server.habit_tracker.storage.connection.in_transaction  # Not committed yet
+        server.flush()
+        assert not server.habit_tracker.storage.connection.in_transaction
+        server.habit_tracker.storage.close()
+    asyncio.run(run())
+    assert load_data(filename).get_habit("Run").get_longest_streak() == 1
+
+
+def test_users(tmp_path):
+    with TrackerManager(str(tmp_path), capacity=1) as manager:
+        server = HabitServer(manager=manager, flush_interval=60)
+
+        async def run():
+            for user in ("alice", "bob"):
+                status, _ = await server.dispatch("POST", f"/users/{user}/habits", b'{"name": "Run", "periodicity": "daily"}')
+                assert status == 201
+            assert (await server.dispatch("GET", "/users/alice/habits"))[1][0]["name"] == "Run"
+            assert (await server.dispatch("GET", "/habits"))[0] == 404
+            # Write locks are not kept for every user that ever wrote
+            assert len(server._locks) == 0
+            server.flush()
+        asyncio.run(run())
+
+
+def test_http(tmp_path):
+    async def run():
+        server = HabitServer(load_data(str(tmp_path / "habits.json")), flush_interval=0)
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = b'{"name": "Run", "periodicity": "daily"}'
+        writer.write(b"POST /habits HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+        writer.write(b"GET /habits HTTP/1.1\r\nConnection: close\r\n\r\n")
+        responses = (await reader.read()).split(b"HTTP/1.1 ")[1:]
+        writer.close()
+        listener.close()
+        server.habit_tracker.storage.close()
+        return responses
+    created, listed = asyncio.run(run())
+    assert created.startswith(b"201 Created")
+    assert listed.startswith(b"200 OK") and b"Connection: close" in listed
+    assert json.loads(listed.split(b"\r\n\r\n", 1)[1])[0]["name"] == "Run"
+
+
+def test_invalid_periodicity(filename):
+    server = HabitServer(load_data(filename), flush_interval=0)
+    status, error = request(server, "POST", "/habits", {"name": "Run", "periodicity": "yearly"})
+    assert status == 400 and "Invalid periodicity" in error["error"]
+    assert request(server, "POST", "/habits", {"name": "Run", "periodicity": "daily", "start_date": "2024-01-01"})[0] == 201
+    assert request(server, "PATCH", "/habits/Run", {"periodicity": "hourly"})[0] == 400
+    assert request(server, "PATCH", "/habits/Run", {"name": ["x"]})[0] == 400
+    assert request(server, "GET", "/habits/Run")[1]["periodicity"] == "daily"
+    server.habit_tracker.storage.close()
+    assert [habit.periodicity for habit in load_data(filename).get_all_habits()] == ["daily"]
@@ -0,0 +1,117 @@
+import pytest
+from datetime import datetime, timedelta
+from habit import Habit
+from habit_tracker import HabitTracker
+from snapshot import SnapshotReader, decode_ordinals, encode_ordinals
+from storage import SnapshotStorage, open_storage
+
+
+@pytest.fixture # Creates a tracker with a long daily habit, a weekly habit and a habit without completions
+def tracker():
+    tracker = HabitTracker()
+    start = datetime(2020, 1, 1)
+    daily = Habit("Exercise", "daily", start)
+    daily.completion_dates = [start + timedelta(days=day) for day in range(1000) if day % 100 != 99]
+    weekly = Habit("Laundry", "weekly", start, compact=True)
+    weekly.completion_dates = [start + timedelta(weeks=week) for week in range(50)]
+    tracker.add_habit(daily)
+    tracker.add_habit(weekly)
+    tracker.add_habit(Habit("Read", "monthly", start))
+    return tracker
+
+
+@pytest.mark.parametrize("ordinals", [[], [737000], [1, 2, 3, 4, 10, 11, 12, 300, 300, 100000]])
+def test_encode_decode_ordinals(ordinals):
+    assert decode_ordinals(encode_ordinals(ordinals)).tolist() == ordinals
+
+
+def test_encode_runs(): # Evenly spaced completions take a single (difference, repeat) pair
+    assert len(encode_ordinals(list(range(737000, 738000)))) == 3 + 1 + 2
+    assert len(encode_ordinals(list(range(737000, 740500, 7)))) == 3 + 1 + 2
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_snapshot_round_trip(tmp_path, tracker, compact):
+    filename = str(tmp_path / "habits.snap")
+    tracker.to_snapshot(filename)
+    loaded = HabitTracker.from_snapshot(filename, compact=compact)
+    assert loaded.to_json() == tracker.to_json()
+    assert loaded.get_longest_streak_for_habit("Exercise") == 99
+
+
+def test_snapshot_reader(tmp_path, tracker):
+    filename = str(tmp_path / "habits.snap")
+    tracker.to_snapshot(filename)
+    with SnapshotReader(filename) as reader:
+        assert len(reader) == 3
+        assert reader.entries()[1] == ("Laundry", "weekly", datetime(2020, 1, 1), 50)
+        # A single habit is decoded on its own
+        habit = reader.read_habit(reader.index("Laundry"))
+        assert habit.get_longest_streak() == 50
+        with pytest.raises(ValueError):
+            reader.index("Unknown")
+
+
+def test_snapshot_invalid_file(tmp_path):
+    filename = tmp_path / "habits.snap"
+    filename.write_bytes(b"not a snapshot file at all")
+    with pytest.raises(ValueError):
+        SnapshotReader(str(filename))
+
+
+def test_snapshot_corrupt_file(tmp_path, tracker):
+    filename = str(tmp_path / "habits.snap")
+    tracker.to_snapshot(filename)
+    with open(filename, "rb") as f:
+        data = f.read()
+    for size in range(1, len(data), 7):  # Every truncation is reported as ValueError
+        with open(filename, "wb") as f:
+            f.write(data[:size])
+        with pytest.raises(ValueError):
+            HabitTracker.from_snapshot(filename)
+    with pytest.raises(ValueError):
+        decode_ordinals(encode_ordinals([737000, 737001])[:-1], 2)
+    with pytest.raises(ValueError):
+        decode_ordinals(encode_ordinals([737000, 737001, 737002]), 2)  # More completions than the entry says
+
+
+def test_snapshot_storage(tmp_path, tracker):
+    filename = str(tmp_path / "habits.snap")
+    storage = open_storage(filename)
+    assert isinstance(storage, SnapshotStorage)
+    storage.save(tracker)
+    loaded = storage.load(periodicities=["weekly"])
+    assert [habit.name for habit in loaded.get_all_habits()] == ["Laundry"]
+    with pytest.raises(ValueError):
+        storage.flush(loaded)
+
+
+def test_lazy_snapshot(tmp_path, tracker):
+    filename = str(tmp_path / "habits.snap")
+    tracker.to_snapshot(filename)
+    loaded = HabitTracker.from_snapshot(filename, lazy=True)
+    assert [(habit.name, habit.periodicity) for habit in loaded.get_all_habits()] == [
+        ("Exercise", "daily"), ("Laundry", "weekly"), ("Read", "monthly")]
+    assert not any(habit.loaded for habit in loaded.get_all_habits())
+    # Only the habit that is used gets decoded
+    assert loaded.get_longest_streak_for_habit("Exercise") == 99
+    assert [habit.loaded for habit in loaded.get_all_habits()] == [True, False, False]
+    loaded.mark_completed("Laundry", datetime(2020, 12, 16))
+    assert len(loaded.get_habit("Laundry").completion_dates) == 51
+    assert loaded.get_habit("Laundry").get_longest_streak() == 51
+
+
+def test_lazy_snapshot_save_over_mapped_file(tmp_path, tracker):
+    filename = str(tmp_path / "habits.snap")
+    tracker.to_snapshot(filename)
+    storage = open_storage(filename, lazy=True)
+    loaded = storage.load()
+    loaded.mark_completed("Read", datetime(2020, 2, 1))
+    storage.save(loaded)  # Reads the remaining lazy habits from the old file while writing the new one
+    tracker.mark_completed("Read", datetime(2020, 2, 1))
+    assert HabitTracker.from_snapshot(filename).to_json() == tracker.to_json()
+
+
+def test_lazy_needs_snapshot(tmp_path):
+    with pytest.raises(ValueError):
+        open_storage(str(tmp_path / "habits.json"), lazy=True)
@@ -0,0 +1,176 @@
+import io
+import json
+import pytest
+from datetime import datetime
+from habit import Habit
+import storage
+from storage import (JsonFileStorage, SqliteStorage, iter_habit_records, iter_json_chunks, load_tracker,
+                     open_storage, write_tracker)
+
+
+DATA = {
+    "habits": [
+        {"name": "Read", "periodicity": "daily", "start_date": "2023-01-01",
+         "completion_dates": ["2023-01-01", "2023-01-02"]},
+        {"name": "Gym", "periodicity": "weekly", "start_date": "2023-01-02", "completion_dates": []},
+        {"name": "Report", "periodicity": "monthly", "start_date": "2023-01-01", "completion_dates": ["2023-02-01"]},
+    ],
+    "version": 1.25
+}
+
+
+@pytest.fixture # Writes the sample data to a JSON file
+def habits_file(tmp_path):
+    path = tmp_path / "habits.json"
+    path.write_text(json.dumps(DATA, indent=4))
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 65536])
+def test_iter_habit_records(chunk_size): # Records are the same however the file is split into chunks
+    file = io.StringIO(json.dumps(DATA, indent=4))
+    assert list(iter_habit_records(file, chunk_size=chunk_size)) == DATA["habits"]
+
+
+def test_iter_habit_records_empty():
+    assert list(iter_habit_records(io.StringIO("{}"))) == []
+    assert list(iter_habit_records(io.StringIO('{"habits": []}'))) == []
+
+
+def test_iter_habit_records_invalid():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_habit_records(io.StringIO('{"habits": [{"name": "Read"'), chunk_size=4))
+
+
+def test_load_tracker(habits_file):
+    tracker = load_tracker(habits_file)
+    assert [habit.name for habit in tracker.get_all_habits()] == ["Read", "Gym", "Report"]
+    assert tracker.get_longest_streak_for_habit("Read") == 2
+
+
+def test_load_tracker_subset(habits_file):
+    tracker = load_tracker(habits_file, names=["Read", "Gym"], periodicities=["weekly"])
+    assert [habit.name for habit in tracker.get_all_habits()] == ["Gym"]
+
+
+def test_json_file_storage(habits_file):
+    storage = JsonFileStorage(str(habits_file))
+    tracker = storage.load()
+    tracker.mark_completed("Read", datetime(2023, 1, 3))
+    storage.flush(tracker)
+    assert JsonFileStorage(str(habits_file)).load().get_longest_streak_for_habit("Read") == 3
+
+
+def test_json_file_storage_partial_save(habits_file): # Saving a subset would lose the other habits
+    storage = JsonFileStorage(str(habits_file))
+    tracker = storage.load(names=["Read"])
+    with pytest.raises(ValueError):
+        storage.flush(tracker)
+
+
+def test_sqlite_storage_writes_changes(tmp_path):
+    filename = str(tmp_path / "habits.db")
+    storage = SqliteStorage(filename)
+    tracker = storage.load()
+    tracker.add_habit(Habit("Read", "daily", datetime(2023, 1, 1)))
+    tracker.add_habit(Habit("Gym", "weekly", datetime(2023, 1, 1)))
+    tracker.mark_completed("Read", datetime(2023, 1, 1))
+    tracker.mark_completed("Read", datetime(2023, 1, 2))
+    tracker.mark_completed("Read", datetime(2023, 1, 3))
+    tracker.edit_habit("Read", new_name="Reading", new_start_date=datetime(2023, 1, 2))
+    tracker.delete_habit("Gym")
+    storage.close()
+
+    # Changes are saved without calling save or flush
+    reopened = SqliteStorage(filename)
+    tracker = reopened.load()
+    assert [habit.name for habit in tracker.get_all_habits()] == ["Reading"]
+    assert tracker.get_habit("Reading").get_completion_dates() == [datetime(2023, 1, 2), datetime(2023, 1, 3)]
+    assert reopened.connection.execute("SELECT COUNT(*) FROM completions").fetchone() == (2,)
+    reopened.close()
+
+
+def test_sqlite_storage_add_habit_with_completions(tmp_path):
+    filename = str(tmp_path / "habits.db")
+    storage = SqliteStorage(filename)
+    tracker = storage.load()
+    habit = Habit("Read", "daily", datetime(2023, 1, 1))
+    habit.mark_completed(datetime(2023, 1, 2))
+    tracker.add_habit(habit)
+    storage.close()
+    reopened = SqliteStorage(filename)
+    assert reopened.load().get_habit("Read").get_completion_dates() == [datetime(2023, 1, 2)]
+    reopened.close()
+
+
+def test_sqlite_storage_save_and_filter(tmp_path, habits_file):
+    storage = SqliteStorage(str(tmp_path / "habits.db"))
+    storage.save(load_tracker(habits_file))
+    tracker = storage.load(periodicities=["daily", "monthly"])
+    assert [habit.name for habit in tracker.get_all_habits()] == ["Read", "Report"]
+    assert tracker.get_longest_streak_for_habit("Read") == 2
+    storage.close()
+
+
+def test_open_storage(tmp_path):
+    assert isinstance(open_storage(str(tmp_path / "habits.json")), JsonFileStorage)
+    storage = open_storage(str(tmp_path / "habits.sqlite"))
+    assert isinstance(storage, SqliteStorage)
+    storage.close()
+
+
+def test_iter_json_chunks_matches_json_dump(habits_file):
+    tracker = load_tracker(habits_file)
+    assert "".join(iter_json_chunks(tracker)) == json.dumps(tracker.to_json(), indent=4)
+    empty = load_tracker(habits_file, names=[])
+    assert "".join(iter_json_chunks(empty)) == json.dumps(empty.to_json(), indent=4)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_compact_format_round_trip(tmp_path, habits_file, compact):
+    tracker = load_tracker(habits_file)
+    filename = tmp_path / "habits.min.json"
+    write_tracker(tracker, filename, format="compact", metadata={"version": 2})
+    with open(filename) as f:
+        data = json.load(f)
+    assert data["version"] == 2
+    # Days since the previous completion, starting from the first day ordinal
+    assert data["habits"][0]["completion_days"] == [datetime(2023, 1, 1).toordinal(), 1]
+    assert load_tracker(filename, compact=compact).to_json() == tracker.to_json()
+
+
+def test_write_atomic_keeps_permissions(tmp_path, monkeypatch):
+    import storage
+    monkeypatch.setattr(storage, "_UMASK", 0o022)
+    filename = tmp_path / "habits.json"
+    storage.write_atomic(str(filename), ["{}"])
+    assert filename.stat().st_mode & 0o777 == 0o644  # Like open(filename, "w")
+    filename.chmod(0o640)
+    storage.write_atomic(str(filename), ["{}"])
+    assert filename.stat().st_mode & 0o777 == 0o640
+
+
+def test_write_tracker_keeps_old_file_on_error(habits_file, monkeypatch):
+    original = habits_file.read_text()
+
+    def failing_record(habit, format):
+        raise OSError("disk full")
+    monkeypatch.setattr(storage, "habit_record", failing_record)
+    with pytest.raises(OSError):
+        write_tracker(load_tracker(habits_file), habits_file)
+    assert habits_file.read_text() == original
+    assert [path.name for path in habits_file.parent.iterdir()] == ["habits.json"]
+
+
+def test_sqlite_storage_bulk_mark(tmp_path):
+    filename = str(tmp_path / "habits.db")
+    storage = SqliteStorage(filename)
+    tracker = storage.load()
+    tracker.add_habit(Habit("Read", "daily", datetime(2023, 1, 1)))
+    with storage.batch():  # Batches can be nested, bulk_mark starts its own
+        tracker.bulk_mark({"Read": [datetime(2023, 1, day) for day in (3, 1, 2, 2)]})
+    storage.close()
+
+    reopened = SqliteStorage(filename)
+    assert reopened.load().get_habit("Read").get_completion_dates() == [datetime(2023, 1, day) for day in (1, 2, 3)]
+    reopened.close()
@@ -0,0 +1,73 @@
+import pytest
+from datetime import datetime
+from streaks import StreakIndex, compute_streaks, find_runs, np
+
+
+def test_build_from_unsorted_periods(): # Runs are built from periods in any order, duplicates are ignored
+    streaks = StreakIndex([5, 3, 4, 4, 10, 11])
+    assert len(streaks) == 2
+    assert streaks.longest == 3
+
+
+def test_add_merges_neighbouring_runs():
+    streaks = StreakIndex([1, 2, 4, 5])
+    assert streaks.add(3)
+    # Filling the gap joins both runs into one
+    assert len(streaks) == 1
+    assert streaks.longest == 5
+
+
+def test_add_out_of_order():
+    streaks = StreakIndex()
+    for period in [10, 8, 9, 1, 7]:
+        streaks.add(period)
+    assert len(streaks) == 2
+    assert streaks.longest == 4
+
+
+def test_add_existing_period():
+    streaks = StreakIndex([1, 2, 3])
+    assert not streaks.add(2)
+    assert streaks.longest == 3
+
+
+def test_run_length_at():
+    streaks = StreakIndex([1, 2, 3, 7, 8])
+    assert streaks.run_length_at(2) == 3
+    assert streaks.run_length_at(8) == 2
+    assert streaks.run_length_at(5) == 0
+    assert streaks.run_length_at(0) == 0
+
+
+def test_current(): # The current period is still open, a run ending in the previous one is alive
+    streaks = StreakIndex([1, 2, 3])
+    assert streaks.current(3) == 3
+    assert streaks.current(4) == 3
+    assert streaks.current(5) == 0
+
+
+def test_find_runs_python():
+    assert find_runs([7, 1, 2, 2, 3, 9, 8], vectorized=False) == ([1, 7], [3, 9])
+
+
+@pytest.mark.skipif(np is None, reason="NumPy is not installed")
+def test_find_runs_vectorized(): # Both paths must give the same runs
+    periods = [7, 1, 2, 2, 3, 9, 8, 20]
+    assert find_runs(periods, vectorized=True) == find_runs(periods, vectorized=False)
+    assert find_runs(set(periods), vectorized=True) == ([1, 7, 20], [3, 9, 20])
+    assert find_runs([], vectorized=True) == ([], [])
+
+
+def test_compute_streaks_weekly():
+    ordinals = [datetime(2024, 12, 23).toordinal(), datetime(2024, 12, 31).toordinal(),
+                datetime(2025, 1, 2).toordinal(), datetime(2025, 1, 20).toordinal()]
+    # Two completions in the same ISO week count once
+    assert compute_streaks(ordinals, "weekly", vectorized=False) == (2, 1)
+
+
+@pytest.mark.skipif(np is None, reason="NumPy is not installed")
+def test_compute_streaks_monthly_vectorized():
+    ordinals = [datetime(2024, 11, 30).toordinal(), datetime(2024, 12, 1).toordinal(),
+                datetime(2025, 1, 31).toordinal(), datetime(2025, 3, 1).toordinal()]
+    assert compute_streaks(ordinals, "monthly", vectorized=True) == (3, 1)
+    assert compute_streaks(ordinals, "monthly", vectorized=True) == compute_streaks(ordinals, "monthly", vectorized=False)
@@ -0,0 +1,53 @@
+import os
+import pytest
+from datetime import datetime
+from habit import Habit
+from tenants import TrackerManager
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request):
+    return request.param
+
+
+def test_trackers_are_kept_per_user(tmp_path, backend):
+    with TrackerManager(str(tmp_path), backend=backend) as manager:
+        manager.get("alice").add_habit(Habit("Exercise", "daily", datetime(2024, 1, 1)))
+        manager.get("alice").mark_completed("Exercise", datetime(2024, 1, 1))
+        assert manager.get("bob").get_all_habits() == []
+        assert (manager.hits, manager.misses) == (1, 2)
+
+    with TrackerManager(str(tmp_path), backend=backend) as manager:
+        habit = manager.get("alice").get_habit("Exercise")
+        assert habit.get_completion_dates() == [datetime(2024, 1, 1)]
+        assert manager.get("bob").get_all_habits() == []
+
+
+def test_least_recently_used_tracker_is_evicted(tmp_path, backend):
+    with TrackerManager(str(tmp_path), backend=backend, capacity=2) as manager:
+        manager.get("alice").add_habit(Habit("Exercise", "daily", datetime(2024, 1, 1)))
+        manager.get("bob")
+        manager.get("alice")
+        manager.get("carol")
+        assert "bob" not in manager and "alice" in manager and len(manager) == 2
+        manager.get("dave")
+        assert "alice" not in manager and manager.evictions == 2
+        assert manager.get("alice").get_habit("Exercise") is not None  # Reloaded from its file
+        assert manager.evict("alice") and not manager.evict("alice")
+
+
+def test_users_are_sharded(tmp_path):
+    manager = TrackerManager(str(tmp_path), shards=4)
+    paths = {manager.path(f"user{i}") for i in range(100)}
+    assert len({os.path.dirname(path) for path in paths}) == 4
+    assert manager.path("user1") == TrackerManager(str(tmp_path), shards=4).path("user1")
+    assert os.path.basename(manager.path("../etc/passwd")) == "%2E%2E%2Fetc%2Fpasswd.json"
+    with pytest.raises(ValueError):
+        manager.path(" ")
+
+
+def test_invalid_arguments(tmp_path):
+    with pytest.raises(ValueError):
+        TrackerManager(str(tmp_path), backend="xml")
+    with pytest.raises(ValueError):
+        TrackerManager(str(tmp_path), capacity=0)
@@ -0,0 +1,176 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import pytest
+from habit import Habit
+from habit_tracker import HabitTracker
+from locks import ReadWriteLock
+from storage import open_storage
+
+START = datetime(2024, 1, 1)
+
+
+@pytest.fixture(autouse=True)
+def switch_often():
+    # Switch threads far more often than usual, so races show up in a short test
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def try_mark(tracker, name, date):
+    try:
+        tracker.mark_completed(name, date)
+        return True
+    except ValueError:
+        return False
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_period_is_completed_once(compact):
+    for periodicity, periods in (("daily", 2000), ("weekly", 286)):
+        tracker = HabitTracker(thread_safe=True)
+        tracker.add_habit(Habit("Exercise", periodicity, START, compact=compact))
+        dates = [START + timedelta(days=day) for day in range(2000)]
+
+        def mark_all(_):  # All threads try the same dates in the same order
+            return sum(try_mark(tracker, "Exercise", date) for date in dates)
+
+        with ThreadPoolExecutor(8) as pool:
+            marked = sum(pool.map(mark_all, range(8)))
+        habit = tracker.get_habit("Exercise")
+        assert marked == periods
+        assert len(habit.get_completion_dates()) == periods
+        assert habit.get_longest_streak() == periods
+
+
+@pytest.mark.parametrize("filename", ["habits.json", "habits.db"])
+def test_concurrent_changes_are_saved(tmp_path, filename):
+    filename = str(tmp_path / filename)
+    storage = open_storage(filename, journal=True)
+    tracker = storage.load()
+    tracker.make_thread_safe()
+    for i in range(8):
+        tracker.add_habit(Habit(f"Habit {i}", "daily", START))
+
+    def work(i):
+        name = f"Habit {i % 8}"
+        if i % 50 == 7:
+            tracker.add_habit(Habit(f"Extra {i}", "daily", START))
+            tracker.edit_habit(f"Extra {i}", new_name=f"Renamed {i}")
+            tracker.mark_completed(f"Renamed {i}", START)
+            tracker.delete_habit(f"Renamed {i}")
+        elif i % 10 == 3:
+            tracker.bulk_mark({name: [START + timedelta(days=day) for day in range(i % 30, i % 30 + 5)]})
+        elif i % 10 == 5:
+            tracker.get_statistics(START + timedelta(days=40))
+            tracker.snapshot().to_json()
+        else:
+            try_mark(tracker, name, START + timedelta(days=i % 40))
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(work, range(2000)))
+    tracker.flush()
+    storage.close()
+
+    def completions(tracker):  # Threads add the completions in any order
+        return {habit.name: sorted(habit.get_completion_dates()) for habit in tracker.get_all_habits()}
+
+    storage = open_storage(filename, journal=True)
+    try:
+        assert completions(storage.load()) == completions(tracker)
+    finally:
+        storage.close()
+    for habit in tracker.get_all_habits():
+        periods = [date.toordinal() for date in habit.get_completion_dates()]
+        assert len(periods) == len(set(periods))
+
+
+def test_snapshot_reads_do_not_block_writers():
+    tracker = HabitTracker(thread_safe=True)
+    for i in range(20):
+        tracker.add_habit(Habit(f"Habit {i}", "daily", START, compact=i % 2 == 0))
+    stop = threading.Event()
+    snapshots = []
+
+    def read():
+        while not stop.is_set():
+            snapshot = tracker.snapshot()
+            statistics = snapshot.get_statistics(START + timedelta(days=100))
+            snapshots.append(statistics)
+
+    with ThreadPoolExecutor(4) as pool:
+        readers = [pool.submit(read) for _ in range(2)]
+        writers = [pool.submit(lambda i=i: [tracker.mark_completed(f"Habit {i}", START + timedelta(days=day))
+                                            for day in range(100)]) for i in range(20)]
+        for writer in writers:
+            writer.result()
+        stop.set()
+        for reader in readers:
+            reader.result()
+    assert snapshots
+    assert tracker.get_statistics(START + timedelta(days=99))["longest_streak"] == [100] * 20
+
+
+def test_marks_of_different_habits_run_in_parallel():
+    tracker = HabitTracker(thread_safe=True)
+    for name in ("h0", "h1"):
+        tracker.add_habit(Habit(name, "daily", datetime(2024, 1, 1)))
+    slow = tracker.get_habit("h0")
+    started, release = threading.Event(), threading.Event()
+    mark = slow.mark_completed
+
+    def slow_mark(date):
+        started.set()
+        release.wait(5)
+        mark(date)
+    slow.mark_completed = slow_mark
+    thread = threading.Thread(target=tracker.mark_completed, args=("h0", datetime(2024, 1, 1)))
+    thread.start()
+    started.wait(5)
+    tracker.mark_completed("h1", datetime(2024, 1, 1))  # Doesn't wait for h0
+    assert thread.is_alive()  # h0 is still being marked
+    release.set()
+    thread.join()
+    assert [len(habit.completion_dates) for habit in tracker.habits] == [1, 1]
+
+
+def test_statistics_cache_stays_consistent():
+    tracker = HabitTracker(thread_safe=True)
+    tracker.add_habit(Habit("Exercise", "daily", START))
+    as_of = START + timedelta(days=300)
+
+    def mark(day):
+        tracker.mark_completed("Exercise", START + timedelta(days=day))
+        tracker.get_statistics(as_of)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(mark, range(300)))
+    assert tracker.get_statistics(as_of)["longest_streak"] == [300]
+
+
+def test_read_write_lock():
+    lock = ReadWriteLock()
+    active = []
+    errors = []
+
+    def reader():
+        with lock.read():
+            active.append("r")
+            if "w" in active:
+                errors.append("reader next to writer")
+            active.remove("r")
+
+    def writer():
+        with lock.write():
+            with lock.read():  # The writer may read again
+                active.append("w")
+                if len(active) > 1:
+                    errors.append("writer not alone")
+                active.remove("w")
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda i: writer() if i % 5 == 0 else reader(), range(2000)))
+    assert errors == []